@@ -6,8 +6,15 @@ from config import Config
 from routes.main import main_bp
 from routes.auth import auth_bp
 from routes.user import user_bp
+from routes.admin import admin_bp
 from routes.api.auth_api import auth_api_bp
 from routes.api.project_api import project_api_bp
+from routes.api.lint_api import lint_api_bp
+from routes.api.admin_api import admin_api_bp
+from routes.api.search_api import search_api_bp
+from utils.assets import init_assets
+from utils.profiler import init_profiler
+from utils.json_provider import MongoJSONProvider
 
 # 嘗試導入 CORS
 try:
@@ -22,6 +29,8 @@ def create_app():
     """建立並配置 Flask 應用程式"""
     app = Flask(__name__)
     app.config['SECRET_KEY'] = Config.SECRET_KEY
+    # 以 orjson 序列化回應，直接支援 ObjectId 與 datetime
+    app.json = MongoJSONProvider(app)
     
     # 啟用 CORS 
     if CORS_AVAILABLE:
@@ -31,8 +40,18 @@ def create_app():
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(user_bp)
+    app.register_blueprint(admin_bp)
     app.register_blueprint(auth_api_bp)  # RESTful API
     app.register_blueprint(project_api_bp)  # 專案管理 API
+    app.register_blueprint(lint_api_bp)  # 即時檢查 API
+    app.register_blueprint(admin_api_bp)  # 管理員 API
+    app.register_blueprint(search_api_bp)  # 記錄搜尋 API
+    
+    # 建置後的靜態資源（雜湊檔名、長效快取）
+    init_assets(app)
+    
+    # 管理員的單次請求效能分析（X-Profile header）
+    init_profiler(app)
     
     return app
 
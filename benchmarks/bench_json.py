@@ -0,0 +1,101 @@
+"""
+JSON 序列化效能測試
+
+比較大量專案記錄序列化的吞吐量：
+- 原本：模型逐筆將 ObjectId 轉為字串，再以 Flask 預設（標準函式庫 json）序列化
+- 目前：模型直接返回資料庫文件，以 MongoJSONProvider（orjson）序列化
+
+用法：
+    python benchmarks/bench_json.py --records 1000 5000 20000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 效能測試不會呼叫 Gemini，提供預設值以便載入 Config
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+from bson import ObjectId  # noqa: E402
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from utils.json_provider import MongoJSONProvider, ORJSON_AVAILABLE  # noqa: E402
+
+RESULT_LAW = (
+    '<div class="list-item-numbered">1. 違法</div>'
+    '<div class="list-item-numbered">2. 醫療法第61條第1項：禁止不正當招攬病人</div>'
+    '<div class="list-item-numbered">3. 違反公告禁止之不正當方法招攬病人</div>'
+    '<div class="list-item-numbered">4. 使用「免費體驗」等字眼招攬病人，屬不正當招攬行為</div>'
+)
+
+
+def make_records(count):
+    """產生與 project_record 結構相同的測試文件"""
+    project_id = ObjectId()
+    now = datetime.now()
+    return [{
+        '_id': ObjectId(),
+        'project_id': project_id,
+        'input_ad': f'本診所提供專業醫美療程，首次體驗免費，歡迎預約諮詢（{i}）',
+        'result_law': RESULT_LAW,
+        'result_advice': '本診所提供專業醫美療程，歡迎預約諮詢，由專業醫師為您評估。',
+        'token_usage': {'prompt_tokens': 11873, 'response_tokens': 212, 'total_tokens': 12085, 'calls': 2},
+        'law_version': '8fdfdec88a07',
+        'prompt_version': 'law-v1',
+        'cited_articles': ['醫療法第61條'],
+        'created_at': now - timedelta(minutes=i)
+    } for i in range(count)]
+
+
+def stringify(records):
+    """原本模型中的逐筆轉換"""
+    for record in records:
+        record['_id'] = str(record['_id'])
+        record['project_id'] = str(record['project_id'])
+    return records
+
+
+def bench(label, fn, rounds):
+    fn()  # 暖機
+    start = time.perf_counter()
+    for _ in range(rounds):
+        size = len(fn())
+    elapsed = (time.perf_counter() - start) / rounds
+    return label, elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON 序列化效能測試')
+    parser.add_argument('--records', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help='每次序列化的記錄數')
+    parser.add_argument('--rounds', type=int, default=20, help='每種情境重複次數')
+    args = parser.parse_args()
+    
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    mongo_provider = MongoJSONProvider(app)
+    
+    print(f"orjson: {'已安裝' if ORJSON_AVAILABLE else '未安裝（使用標準函式庫）'}")
+    print(f"{'records':>8} {'方式':<10} {'ms':>9} {'records/s':>12} {'MB/s':>8}")
+    for count in args.records:
+        source = make_records(count)
+        
+        def before():
+            # 每次重新複製，模擬每個請求都從資料庫取得新的文件
+            records = stringify([dict(record) for record in source])
+            return default_provider.dumps({'success': True, 'records': records}).encode('utf-8')
+        
+        def after():
+            records = [dict(record) for record in source]
+            return mongo_provider.response({'success': True, 'records': records}).get_data()
+        
+        with app.app_context():
+            for label, elapsed, size in (bench('原本', before, args.rounds), bench('orjson', after, args.rounds)):
+                print(f"{count:>8} {label:<10} {elapsed * 1000:>9.2f} {count / elapsed:>12,.0f} "
+                      f"{size / elapsed / 1024 / 1024:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
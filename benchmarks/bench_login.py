@@ -0,0 +1,76 @@
+"""
+登入驗證效能測試
+
+以多個請求執行緒同時呼叫 check_password（與登入路由相同的路徑：驗證、
+帳號不存在時的等成本驗證，全部在密碼雜湊執行緒池中執行），
+量測不同 scrypt 成本參數下每秒可處理的登入數量，
+作為調整 PASSWORD_SCRYPT_N / PASSWORD_HASH_WORKERS 的依據。
+
+用法：
+    python benchmarks/bench_login.py --logins 200 --threads 32 --costs 13 14 15
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 效能測試不會呼叫 Gemini，提供預設值以便載入 Config
+os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+
+from config import Config  # noqa: E402
+from utils import password_utils  # noqa: E402
+
+
+def _login(password, stored):
+    """模擬一次登入請求，返回延遲（秒）"""
+    start = time.perf_counter()
+    password_utils.check_password(password, stored)
+    return time.perf_counter() - start
+
+
+def bench_cost(log_n, logins, threads):
+    """以 n = 2 ** log_n 量測登入吞吐量與延遲"""
+    n = 2 ** log_n
+    # 成本參數與雜湊一致，正確密碼不會觸發重新雜湊
+    Config.PASSWORD_SCRYPT_N = n
+    stored = password_utils.hash_password('correct horse battery staple', n=n)
+    
+    # 正確密碼、錯誤密碼與不存在的帳號輪流出現
+    cases = [
+        ('correct horse battery staple', stored),
+        ('wrong password', stored),
+        ('correct horse battery staple', None)
+    ]
+    with ThreadPoolExecutor(max_workers=threads) as request_threads:
+        # 暖機（同時讓密碼雜湊執行緒池建立所有執行緒）
+        list(request_threads.map(lambda case: _login(*case), cases * Config.PASSWORD_HASH_WORKERS))
+        
+        start = time.perf_counter()
+        latencies = list(request_threads.map(lambda i: _login(*cases[i % len(cases)]), range(logins)))
+        elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return logins / elapsed, p50, p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description='登入驗證效能測試')
+    parser.add_argument('--logins', type=int, default=200, help='每個成本參數模擬的登入次數')
+    parser.add_argument('--costs', type=int, nargs='+', default=[12, 13, 14, 15],
+                        help='scrypt n 的 log2 值')
+    parser.add_argument('--threads', type=int, default=32, help='同時送出登入的請求執行緒數')
+    args = parser.parse_args()
+    
+    print(f"請求執行緒: {args.threads}，執行緒池大小: {Config.PASSWORD_HASH_WORKERS}，r={Config.PASSWORD_SCRYPT_R}，p={Config.PASSWORD_SCRYPT_P}")
+    print(f"{'n':>8} {'logins/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for log_n in args.costs:
+        throughput, p50, p95 = bench_cost(log_n, args.logins, args.threads)
+        print(f"{2 ** log_n:>8} {throughput:>10.1f} {p50 * 1000:>10.1f} {p95 * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
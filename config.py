@@ -17,10 +17,19 @@ class Config:
     # JWT 配置
     JWT_ALGORITHM = 'HS256'
     JWT_EXPIRATION_DELTA = datetime.timedelta(days=7)  # 7天過期
-    
+
+    # 密碼雜湊配置（scrypt 成本參數，調整後舊密碼會在登入時自動重新雜湊）
+    PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2 ** 14))
+    PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+    PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+    # 密碼驗證執行緒池大小（預設為 CPU 核心數）
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+
     # MongoDB 配置
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
     MONGODB_DB_NAME = 'madetect'
+    # 資料庫後端：mongodb 或 memory（行程內記憶體資料庫，不需要 MongoDB，重新啟動後資料消失）
+    DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', 'mongodb').lower()
     
     # Gemini API 配置
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
@@ -29,9 +38,105 @@ class Config:
             "請設定 GEMINI_API_KEY 環境變數。"
             "可以在 .env 檔案中設定，或使用 export GEMINI_API_KEY='your-api-key'"
         )
+    # 指定模型池使用的模型（逗號分隔，依偏好順序）；未設定時自動探索，flash 模型優先
+    GEMINI_MODELS = [name.strip() for name in os.getenv('GEMINI_MODELS', '').split(',') if name.strip()]
+    GEMINI_MODEL_POOL_SIZE = int(os.getenv('GEMINI_MODEL_POOL_SIZE', 3))
+    # 斷路器：連續失敗次數達門檻後停用該模型，冷卻秒數後再試探
+    GEMINI_BREAKER_FAILURES = int(os.getenv('GEMINI_BREAKER_FAILURES', 3))
+    GEMINI_BREAKER_COOLDOWN = float(os.getenv('GEMINI_BREAKER_COOLDOWN', 30))
+    # 對沖請求：首選模型超過其 p95 延遲仍未回應時，同時向備援模型發送請求
+    GEMINI_HEDGE_ENABLED = os.getenv('GEMINI_HEDGE_ENABLED', 'false').lower() == 'true'
+    GEMINI_HEDGE_DEFAULT_DELAY = float(os.getenv('GEMINI_HEDGE_DEFAULT_DELAY', 8))  # 延遲樣本不足時使用
+    GEMINI_HEDGE_WORKERS = int(os.getenv('GEMINI_HEDGE_WORKERS', 16))
+    # 提示詞 token 預算：超過時先截斷法律文件，扣除廣告後剩餘不足 GEMINI_MIN_LAW_CONTEXT_TOKENS 則拒絕
+    GEMINI_PROMPT_TOKEN_BUDGET = int(os.getenv('GEMINI_PROMPT_TOKEN_BUDGET', 16000))
+    GEMINI_MIN_LAW_CONTEXT_TOKENS = int(os.getenv('GEMINI_MIN_LAW_CONTEXT_TOKENS', 3000))
+    # 單則廣告的 token 上限
+    GEMINI_MAX_AD_TOKENS = int(os.getenv('GEMINI_MAX_AD_TOKENS', 4000))
+    # 是否以 count_tokens API 校正本地估算（每個提示詞模板只呼叫一次）
+    GEMINI_TOKEN_CALIBRATION = os.getenv('GEMINI_TOKEN_CALIBRATION', 'true').lower() == 'true'
+
+    # 逐句增量分析：句數達門檻的廣告改為逐句判斷並快取結果，修改後只重新分析變更的句子
+    # 預設停用；以 evaluation/run_eval.py 確認 pipeline-incremental 的準確度不低於 pipeline-whole-ad 後再啟用
+    INCREMENTAL_ANALYSIS_ENABLED = os.getenv('INCREMENTAL_ANALYSIS_ENABLED', 'false').lower() == 'true'
+    INCREMENTAL_MIN_SEGMENTS = int(os.getenv('INCREMENTAL_MIN_SEGMENTS', 3))
+    # 長篇內容（部落格文章、活動頁面）：超過 LONG_DOC_MIN_CHARS 字時依段落切分為區塊並行分析
+    # 使用逐句分析提示詞，預設停用；以 evaluation/run_eval.py 確認 pipeline-long-doc 的準確度不低於
+    # pipeline-whole-ad（長篇案例）後再啟用
+    LONG_DOC_ENABLED = os.getenv('LONG_DOC_ENABLED', 'false').lower() == 'true'
+    LONG_DOC_MIN_CHARS = int(os.getenv('LONG_DOC_MIN_CHARS', 1500))
+    LONG_DOC_CHUNK_CHARS = int(os.getenv('LONG_DOC_CHUNK_CHARS', 1200))  # 每個區塊的字元上限
+    LONG_DOC_PARALLELISM = int(os.getenv('LONG_DOC_PARALLELISM', 4))  # 每則內容同時分析的區塊數（另受公平佇列名額限制）
+    LONG_DOC_MAX_TOKENS = int(os.getenv('LONG_DOC_MAX_TOKENS', 40000))  # 長篇內容的 token 上限
+
+    # 檢測的用戶速率限制：每位用戶在 DETECT_RATE_WINDOW_SECONDS 秒內最多 DETECT_RATE_LIMIT 次（0 表示不限制）
+    # 視窗存放於 MongoDB 的 rate_limit 集合，由所有 worker 共用
+    DETECT_RATE_LIMIT = int(os.getenv('DETECT_RATE_LIMIT', 20))
+    DETECT_RATE_WINDOW_SECONDS = float(os.getenv('DETECT_RATE_WINDOW_SECONDS', 60))
+    # 檢測公平佇列：所有 worker 合計同時送往 Gemini 的檢測數、每位用戶最多排隊數與最長等待秒數
+    # 佇列在各 worker 行程內，名額依 API_WORKERS 平分（每個 worker 至少 1）
+    DETECT_CONCURRENCY = int(os.getenv('DETECT_CONCURRENCY', 2))
+    DETECT_MAX_QUEUED_PER_USER = int(os.getenv('DETECT_MAX_QUEUED_PER_USER', 2))
+    DETECT_MAX_QUEUE_WAIT = float(os.getenv('DETECT_MAX_QUEUE_WAIT', 30))
+    DETECT_SERVICE_TIME_SECONDS = float(os.getenv('DETECT_SERVICE_TIME_SECONDS', 8))  # 預估等待時間的初始值
+    DETECT_ADMIN_WEIGHT = float(os.getenv('DETECT_ADMIN_WEIGHT', 2))  # 管理員分配到的名額比例（一般用戶為 1）
+    API_WORKERS = int(os.getenv('API_WORKERS', 1))  # API worker 行程數（gunicorn.conf.py 依 workers 設定）
+    
+    # 即時推播（GET /api/project/<id>/events，Server-Sent Events）
+    # 每個連線佔用一個執行緒，正式環境以 gunicorn.push.conf.py 另外啟動推播行程
+    PUSH_ENABLED = os.getenv('PUSH_ENABLED', 'false').lower() == 'true'
+    # 每個行程同時保持的推播連線上限，超過時返回 503（gunicorn.conf.py 的 API worker 預設為 0）
+    PUSH_MAX_SUBSCRIBERS = int(os.getenv('PUSH_MAX_SUBSCRIBERS', 20))
+    # 單一連線的最長秒數（到期後瀏覽器自動重新連線，避免長期佔用 worker 執行緒）
+    PUSH_STREAM_SECONDS = float(os.getenv('PUSH_STREAM_SECONDS', 300))
+    PUSH_HEARTBEAT_SECONDS = float(os.getenv('PUSH_HEARTBEAT_SECONDS', 15))
+    PUSH_QUEUE_SIZE = int(os.getenv('PUSH_QUEUE_SIZE', 100))  # 每個連線最多暫存的事件數
+    
+    # 即時檢查（/api/lint）單次可檢查的字數上限
+    LINT_MAX_CHARS = int(os.getenv('LINT_MAX_CHARS', 20000))
+    
+    # 記錄搜尋：有關鍵字時只為符合條件的最新 N 筆記錄計算排序分數，每頁查詢成本不隨記錄數增加
+    SEARCH_MAX_CANDIDATES = int(os.getenv('SEARCH_MAX_CANDIDATES', 1000))
+
+    # API 回應快取配置（行程內快取的最大項目數）
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 2048))
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', 1024))
+    
+    # 管理介面：列表每頁筆數上限與集合總數的快取秒數（總數以 estimated_document_count 估算）
+    ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', 50))
+    ADMIN_TOTALS_TTL = float(os.getenv('ADMIN_TOTALS_TTL', 60))
+    # 效能分析：取樣間隔（秒）、時間區間取樣的秒數上限、每個 worker 保留的單次請求分析數
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+    PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 60))
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 20))
+    
+    # 主頁與專案 API 一次載入的最新記錄數，更早的記錄在前端需要時才載入
+    HOME_RECORD_LIMIT = int(os.getenv('HOME_RECORD_LIMIT', 20))
+    
+    # 專案記錄延遲寫入：檢測結果先回應用戶端，累積 RECORD_BUFFER_MAX_BATCH 筆或經過
+    # RECORD_BUFFER_FLUSH_SECONDS 秒後批次寫入；MongoDB 無法寫入時暫存於 RECORD_SPOOL_DIR，之後重新寫入
+    RECORD_WRITE_BEHIND = os.getenv('RECORD_WRITE_BEHIND', 'false').lower() == 'true'
+    RECORD_BUFFER_MAX_BATCH = int(os.getenv('RECORD_BUFFER_MAX_BATCH', 100))
+    RECORD_BUFFER_FLUSH_SECONDS = float(os.getenv('RECORD_BUFFER_FLUSH_SECONDS', 0.5))
+    RECORD_SPOOL_DIR = os.getenv('RECORD_SPOOL_DIR', './data/record_spool')
+    RECORD_SPOOL_RETRY_SECONDS = float(os.getenv('RECORD_SPOOL_RETRY_SECONDS', 30))
+    
+    # 專案記錄儲存配置
+    # 超過此大小（bytes）的 input_ad / result_advice 以 zlib 壓縮儲存
+    RECORD_COMPRESS_MIN_BYTES = int(os.getenv('RECORD_COMPRESS_MIN_BYTES', 512))
+    RECORD_COMPRESS_LEVEL = int(os.getenv('RECORD_COMPRESS_LEVEL', 6))
+    # project_record 集合建立時使用的 WiredTiger 區塊壓縮演算法（snappy / zlib / zstd）
+    RECORD_BLOCK_COMPRESSOR = os.getenv('RECORD_BLOCK_COMPRESSOR', 'zstd')
+    
+    # 靜態資源建置輸出（scripts/build_assets.py）；存在 manifest 時模板改用雜湊後的檔案
+    ASSETS_ENABLED = os.getenv('ASSETS_ENABLED', 'true').lower() == 'true'
+    ASSET_DIST_DIR = './static/dist'
+    ASSET_MANIFEST_PATH = './static/dist/manifest.json'
     
     # 法律文件路徑
     LAW_DOC_PATH = './static/doc/醫療廣告法規完整指南.txt'
+    # 法規更新後重新評估記錄的速率上限（每分鐘筆數，見 scripts/reevaluate_records.py）
+    REEVALUATION_RATE_PER_MINUTE = float(os.getenv('REEVALUATION_RATE_PER_MINUTE', 10))
     
     # Flask 運行配置
     HOST = '0.0.0.0'
@@ -0,0 +1,105 @@
+"""
+資料庫連接模組
+"""
+import pymongo
+from config import Config
+
+
+class Database:
+    """資料庫連接類別"""
+    
+    def __init__(self):
+        self.client = None
+        self.db = None
+        self._connect()
+    
+    def _create_client(self):
+        """依 DATABASE_BACKEND 建立 MongoClient 或記憶體資料庫用戶端"""
+        if Config.DATABASE_BACKEND == 'memory':
+            from database.memory import MemoryClient
+            return MemoryClient()
+        if Config.DATABASE_BACKEND != 'mongodb':
+            raise ValueError(f"不支援的 DATABASE_BACKEND: {Config.DATABASE_BACKEND}（可用 mongodb 或 memory）")
+        return pymongo.MongoClient(Config.MONGODB_URI)
+    
+    def _connect(self):
+        """連接到 MongoDB"""
+        try:
+            self.client = self._create_client()
+            self.db = self.client[Config.MONGODB_DB_NAME]
+            # 測試連接
+            self.client.admin.command('ping')
+            if Config.DATABASE_BACKEND == 'memory':
+                print(f"使用記憶體資料庫: {Config.MONGODB_DB_NAME}（資料不會保存）")
+            else:
+                print(f"成功連接到 MongoDB: {Config.MONGODB_DB_NAME}")
+            self._ensure_collections()
+            self._ensure_indexes()
+        except Exception as e:
+            print(f"MongoDB 連接失敗: {e}")
+            raise
+    
+    def _ensure_collections(self):
+        """建立需要特殊儲存設定的集合（已存在的集合不受影響）"""
+        existing = set(self.db.list_collection_names())
+        if 'project_record' not in existing:
+            try:
+                # 記錄中的長文字重複性高，使用區塊壓縮降低儲存空間與快取佔用
+                self.db.create_collection(
+                    'project_record',
+                    storageEngine={
+                        'wiredTiger': {
+                            'configString': f'block_compressor={Config.RECORD_BLOCK_COMPRESSOR}'
+                        }
+                    }
+                )
+            except Exception as e:
+                print(f"建立 project_record 集合時發生錯誤: {e}")
+    
+    def _ensure_indexes(self):
+        """建立查詢所需的索引（索引已存在時不會重複建立）"""
+        try:
+            self.db['project'].create_index([('user_id', 1), ('created_at', -1)])
+            self.db['project_record'].create_index([('project_id', 1), ('_id', -1)])
+            # 以用戶限定範圍的記錄查詢（user_id 冗餘儲存於記錄，見 scripts/backfill_record_owner.py）
+            self.db['project_record'].create_index([('user_id', 1), ('project_id', 1), ('_id', -1)])
+            self.db['project_record'].create_index([('project_id', 1), ('created_at', 1)])
+            self.db['project_record'].create_index(
+                [('project_id', 1), ('idempotency_keys', 1)],
+                unique=True,
+                partialFilterExpression={'idempotency_keys': {'$exists': True}}
+            )
+            self.db['report'].create_index([('user_id', 1), ('_id', -1)])
+            # 檢測記錄搜尋索引（見 models/search_index_model.py）
+            self.db['record_search'].create_index([('user_id', 1), ('terms', 1)])
+            self.db['record_search'].create_index([('user_id', 1), ('_id', -1)])
+            self.db['record_search'].create_index([('project_id', 1)])
+            # 速率限制視窗在最後一次請求超過一個視窗後自動刪除（見 models/rate_limit_model.py）
+            self.db['rate_limit'].create_index('expires_at', expireAfterSeconds=0)
+        except Exception as e:
+            print(f"建立索引時發生錯誤: {e}")
+    
+    def reconnect(self):
+        """
+        重新建立連線（MongoClient 不能跨 fork 使用，gunicorn worker fork 後需在子行程重新連線）
+        """
+        if Config.DATABASE_BACKEND == 'memory':
+            # 記憶體資料庫沒有連線，fork 後各 worker 保有 master 資料的複本
+            return
+        self.close()
+        self.client = pymongo.MongoClient(Config.MONGODB_URI)
+        self.db = self.client[Config.MONGODB_DB_NAME]
+    
+    def get_collection(self, collection_name):
+        """獲取集合"""
+        return self.db[collection_name]
+    
+    def close(self):
+        """關閉資料庫連接"""
+        if self.client:
+            self.client.close()
+            self.client = None
+
+
+# 建立全域資料庫實例
+db = Database()
@@ -0,0 +1,821 @@
+"""
+記憶體資料庫後端（DATABASE_BACKEND=memory）
+
+以 dict 實作模型使用到的 pymongo 集合 API 子集（查詢運算子、更新運算子、排序、投影、
+唯一索引與聚合管線中的 $match / $sort / $limit / $project / $facet / $lookup / $group），
+回傳 pymongo 的結果與例外類別，模型與路由不需任何修改即可在沒有 MongoDB 的環境執行。
+
+資料只存在於目前的行程，重新啟動即消失；適用於開發、示範與效能測試。
+"""
+import copy
+import datetime
+import itertools
+import re
+import threading
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (
+    BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+)
+
+_MISSING = object()
+
+# 排序時不同型別的先後順序（與 MongoDB 的 BSON 比較順序一致）
+_TYPE_ORDER = [
+    (type(None), 1), (bool, 8), (int, 2), (float, 2), (str, 3), (dict, 4),
+    (list, 5), (bytes, 6), (ObjectId, 7), (datetime.datetime, 9)
+]
+
+# $type 運算子支援的型別名稱
+_TYPE_ALIASES = {
+    'string': str, 'objectId': ObjectId, 'date': datetime.datetime, 'bool': bool,
+    'int': int, 'long': int, 'double': float, 'array': list, 'object': dict, 'null': type(None)
+}
+
+
+def _type_rank(value):
+    for kind, rank in _TYPE_ORDER:
+        if isinstance(value, kind) and (kind is not int or not isinstance(value, bool)):
+            return rank
+    return 10
+
+
+class _SortKey:
+    """依 BSON 型別順序比較的排序鍵"""
+
+    __slots__ = ('rank', 'value')
+
+    def __init__(self, value):
+        self.rank = _type_rank(value)
+        if isinstance(value, dict):
+            value = [(key, _SortKey(item)) for key, item in value.items()]
+        elif isinstance(value, list):
+            value = [_SortKey(item) for item in value]
+        self.value = value
+
+    def __eq__(self, other):
+        return self.rank == other.rank and self.value == other.value
+
+    def __lt__(self, other):
+        if self.rank != other.rank:
+            return self.rank < other.rank
+        if self.value is None:
+            return False
+        return self.value < other.value
+
+
+def _get_path(doc, path):
+    """讀取欄位（支援 a.b、陣列索引 a.0 與陣列中的子文件）；欄位不存在時返回 _MISSING"""
+    value = doc
+    for part in path.split('.'):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit():
+            value = value[int(part)] if int(part) < len(value) else _MISSING
+        elif isinstance(value, list):
+            values = [item.get(part, _MISSING) for item in value if isinstance(item, dict)]
+            value = [item for item in values if item is not _MISSING] or _MISSING
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+
+def _set_path(doc, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc, path):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _candidates(value):
+    """比較時的候選值：陣列欄位同時比較整個陣列與其中每個元素"""
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+
+def _compare(value, operand, op):
+    if value is _MISSING or value is None or operand is None:
+        return False
+    if _type_rank(value) != _type_rank(operand):
+        return False
+    return op(value, operand)
+
+
+_COMPARISONS = {
+    '$lt': lambda a, b: a < b,
+    '$lte': lambda a, b: a <= b,
+    '$gt': lambda a, b: a > b,
+    '$gte': lambda a, b: a >= b,
+}
+
+
+def _match_operator(value, op, operand):
+    if op == '$eq':
+        return _match_value(value, operand)
+    if op == '$ne':
+        return not _match_value(value, operand)
+    if op in _COMPARISONS:
+        return any(_compare(item, operand, _COMPARISONS[op]) for item in _candidates(value))
+    if op == '$in':
+        return any(_match_value(value, item) for item in operand)
+    if op == '$nin':
+        return not any(_match_value(value, item) for item in operand)
+    if op == '$exists':
+        return (value is not _MISSING) == bool(operand)
+    if op == '$all':
+        return isinstance(value, list) and all(item in value for item in operand)
+    if op == '$size':
+        return isinstance(value, list) and len(value) == operand
+    if op == '$type':
+        kinds = operand if isinstance(operand, list) else [operand]
+        return value is not _MISSING and any(
+            isinstance(value, _TYPE_ALIASES[kind]) and not (kind in ('int', 'long') and isinstance(value, bool))
+            for kind in kinds
+        )
+    if op == '$regex':
+        return isinstance(value, str) and re.search(operand, value) is not None
+    if op == '$elemMatch':
+        return isinstance(value, list) and any(
+            isinstance(item, dict) and _matches(item, operand) for item in value
+        )
+    raise OperationFailure(f'記憶體資料庫不支援查詢運算子 {op}')
+
+
+def _match_value(value, condition):
+    """欄位值是否符合條件（運算子字典或等值；陣列欄位包含該值也算符合）"""
+    if isinstance(condition, dict) and condition and all(key.startswith('$') for key in condition):
+        return all(_match_operator(value, op, operand) for op, operand in condition.items())
+    if isinstance(condition, re.Pattern):
+        return any(isinstance(item, str) and condition.search(item) for item in _candidates(value))
+    if value is _MISSING:
+        return condition is None
+    return any(item == condition for item in _candidates(value))
+
+
+def _matches(doc, query, variables=None):
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(_matches(doc, sub, variables) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(_matches(doc, sub, variables) for sub in condition):
+                return False
+        elif key == '$nor':
+            if any(_matches(doc, sub, variables) for sub in condition):
+                return False
+        elif key == '$expr':
+            if not _evaluate(condition, doc, variables or {}):
+                return False
+        elif not _match_value(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _evaluate(expression, doc, variables):
+    """計算聚合運算式（欄位參照、$$變數與模型使用到的運算子）"""
+    if isinstance(expression, str):
+        if expression.startswith('$$'):
+            name, _, path = expression[2:].partition('.')
+            value = variables.get(name, _MISSING)
+            return _get_path(value, path) if path and value is not _MISSING else value
+        if expression.startswith('$'):
+            return _get_path(doc, expression[1:])
+        return expression
+    if isinstance(expression, list):
+        return [_evaluate(item, doc, variables) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if len(expression) == 1:
+        op, operand = next(iter(expression.items()))
+        if op == '$literal':
+            return operand
+        if op.startswith('$'):
+            args = _evaluate(operand, doc, variables)
+            if op == '$eq':
+                return args[0] == args[1]
+            if op == '$ne':
+                return args[0] != args[1]
+            if op in _COMPARISONS:
+                return _compare(args[0], args[1], _COMPARISONS[op])
+            if op == '$size':
+                if not isinstance(args, list):
+                    raise OperationFailure('$size 的參數必須是陣列')
+                return len(args)
+            if op == '$setIntersection':
+                first = args[0] if isinstance(args[0], list) else []
+                return [item for item in dict.fromkeys(first) if all(item in (other or []) for other in args[1:])]
+            if op == '$ifNull':
+                return next((arg for arg in args if arg is not _MISSING and arg is not None), None)
+            raise OperationFailure(f'記憶體資料庫不支援運算式 {op}')
+    return {key: _evaluate(value, doc, variables) for key, value in expression.items()}
+
+
+def _project_fields(value, fields):
+    """包含式投影（fields 為 {欄位: 子欄位集合或 None}，支援陣列中的子文件）"""
+    if isinstance(value, list):
+        return [_project_fields(item, fields) for item in value if isinstance(item, dict)]
+    if not isinstance(value, dict):
+        return value
+    projected = {}
+    for key, sub in fields.items():
+        if key not in value:
+            continue
+        projected[key] = value[key] if sub is None else _project_fields(value[key], sub)
+    return projected
+
+
+def _apply_projection(doc, projection, variables=None):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+
+    include_id = projection.get('_id', 1) not in (0, False)
+    specs = {key: spec for key, spec in projection.items() if key != '_id'}
+
+    # 只有排除欄位（或只排除 _id）時為排除式投影；只指定 {'_id': 1} 時只返回 _id
+    if all(spec in (0, False) for spec in specs.values()) and (specs or not include_id):
+        result = copy.deepcopy(doc)
+        for key in specs:
+            _unset_path(result, key)
+        if not include_id:
+            result.pop('_id', None)
+        return result
+
+    tree, computed = {}, {}
+    for key, spec in specs.items():
+        if spec in (1, True):
+            node = tree
+            parts = key.split('.')
+            for part in parts[:-1]:
+                node = node.setdefault(part, {})
+                if node is None:
+                    # 上層欄位已整個包含
+                    break
+            else:
+                node[parts[-1]] = None
+        elif spec not in (0, False):
+            computed[key] = _evaluate(spec, doc, variables or {})
+
+    result = _project_fields(doc, tree) if tree else {}
+    if include_id and '_id' in doc:
+        result = dict({'_id': doc['_id']}, **result)
+    for key, value in computed.items():
+        if value is not _MISSING:
+            _set_path(result, key, value)
+    return copy.deepcopy(result)
+
+
+def _sort_spec(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return list(key_or_list)
+
+
+def _sort_value(doc, field):
+    value = _get_path(doc, field)
+    return _SortKey(None if value is _MISSING else value)
+
+
+def _sort_docs(docs, spec):
+    # 依次要鍵值往主要鍵值穩定排序
+    for field, direction in reversed(spec):
+        docs.sort(key=lambda doc: _sort_value(doc, field), reverse=direction == -1)
+    return docs
+
+
+def _apply_update(doc, update, inserting=False):
+    """套用更新運算子；返回文件是否有變更"""
+    before = copy.deepcopy(doc)
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == '$set':
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == '$setOnInsert':
+                if inserting:
+                    _set_path(doc, path, copy.deepcopy(value))
+            elif op == '$unset':
+                _unset_path(doc, path)
+            elif op == '$inc':
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op in ('$addToSet', '$push'):
+                current = _get_path(doc, path)
+                items = [] if current is _MISSING else current
+                values = value['$each'] if isinstance(value, dict) and '$each' in value else [value]
+                for item in values:
+                    if op == '$push' or item not in items:
+                        items.append(copy.deepcopy(item))
+                if op == '$push' and isinstance(value, dict) and '$slice' in value:
+                    limit = value['$slice']
+                    items = items[limit:] if limit < 0 else items[:limit]
+                _set_path(doc, path, items)
+            elif op == '$pull':
+                current = _get_path(doc, path)
+                if isinstance(current, list):
+                    _set_path(doc, path, [item for item in current if not _match_value(item, value)])
+            else:
+                raise OperationFailure(f'記憶體資料庫不支援更新運算子 {op}')
+    return doc != before
+
+
+def _upsert_seed(query):
+    """upsert 時以查詢中的等值條件作為新文件的初始欄位"""
+    seed = {}
+    for key, condition in query.items():
+        if key.startswith('$'):
+            continue
+        if isinstance(condition, dict) and any(op.startswith('$') for op in condition):
+            if '$eq' in condition:
+                _set_path(seed, key, copy.deepcopy(condition['$eq']))
+            continue
+        _set_path(seed, key, copy.deepcopy(condition))
+    return seed
+
+
+class _UniqueIndex:
+    """唯一索引（鍵值組合對應到文件鍵值）"""
+
+    def __init__(self, name, keys, partial_filter):
+        self.name = name
+        self.keys = keys
+        self.partial_filter = partial_filter
+        self.entries = {}
+
+    def key_values(self, doc):
+        """文件在此索引中的鍵值組合（陣列欄位展開為多個鍵值）；不在部分索引範圍內時返回空集合"""
+        if self.partial_filter and not _matches(doc, self.partial_filter):
+            return set()
+        values = []
+        for field in self.keys:
+            value = _get_path(doc, field)
+            if value is _MISSING:
+                value = None
+            items = value if isinstance(value, list) and value else [value]
+            values.append([repr(item) for item in items])
+        return set(itertools.product(*values))
+
+    def conflicts(self, doc, doc_key):
+        return any(self.entries.get(value, doc_key) != doc_key for value in self.key_values(doc))
+
+    def add(self, doc, doc_key):
+        for value in self.key_values(doc):
+            self.entries[value] = doc_key
+
+    def remove(self, doc):
+        for value in self.key_values(doc):
+            self.entries.pop(value, None)
+
+
+class MemoryCursor:
+    """find() 回傳的游標（sort / skip / limit 在開始讀取前設定）"""
+
+    def __init__(self, collection, query, projection):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def close(self):
+        self._iterator = iter(())
+
+    def _results(self):
+        docs = self._collection._find_docs(self._query)
+        if self._sort:
+            _sort_docs(docs, self._sort)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:abs(self._limit)]
+        return [_apply_projection(copy.deepcopy(doc), self._projection) for doc in docs]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._iterator is None:
+            self._iterator = iter(self._results())
+        return next(self._iterator)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryCollection:
+    """記憶體中的集合（以 _id 為鍵的 dict，寫入依插入順序保存）"""
+
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._docs = {}
+        self._unique_indexes = []
+        self._lock = database.lock
+
+    # --- 內部工具 ---
+
+    def _find_docs(self, query):
+        query = query or {}
+        with self._lock:
+            # 以 _id 等值或 $in 查詢時直接取出文件，不掃描整個集合
+            condition = query.get('_id', _MISSING)
+            if isinstance(condition, dict) and set(condition) == {'$in'}:
+                docs = [self._docs.get(key) for key in dict.fromkeys(repr(value) for value in condition['$in'])]
+            elif condition is not _MISSING and not isinstance(condition, (dict, re.Pattern)):
+                docs = [self._docs.get(repr(condition))]
+            else:
+                docs = self._docs.values()
+            return [doc for doc in docs if doc is not None and _matches(doc, query)]
+
+    def _check_unique(self, doc, doc_key):
+        for index in self._unique_indexes:
+            if index.conflicts(doc, doc_key):
+                raise DuplicateKeyError(
+                    f'E11000 duplicate key error collection: {self.name} index: {index.name}', 11000
+                )
+
+    def _store(self, doc_key, doc, previous=None):
+        """寫入文件並更新唯一索引（previous 為被取代的舊文件）"""
+        self._check_unique(doc, doc_key)
+        if previous is not None:
+            for index in self._unique_indexes:
+                index.remove(previous)
+        for index in self._unique_indexes:
+            index.add(doc, doc_key)
+        self._docs[doc_key] = doc
+
+    def _remove(self, doc):
+        for index in self._unique_indexes:
+            index.remove(doc)
+        del self._docs[repr(doc['_id'])]
+
+    def _insert(self, doc):
+        if '_id' not in doc:
+            doc['_id'] = ObjectId()
+        doc_key = repr(doc['_id'])
+        if doc_key in self._docs:
+            raise DuplicateKeyError(f'E11000 duplicate key error collection: {self.name} index: _id_', 11000)
+        # 與 MongoDB 相同，儲存的文件以 _id 為第一個欄位
+        self._store(doc_key, copy.deepcopy(dict({'_id': doc['_id']}, **doc)))
+        return doc['_id']
+
+    def _first(self, query, sort=None):
+        docs = self._find_docs(query)
+        if sort:
+            _sort_docs(docs, _sort_spec(sort))
+        return docs[0] if docs else None
+
+    def _update(self, query, update, upsert=False, multi=False, replace=False, sort=None):
+        """
+        Returns:
+            (matched, modified, upserted_id, 更新前文件, 更新後文件)
+        """
+        if not replace and (not update or not all(key.startswith('$') for key in update)):
+            raise ValueError('update 只能包含更新運算子')
+        if replace and any(key.startswith('$') for key in update):
+            raise ValueError('replacement 不能包含更新運算子')
+
+        with self._lock:
+            docs = self._find_docs(query)
+            if sort:
+                _sort_docs(docs, _sort_spec(sort))
+            if not multi:
+                docs = docs[:1]
+
+            if not docs:
+                if not upsert:
+                    return 0, 0, None, None, None
+                doc = _upsert_seed(query)
+                if replace:
+                    doc = dict({'_id': doc['_id']} if '_id' in doc else {}, **copy.deepcopy(update))
+                else:
+                    _apply_update(doc, update, inserting=True)
+                upserted_id = self._insert(doc)
+                return 0, 0, upserted_id, None, copy.deepcopy(self._docs[repr(upserted_id)])
+
+            modified = 0
+            before = after = None
+            for doc in docs:
+                updated = copy.deepcopy(doc)
+                if replace:
+                    updated = dict({'_id': doc['_id']}, **copy.deepcopy(update))
+                    changed = updated != doc
+                else:
+                    changed = _apply_update(updated, update)
+                if changed:
+                    self._store(repr(doc['_id']), updated, previous=doc)
+                    modified += 1
+                if before is None:
+                    before, after = copy.deepcopy(doc), copy.deepcopy(updated)
+            return len(docs), modified, None, before, after
+
+    # --- pymongo Collection API ---
+
+    def find(self, filter=None, projection=None, sort=None, limit=0, skip=0, batch_size=0, **kwargs):
+        cursor = MemoryCursor(self, filter, projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    def find_one(self, filter=None, projection=None, sort=None, **kwargs):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        doc = self._first(filter, sort)
+        return _apply_projection(copy.deepcopy(doc), projection) if doc else None
+
+    def insert_one(self, document, **kwargs):
+        with self._lock:
+            return InsertOneResult(self._insert(document), True)
+
+    def insert_many(self, documents, ordered=True, **kwargs):
+        inserted_ids, errors = [], []
+        with self._lock:
+            for index, document in enumerate(documents):
+                try:
+                    inserted_ids.append(self._insert(document))
+                except DuplicateKeyError as e:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': str(e), 'op': document})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({
+                'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(inserted_ids),
+                'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []
+            })
+        return InsertManyResult(inserted_ids, True)
+
+    def update_one(self, filter, update, upsert=False, **kwargs):
+        matched, modified, upserted_id, _, _ = self._update(filter, update, upsert=upsert)
+        raw = {'n': matched or (1 if upserted_id else 0), 'nModified': modified}
+        if upserted_id is not None:
+            raw['upserted'] = upserted_id
+        return UpdateResult(raw, True)
+
+    def update_many(self, filter, update, upsert=False, **kwargs):
+        matched, modified, upserted_id, _, _ = self._update(filter, update, upsert=upsert, multi=True)
+        raw = {'n': matched or (1 if upserted_id else 0), 'nModified': modified}
+        if upserted_id is not None:
+            raw['upserted'] = upserted_id
+        return UpdateResult(raw, True)
+
+    def replace_one(self, filter, replacement, upsert=False, **kwargs):
+        matched, modified, upserted_id, _, _ = self._update(filter, replacement, upsert=upsert, replace=True)
+        raw = {'n': matched or (1 if upserted_id else 0), 'nModified': modified}
+        if upserted_id is not None:
+            raw['upserted'] = upserted_id
+        return UpdateResult(raw, True)
+
+    def find_one_and_update(self, filter, update, projection=None, sort=None, upsert=False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        _, _, _, before, after = self._update(filter, update, upsert=upsert, sort=sort)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return _apply_projection(doc, projection) if doc else None
+
+    def delete_one(self, filter, **kwargs):
+        with self._lock:
+            doc = self._first(filter)
+            if doc is None:
+                return DeleteResult({'n': 0}, True)
+            self._remove(doc)
+            return DeleteResult({'n': 1}, True)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            docs = self._find_docs(filter)
+            for doc in docs:
+                self._remove(doc)
+            return DeleteResult({'n': len(docs)}, True)
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        """支援 InsertOne / UpdateOne / UpdateMany / ReplaceOne / DeleteOne / DeleteMany"""
+        counts = {'nInserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'nUpserted': 0}
+        upserted = []
+        with self._lock:
+            for index, request in enumerate(requests):
+                kind = type(request).__name__
+                if kind == 'InsertOne':
+                    self._insert(request._doc)
+                    counts['nInserted'] += 1
+                    continue
+                if kind in ('DeleteOne', 'DeleteMany'):
+                    method = self.delete_one if kind == 'DeleteOne' else self.delete_many
+                    counts['nRemoved'] += method(request._filter).deleted_count
+                    continue
+                matched, modified, upserted_id, _, _ = self._update(
+                    request._filter, request._doc, upsert=request._upsert,
+                    multi=kind == 'UpdateMany', replace=kind == 'ReplaceOne'
+                )
+                counts['nMatched'] += matched
+                counts['nModified'] += modified
+                if upserted_id is not None:
+                    counts['nUpserted'] += 1
+                    upserted.append({'index': index, '_id': upserted_id})
+        return BulkWriteResult(dict(counts, upserted=upserted, writeErrors=[], writeConcernErrors=[]), True)
+
+    def count_documents(self, filter, **kwargs):
+        return len(self._find_docs(filter))
+
+    def estimated_document_count(self, **kwargs):
+        with self._lock:
+            return len(self._docs)
+
+    def distinct(self, key, filter=None, **kwargs):
+        values = []
+        for doc in self._find_docs(filter):
+            value = _get_path(doc, key)
+            for item in value if isinstance(value, list) else [value]:
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    def create_index(self, keys, unique=False, partialFilterExpression=None, name=None, **kwargs):
+        spec = _sort_spec(keys, 1)
+        name = name or '_'.join(f'{field}_{direction}' for field, direction in spec)
+        if unique:
+            with self._lock:
+                if not any(index.name == name for index in self._unique_indexes):
+                    index = _UniqueIndex(name, [field for field, _ in spec], partialFilterExpression)
+                    for doc_key, doc in self._docs.items():
+                        if index.conflicts(doc, doc_key):
+                            raise DuplicateKeyError(f'E11000 duplicate key error index: {name}', 11000)
+                        index.add(doc, doc_key)
+                    self._unique_indexes.append(index)
+        return name
+
+    def aggregate(self, pipeline, **kwargs):
+        return iter(self.database._run_pipeline(self._find_docs({}), pipeline))
+
+    def watch(self, *args, **kwargs):
+        return self.database.watch(*args, **kwargs)
+
+
+class MemoryDatabase:
+    """記憶體中的資料庫"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.RLock()
+        self._collections = {}
+
+    def __getitem__(self, name):
+        return self.get_collection(name)
+
+    def get_collection(self, name, **kwargs):
+        with self.lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(self, name)
+            return self._collections[name]
+
+    def create_collection(self, name, **kwargs):
+        return self.get_collection(name)
+
+    def list_collection_names(self, **kwargs):
+        with self.lock:
+            return list(self._collections)
+
+    def drop_collection(self, name):
+        with self.lock:
+            self._collections.pop(name, None)
+
+    def command(self, command, *args, **kwargs):
+        if command == 'ping':
+            return {'ok': 1.0}
+        raise OperationFailure(f'記憶體資料庫不支援指令 {command}')
+
+    def watch(self, *args, **kwargs):
+        # 與單機 MongoDB 相同：不支援 change stream（即時推播改為行程內通知）
+        raise OperationFailure('The $changeStream stage is only supported on replica sets', 40573)
+
+    def _run_pipeline(self, docs, pipeline, variables=None):
+        docs = [copy.deepcopy(doc) for doc in docs]
+        variables = variables or {}
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == '$match':
+                docs = [doc for doc in docs if _matches(doc, spec, variables)]
+            elif name == '$sort':
+                docs = _sort_docs(docs, _sort_spec(spec))
+            elif name == '$limit':
+                docs = docs[:spec]
+            elif name == '$skip':
+                docs = docs[spec:]
+            elif name == '$project':
+                docs = [_apply_projection(doc, spec, variables) for doc in docs]
+            elif name == '$facet':
+                docs = [{key: self._run_pipeline(docs, sub, variables) for key, sub in spec.items()}]
+            elif name == '$lookup':
+                docs = [self._lookup(doc, spec) for doc in docs]
+            elif name == '$group':
+                docs = self._group(docs, spec, variables)
+            elif name == '$count':
+                docs = [{spec: len(docs)}] if docs else []
+            else:
+                raise OperationFailure(f'記憶體資料庫不支援聚合階段 {name}')
+        return docs
+
+    def _lookup(self, doc, spec):
+        foreign = self.get_collection(spec['from'])._find_docs({})
+        if 'localField' in spec:
+            local = _get_path(doc, spec['localField'])
+            foreign = [other for other in foreign
+                       if _match_value(_get_path(other, spec['foreignField']),
+                                       {'$in': local} if isinstance(local, list) else local)]
+        if 'pipeline' in spec:
+            variables = {key: _evaluate(value, doc, {}) for key, value in spec.get('let', {}).items()}
+            foreign = self._run_pipeline(foreign, spec['pipeline'], variables)
+        doc[spec['as']] = copy.deepcopy(foreign)
+        return doc
+
+    def _group(self, docs, spec, variables):
+        groups = {}
+        for doc in docs:
+            key = _evaluate(spec['_id'], doc, variables)
+            key = None if key is _MISSING else key
+            group = groups.setdefault(repr(key), {'_id': key, '_docs': []})
+            group['_docs'].append(doc)
+
+        results = []
+        for group in groups.values():
+            result = {'_id': group['_id']}
+            for field, accumulator in spec.items():
+                if field == '_id':
+                    continue
+                (op, expression), = accumulator.items()
+                values = [_evaluate(expression, doc, variables) for doc in group['_docs']]
+                values = [value for value in values if value is not _MISSING]
+                if op == '$sum':
+                    result[field] = sum(value for value in values if isinstance(value, (int, float)))
+                elif op == '$first':
+                    result[field] = values[0] if values else None
+                elif op == '$max':
+                    result[field] = max(values) if values else None
+                elif op == '$min':
+                    result[field] = min(values) if values else None
+                elif op == '$push':
+                    result[field] = values
+                else:
+                    raise OperationFailure(f'記憶體資料庫不支援累加運算子 {op}')
+            results.append(result)
+        return results
+
+
+class _MemoryAdmin:
+    def command(self, command, *args, **kwargs):
+        if command == 'ping':
+            return {'ok': 1.0}
+        raise OperationFailure(f'記憶體資料庫不支援指令 {command}')
+
+
+class MemoryClient:
+    """MongoClient 的記憶體替代（同一個用戶端的資料庫共用資料）"""
+
+    def __init__(self):
+        self.admin = _MemoryAdmin()
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._databases:
+                self._databases[name] = MemoryDatabase(name)
+            return self._databases[name]
+
+    def get_database(self, name, **kwargs):
+        return self[name]
+
+    def close(self):
+        pass
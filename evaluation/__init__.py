@@ -0,0 +1,3 @@
+"""
+檢測設定的離線評估（見 evaluation/run_eval.py）
+"""
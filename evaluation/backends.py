@@ -0,0 +1,124 @@
+"""
+評估用的檢測後端
+
+每個後端實作 analyze(ad_text, config)，返回
+{'verdict': 'violation' / 'compliant' / 'non_medical', 'articles': [引用條文], 'usage': token 用量}。
+新增後端時實作同一介面並登記到 BACKENDS。
+"""
+import threading
+from utils.law_index import law_index, normalize_article_ref
+from utils.law_version import classify_verdict, extract_cited_articles, relevant_articles
+from utils.text_utils import clean_markdown, html_to_text
+from utils.token_utils import new_usage, add_usage, estimate_tokens, trim_to_tokens
+
+
+def parse_law_result(law_text):
+    """由 4 點分析結果取出判斷結果與引用條文（與搜尋索引使用相同的規則）"""
+    conclusion = law_text.split('\n', 1)[0] if law_text else ''
+    return {
+        'verdict': classify_verdict(conclusion),
+        'articles': extract_cited_articles(law_text)
+    }
+
+
+def select_law_context(ad_text, mode):
+    """
+    依設定選擇提示詞中的法律文件內容
+
+    Args:
+        mode: 'full'（全文）或 'relevant'（本地規則命中的條文，未命中時為核心條文）
+    """
+    if mode == 'full':
+        return law_index.text
+    if mode == 'relevant':
+        articles = law_index.articles
+        names = [name for name in articles if name in relevant_articles(ad_text, [])]
+        return '\n'.join(f'{name}\t{articles[name]}' for name in names)
+    raise ValueError(f'不支援的 law_context: {mode}')
+
+
+class LintBackend:
+    """只使用本地即時檢查規則（不呼叫 Gemini，作為成本為零的基準）"""
+
+    def analyze(self, ad_text, config):
+        from utils.lint_utils import lint_matcher
+
+        articles = []
+        for match in lint_matcher.lint(ad_text):
+            name = normalize_article_ref(match['article'])
+            if name not in articles:
+                articles.append(name)
+        return {
+            'verdict': 'violation' if articles else 'compliant',
+            'articles': articles,
+            'usage': new_usage()
+        }
+
+
+class GeminiBackend:
+    """
+    以指定模型直接呼叫整則法律分析（不經模型池與重試，延遲與用量即為單次呼叫的數值）
+
+    設定欄位：model（未指定時使用模型池首選模型）、law_context（full / relevant）、
+    token_budget（提示詞 token 上限，超過時截斷法律文件）
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _model(self, name):
+        # 延遲載入：只有使用此後端時才建立模型池
+        from utils.gemini_service import gemini_service
+        import google.generativeai as genai
+
+        if not name:
+            return gemini_service.model
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def analyze(self, ad_text, config):
+        from utils.gemini_service import gemini_service
+
+        law_context = select_law_context(ad_text, config.get('law_context', 'full'))
+        budget = config.get('token_budget')
+        if budget:
+            overhead = estimate_tokens(gemini_service._build_law_prompt(ad_text, ''))
+            law_context = trim_to_tokens(law_context, max(0, budget - overhead))
+
+        usage = new_usage()
+        response = self._model(config.get('model')).generate_content(
+            gemini_service._build_law_prompt(ad_text, law_context)
+        )
+        add_usage(usage, response)
+
+        result = parse_law_result(clean_markdown(response.text).strip())
+        result['usage'] = usage
+        return result
+
+
+class PipelineBackend:
+    """
+    正式環境的完整檢測流程（run_detection：模型池、逐句分析、長篇分塊與修改建議，需要 MongoDB）
+
+    設定欄位：incremental（是否使用逐句增量分析，未指定時依 INCREMENTAL_ANALYSIS_ENABLED）、
+    long_document（是否以長篇模式分析長篇案例，未指定時依 LONG_DOC_ENABLED）
+    """
+
+    def analyze(self, ad_text, config):
+        from utils.detect_service import run_detection
+
+        detection = run_detection(ad_text, incremental=config.get('incremental'),
+                                  long_document=config.get('long_document'))
+        result = parse_law_result(html_to_text(detection['result_law']))
+        result['usage'] = detection['token_usage']
+        return result
+
+
+BACKENDS = {
+    'lint': LintBackend,
+    'gemini': GeminiBackend,
+    'pipeline': PipelineBackend
+}
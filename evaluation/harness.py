@@ -0,0 +1,192 @@
+"""
+離線評估：以標記好的廣告資料集比較不同檢測設定的準確度、延遲與 token 成本
+
+資料集（golden.jsonl）每行一筆：{"id", "ad", "expected": violation / compliant / non_medical, "articles": [預期條文]}。
+設定（configs.json）每筆包含 name、backend（見 evaluation.backends.BACKENDS）與該後端的參數。
+"""
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from evaluation.backends import BACKENDS
+
+VERDICTS = ('violation', 'compliant', 'non_medical')
+
+
+def load_dataset(path):
+    """讀取評估資料集（JSONL）"""
+    cases = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            if case.get('expected') not in VERDICTS:
+                raise ValueError(f'{path} 第 {line_no} 行的 expected 必須是 {"/".join(VERDICTS)}')
+            case.setdefault('articles', [])
+            cases.append(case)
+    return cases
+
+
+def load_configs(path, names=None):
+    """讀取評估設定；指定 names 時只保留這些設定（依 names 的順序）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    for config in configs:
+        if config.get('backend') not in BACKENDS:
+            raise ValueError(f"設定 {config.get('name')} 使用了不支援的後端: {config.get('backend')}")
+    if not names:
+        return configs
+    by_name = {config['name']: config for config in configs}
+    missing = [name for name in names if name not in by_name]
+    if missing:
+        raise ValueError(f"找不到設定: {', '.join(missing)}")
+    return [by_name[name] for name in names]
+
+
+def percentile(values, p):
+    """最近秩百分位數（values 為空時返回 None）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _run_case(backend, config, case):
+    start = time.perf_counter()
+    try:
+        outcome = backend.analyze(case['ad'], config)
+        error = None
+    except Exception as e:
+        outcome, error = None, str(e)[:200]
+    latency_ms = (time.perf_counter() - start) * 1000
+
+    result = {'id': case['id'], 'expected': case['expected'], 'latency_ms': latency_ms, 'error': error}
+    if outcome is not None:
+        result.update(
+            verdict=outcome['verdict'],
+            articles=outcome['articles'],
+            correct_articles=[name for name in outcome['articles'] if name in case['articles']],
+            usage=outcome['usage']
+        )
+    return result
+
+
+def run_evaluation(configs, cases, workers=4):
+    """
+    並行執行所有設定與案例的組合
+
+    Returns:
+        {設定名稱: [案例結果, ...]}（案例順序與資料集相同）
+    """
+    backends = {}
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='evaluation') as executor:
+        for config in configs:
+            backend = backends.setdefault(config['backend'], BACKENDS[config['backend']]())
+            for case in cases:
+                futures.append((config['name'], executor.submit(_run_case, backend, config, case)))
+
+    results = {config['name']: [] for config in configs}
+    for name, future in futures:
+        results[name].append(future.result())
+    return results
+
+
+def summarize(name, case_results):
+    """
+    計算單一設定的指標
+
+    - accuracy：判斷結果正確的比例（呼叫失敗視為錯誤）
+    - article_precision：引用的條文中屬於預期條文的比例
+    - article_recall：違法案例中至少引用一條預期條文的比例
+    - latency / tokens：成功呼叫的延遲百分位數與平均每次檢測的 token 用量
+    """
+    total = len(case_results)
+    succeeded = [result for result in case_results if result['error'] is None]
+    correct = sum(1 for result in succeeded if result['verdict'] == result['expected'])
+
+    cited = sum(len(result['articles']) for result in succeeded)
+    cited_correct = sum(len(result['correct_articles']) for result in succeeded)
+    violations = [result for result in case_results if result['expected'] == 'violation']
+    violations_hit = sum(1 for result in violations if result.get('correct_articles'))
+
+    per_class = {}
+    for verdict in VERDICTS:
+        expected = [result for result in case_results if result['expected'] == verdict]
+        if expected:
+            per_class[verdict] = sum(1 for result in expected if result.get('verdict') == verdict) / len(expected)
+
+    latencies = [result['latency_ms'] for result in succeeded]
+    count = len(succeeded) or 1
+
+    def average_usage(field):
+        return sum(result['usage'].get(field, 0) for result in succeeded) / count
+
+    return {
+        'name': name,
+        'cases': total,
+        'errors': total - len(succeeded),
+        'accuracy': correct / total if total else None,
+        'per_class_accuracy': per_class,
+        'article_precision': cited_correct / cited if cited else None,
+        'article_recall': violations_hit / len(violations) if violations else None,
+        'latency_p50_ms': percentile(latencies, 50),
+        'latency_p95_ms': percentile(latencies, 95),
+        'calls_per_request': average_usage('calls'),
+        'prompt_tokens_per_request': average_usage('prompt_tokens'),
+        'response_tokens_per_request': average_usage('response_tokens'),
+        'total_tokens_per_request': average_usage('total_tokens')
+    }
+
+
+def recommend(summaries, tolerance=0.02):
+    """
+    選出準確度不低於最佳設定減 tolerance 的設定中，平均 token 用量最少者（相同時取 p50 延遲較低者）
+
+    Returns:
+        設定名稱；沒有可比較的設定時返回 None
+    """
+    candidates = [summary for summary in summaries if summary['accuracy'] is not None and not summary['errors']]
+    if not candidates:
+        return None
+    best = max(summary['accuracy'] for summary in candidates)
+    eligible = [summary for summary in candidates if summary['accuracy'] >= best - tolerance]
+    return min(eligible, key=lambda summary: (
+        summary['total_tokens_per_request'], summary['latency_p50_ms'] or 0
+    ))['name']
+
+
+def format_report(summaries, recommended=None):
+    """Markdown 比較表"""
+    def fmt(value, pattern='{:.1%}'):
+        return '-' if value is None else pattern.format(value)
+
+    lines = [
+        '| 設定 | 準確度 | 條文精確率 | 條文召回率 | p50 延遲 | p95 延遲 | 平均 tokens | 呼叫次數 | 失敗 |',
+        '| --- | ---: | ---: | ---: | ---: | ---: | ---: | ---: | ---: |'
+    ]
+    for summary in summaries:
+        name = summary['name'] + (' ⭐' if summary['name'] == recommended else '')
+        lines.append('| ' + ' | '.join([
+            name,
+            fmt(summary['accuracy']),
+            fmt(summary['article_precision']),
+            fmt(summary['article_recall']),
+            fmt(summary['latency_p50_ms'], '{:.0f} ms'),
+            fmt(summary['latency_p95_ms'], '{:.0f} ms'),
+            fmt(summary['total_tokens_per_request'], '{:.0f}'),
+            fmt(summary['calls_per_request'], '{:.1f}'),
+            str(summary['errors'])
+        ]) + ' |')
+    if recommended:
+        lines.append('')
+        lines.append(f'⭐ 建議設定：{recommended}（準確度在最佳設定容許範圍內且 token 用量最少）')
+    return '\n'.join(lines)
+
+
+def misclassified(case_results):
+    """判斷錯誤或呼叫失敗的案例"""
+    return [result for result in case_results
+            if result['error'] is not None or result['verdict'] != result['expected']]
@@ -0,0 +1,71 @@
+"""
+檢測設定離線評估
+
+以標記好的廣告資料集並行執行各設定，比較判斷準確度、條文引用精確率、p50/p95 延遲與每次檢測的 token 用量，
+並建議準確度在容許範圍內、成本最低的設定。修改提示詞、法律文件範圍或模型前後各執行一次即可比較。
+
+用法：
+    python evaluation/run_eval.py                                         # 執行 configs.json 中的所有設定
+    python evaluation/run_eval.py --configs lint-baseline flash-full-law  # 只執行指定設定
+    python evaluation/run_eval.py --workers 8 --output results.json      # 並行數與完整結果輸出
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from evaluation.harness import (  # noqa: E402
+    load_dataset, load_configs, run_evaluation, summarize, recommend, format_report, misclassified
+)
+
+EVALUATION_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='檢測設定離線評估')
+    parser.add_argument('--dataset', default=os.path.join(EVALUATION_DIR, 'golden.jsonl'), help='評估資料集（JSONL）')
+    parser.add_argument('--config-file', default=os.path.join(EVALUATION_DIR, 'configs.json'), help='評估設定檔')
+    parser.add_argument('--configs', nargs='+', help='只執行這些設定')
+    parser.add_argument('--workers', type=int, default=4, help='同時執行的檢測數（注意 API 配額）')
+    parser.add_argument('--tolerance', type=float, default=0.02, help='建議設定可接受的準確度差距')
+    parser.add_argument('--output', help='將指標與每個案例的結果寫入 JSON 檔')
+    parser.add_argument('--show-errors', action='store_true', help='列出判斷錯誤的案例')
+    args = parser.parse_args()
+    
+    cases = load_dataset(args.dataset)
+    configs = load_configs(args.config_file, args.configs)
+    print(f"資料集 {len(cases)} 筆，設定 {len(configs)} 組，並行數 {args.workers}")
+    
+    results = run_evaluation(configs, cases, workers=args.workers)
+    summaries = [summarize(name, case_results) for name, case_results in results.items()]
+    recommended = recommend(summaries, args.tolerance)
+    
+    print()
+    print(format_report(summaries, recommended))
+    
+    if args.show_errors:
+        ads = {case['id']: case['ad'] for case in cases}
+        for name, case_results in results.items():
+            wrong = misclassified(case_results)
+            if not wrong:
+                continue
+            print(f"\n{name} 判斷錯誤 {len(wrong)} 筆：")
+            for result in wrong:
+                actual = result['error'] or result['verdict']
+                print(f"  {result['id']} 預期 {result['expected']}，結果 {actual}：{ads[result['id']][:40]}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'dataset': args.dataset,
+                'recommended': recommended,
+                'summaries': summaries,
+                'results': results
+            }, f, ensure_ascii=False, indent=2)
+        print(f"\n完整結果已寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
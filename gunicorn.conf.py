@@ -0,0 +1,87 @@
+"""
+gunicorn 設定檔
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+所有設定都可以用環境變數覆寫。
+即時推播（SSE）連線由 gunicorn.push.conf.py 另外啟動的行程處理。
+"""
+import multiprocessing
+import os
+
+# API worker 預設不保持推播連線（每個連線會佔用一個執行緒，少數分頁就會佔滿 worker）；
+# 單機 MongoDB 沒有 change stream、無法使用獨立推播行程時，可設定少量連線在 API worker 處理
+os.environ.setdefault('PUSH_MAX_SUBSCRIBERS', '0')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5001')
+
+# 檢測請求大部分時間在等待 Gemini 回應，使用多執行緒 worker
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# 檢測公平佇列在各 worker 內，依 worker 數平分 DETECT_CONCURRENCY 等全域名額（見 utils/detect_service.py）
+os.environ['API_WORKERS'] = str(workers)
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# 在 master 載入應用程式，worker 以 copy-on-write 共用唯讀狀態（見 wsgi.py）
+preload_app = True
+
+# 單次檢測可能包含多次 Gemini 呼叫與重試
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 180))
+# 關閉 worker 時等待進行中的檢測完成的秒數
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 90))
+keepalive = 5
+
+# worker 處理一定數量的請求後重新啟動，加入隨機值避免所有 worker 同時重啟
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """記憶體資料庫的資料只存在於單一行程，多個 worker 會各自擁有一份資料而遺失其他 worker 的寫入"""
+    from config import Config
+    
+    if Config.DATABASE_BACKEND == 'memory' and server.cfg.workers > 1:
+        raise SystemExit(
+            f'DATABASE_BACKEND=memory 只能以單一 worker 執行（目前 workers={server.cfg.workers}），'
+            '請設定 WEB_CONCURRENCY=1'
+        )
+
+
+def when_ready(server):
+    """master 已載入應用程式：關閉 master 的資料庫連線（worker 會各自重新連線）"""
+    from database import db
+    db.close()
+
+
+def post_fork(server, worker):
+    """worker fork 後重新建立不能跨 fork 使用的用戶端"""
+    from database import db
+    from utils.gemini_service import gemini_service
+    
+    db.reconnect()
+    gemini_service.reset_after_fork()
+    server.log.info(f'worker {worker.pid} 已重新建立 MongoDB 與 Gemini 用戶端')
+    
+    # 延遲寫入的背景執行緒不會跨 fork，並重新寫入已結束的 worker 留下的暫存檔
+    from models.project_model import record_buffer
+    if record_buffer.enabled:
+        record_buffer.start()
+
+
+def worker_exit(server, worker):
+    """worker 結束前排空進行中的檢測（重啟或關閉時）"""
+    from utils.detect_service import detection_flight, wait_for_idle
+    
+    in_flight = detection_flight.in_flight()
+    if in_flight:
+        server.log.info(f'worker {worker.pid} 等待 {in_flight} 個進行中的檢測完成')
+        if not wait_for_idle(graceful_timeout):
+            server.log.warning(f'worker {worker.pid} 仍有檢測未完成，強制結束')
+    
+    # 寫入緩衝區中剩餘的記錄（MongoDB 無法寫入時留在暫存檔，由其他 worker 重新寫入）
+    from models.project_model import record_buffer
+    if record_buffer.enabled:
+        record_buffer.close()
@@ -0,0 +1,58 @@
+"""
+即時推播（SSE）專用的 gunicorn 設定檔
+
+    gunicorn -c gunicorn.push.conf.py wsgi:app
+
+每個推播連線會佔用一個執行緒最長 PUSH_STREAM_SECONDS 秒，若由 API worker（gunicorn.conf.py，
+每個 worker 只有少數執行緒）處理，少數開啟的分頁就會佔滿所有執行緒。因此推播連線由此獨立的行程處理：
+反向代理將 /api/project/<id>/events 轉送到此行程，其餘請求轉送到 API 行程。
+此行程的事件來自 MongoDB change stream（需要 replica set），與寫入記錄的 API worker 無關。
+
+所有設定都可以用環境變數覆寫。
+"""
+import os
+
+# 推播行程預設啟用推播（Config 在 preload 載入應用程式時才讀取環境變數）
+os.environ.setdefault('PUSH_ENABLED', 'true')
+os.environ.setdefault('PUSH_MAX_SUBSCRIBERS', '200')
+
+bind = os.getenv('PUSH_BIND', '0.0.0.0:5002')
+
+# 連線大部分時間在等待事件，單一 worker 以大量執行緒保持連線；
+# 執行緒數比連線上限多幾個，超過上限的請求仍能得到 503 回應
+workers = int(os.getenv('PUSH_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ['PUSH_MAX_SUBSCRIBERS']) + 4
+
+preload_app = True
+
+# gthread worker 的心跳由主迴圈負責，長時間的串流回應不會觸發 timeout
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 180))
+# 關閉時不等待串流結束（瀏覽器會自動重新連線並以 Last-Event-ID 補送）
+graceful_timeout = 5
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """推播行程與 API 行程不共用記憶體資料庫，收不到任何寫入"""
+    from config import Config
+    
+    if Config.DATABASE_BACKEND == 'memory':
+        raise SystemExit('推播行程不支援 DATABASE_BACKEND=memory，請在 API 行程處理推播（設定 PUSH_MAX_SUBSCRIBERS）')
+
+
+def when_ready(server):
+    """master 已載入應用程式：關閉 master 的資料庫連線（worker 會各自重新連線）"""
+    from database import db
+    db.close()
+
+
+def post_fork(server, worker):
+    """worker fork 後重新建立 MongoDB 用戶端（推播行程不呼叫 Gemini）"""
+    from database import db
+    
+    db.reconnect()
+    server.log.info(f'推播 worker {worker.pid} 已重新建立 MongoDB 用戶端')
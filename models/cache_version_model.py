@@ -0,0 +1,44 @@
+"""
+快取版本資料模型
+
+每位用戶一筆版本計數器，專案或專案記錄有寫入時遞增，
+API 以此版本產生 ETag 並作為回應快取的鍵值。
+計數器存放於 MongoDB，多個 worker 行程之間的版本因此保持一致。
+"""
+from database import db
+from bson import ObjectId
+
+
+def _to_object_id(value):
+    return ObjectId(value) if isinstance(value, str) else value
+
+
+class CacheVersionModel:
+    """快取版本資料操作類別"""
+    
+    @staticmethod
+    def get(user_id):
+        """取得用戶目前的資料版本"""
+        collection = db.get_collection('cache_version')
+        doc = collection.find_one({'_id': _to_object_id(user_id)}, {'version': 1})
+        return doc['version'] if doc else 0
+    
+    @staticmethod
+    def bump(user_id):
+        """遞增用戶的資料版本（使該用戶所有快取失效）"""
+        collection = db.get_collection('cache_version')
+        collection.update_one(
+            {'_id': _to_object_id(user_id)},
+            {'$inc': {'version': 1}},
+            upsert=True
+        )
+    
+    @staticmethod
+    def bump_for_project(project_id):
+        """根據專案 ID 找出擁有者並遞增其資料版本"""
+        project = db.get_collection('project').find_one(
+            {'_id': _to_object_id(project_id)},
+            {'user_id': 1}
+        )
+        if project:
+            CacheVersionModel.bump(project['user_id'])
@@ -0,0 +1,54 @@
+"""
+法律文件版本資料模型
+
+保存每個版本的條文雜湊與相對於前一版本的差異，供重新評估記錄時比對。
+"""
+from database import db
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from utils.law_version import diff_articles
+
+
+class LawVersionModel:
+    """法律文件版本資料操作類別"""
+    
+    @staticmethod
+    def register(version, article_hashes):
+        """
+        登記法律文件版本；新版本會與最近一個版本比對條文差異
+        
+        Args:
+            version: 法律文件版本
+            article_hashes: {條文名稱: 雜湊}
+            
+        Returns:
+            新版本相對於前一版本的差異；版本已登記時返回 None
+        """
+        collection = db.get_collection('law_version')
+        if collection.find_one({'_id': version}, {'_id': 1}):
+            return None
+        
+        previous = collection.find_one({}, sort=[('created_at', -1)])
+        diff = diff_articles(previous['article_hashes'], article_hashes) if previous else None
+        try:
+            collection.insert_one({
+                '_id': version,
+                'article_hashes': article_hashes,
+                'previous_version': previous['_id'] if previous else None,
+                'diff': diff,
+                'created_at': datetime.now()
+            })
+        except DuplicateKeyError:
+            # 其他 worker 已同時登記
+            return None
+        
+        if diff:
+            print(f"法律文件已更新為版本 {version}（前一版本 {previous['_id']}）："
+                  f"新增 {diff['added']}，刪除 {diff['removed']}，修改 {diff['changed']}")
+        return diff
+    
+    @staticmethod
+    def get(version):
+        """根據版本查找，找不到時返回 None"""
+        collection = db.get_collection('law_version')
+        return collection.find_one({'_id': version})
@@ -1,9 +1,45 @@
 """
 專案資料模型
 """
+import time
 from database import db
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from models.cache_version_model import CacheVersionModel
+from models.search_index_model import SearchIndexModel
+from utils.event_hub import event_hub, record_event_payload
+from utils.record_buffer import RecordWriteBuffer
+from utils.record_codec import encode_record_fields, decode_record
+
+# 管理介面專案列表只返回的欄位
+PROJECT_LIST_FIELDS = {'user_id': 1, 'project_name': 1, 'created_at': 1, 'updated_at': 1}
+
+
+def _to_object_id(value):
+    """將字串轉為 ObjectId；格式不正確時返回 None"""
+    if isinstance(value, str):
+        return ObjectId(value) if ObjectId.is_valid(value) else None
+    return value
+
+
+# 舊記錄是否仍缺少 user_id（尚未執行 scripts/backfill_record_owner.py --apply）；
+# 回填完成前每 _OWNER_BACKFILL_RECHECK_SECONDS 秒重新確認一次，完成後不再查詢
+_OWNER_BACKFILL_RECHECK_SECONDS = 300
+_owner_backfill = {'pending': True, 'checked_at': None}
+
+
+def _record_owner_filter(user_id):
+    """
+    記錄查詢的 user_id 條件
+
+    回填完成前一併包含缺少 user_id 的舊記錄；呼叫端必須已確認專案屬於該用戶
+    （舊記錄只會屬於專案擁有者）
+    """
+    user_id_obj = ObjectId(user_id) if isinstance(user_id, str) else user_id
+    if ProjectRecordModel.owner_backfill_pending():
+        return {'$in': [user_id_obj, None]}
+    return user_id_obj
 
 
 class ProjectModel:
@@ -11,104 +47,535 @@ class ProjectModel:
     
     @staticmethod
     def create(user_id, project_name):
-        """建立新專案"""
+        """建立新專案，返回含 _id 的專案文件（不需再查詢一次）"""
         collection = db.get_collection('project')
-        result = collection.insert_one({
+        now = datetime.now()
+        project = {
             'user_id': ObjectId(user_id) if isinstance(user_id, str) else user_id,
             'project_name': project_name,
-            'created_at': datetime.now(),
-            'updated_at': datetime.now()
-        })
-        return result.inserted_id
+            'created_at': now,
+            'updated_at': now
+        }
+        collection.insert_one(project)
+        CacheVersionModel.bump(user_id)
+        return project
     
     @staticmethod
     def find_by_user_id(user_id):
         """根據用戶 ID 查找所有專案"""
         collection = db.get_collection('project')
-        projects = list(collection.find({
+        return list(collection.find({
             'user_id': ObjectId(user_id) if isinstance(user_id, str) else user_id
         }).sort('created_at', -1))
-        # 轉換 ObjectId 為字串
-        for project in projects:
-            project['_id'] = str(project['_id'])
-            project['user_id'] = str(project['user_id'])
-        return projects
+    
+    @staticmethod
+    def find_page(before_id=None, limit=50, user_id=None):
+        """
+        分頁查詢所有專案（管理介面，keyset 分頁，依 _id 由新到舊）
+        
+        Args:
+            user_id: 指定時只返回該用戶的專案
+            
+        Returns:
+            (projects, has_more)
+        """
+        collection = db.get_collection('project')
+        query = {}
+        if user_id:
+            query['user_id'] = ObjectId(user_id) if isinstance(user_id, str) else user_id
+        if before_id:
+            query['_id'] = {'$lt': ObjectId(before_id) if isinstance(before_id, str) else before_id}
+        projects = list(collection.find(query, PROJECT_LIST_FIELDS).sort('_id', -1).limit(limit + 1))
+        return projects[:limit], len(projects) > limit
+    
+    @staticmethod
+    def find_names(project_ids, user_id):
+        """
+        批次取得用戶專案的名稱
+        
+        Returns:
+            {project_id: project_name}
+        """
+        collection = db.get_collection('project')
+        projects = collection.find(
+            {'_id': {'$in': list(project_ids)}, 'user_id': _to_object_id(user_id)},
+            {'project_name': 1}
+        )
+        return {project['_id']: project['project_name'] for project in projects}
+    
+    @staticmethod
+    def find_home_data(user_id, project_id=None, record_limit=20):
+        """
+        以單次聚合查詢取得主頁所需資料
+        
+        Args:
+            user_id: 用戶 ID
+            project_id: 指定的專案 ID；未指定時使用最新的專案
+            record_limit: 當前專案最多返回的最新記錄數
+            
+        Returns:
+            字典，包含：
+            - projects: 用戶的所有專案
+            - current_project: 當前專案（指定的專案不存在或不屬於該用戶時為 None）
+            - records: 當前專案最新的記錄，依建立時間由舊到新排序
+            - has_more_records: 是否還有更早的記錄
+            - version: 用戶目前的快取版本
+        """
+        collection = db.get_collection('project')
+        user_id_obj = ObjectId(user_id) if isinstance(user_id, str) else user_id
+        data = {
+            'projects': [],
+            'current_project': None,
+            'records': [],
+            'has_more_records': False,
+            'version': 0
+        }
+        
+        if project_id and not ObjectId.is_valid(project_id):
+            data['projects'] = ProjectModel.find_by_user_id(user_id)
+            data['version'] = CacheVersionModel.get(user_id)
+            return data
+        
+        if project_id:
+            # 專案已先以 user_id 過濾，因此只會找到屬於該用戶的專案
+            select_current = [{'$match': {'_id': ObjectId(project_id)}}]
+        else:
+            select_current = [{'$limit': 1}]
+        
+        pipeline = [
+            {'$match': {'user_id': user_id_obj}},
+            {'$sort': {'created_at': -1}},
+            {'$facet': {
+                'projects': [{'$match': {}}],
+                'current': select_current + [
+                    {'$lookup': {
+                        'from': 'project_record',
+                        'let': {'pid': '$_id'},
+                        'pipeline': [
+                            {'$match': {'$expr': {'$eq': ['$project_id', '$$pid']}}},
+                            {'$sort': {'_id': -1}},
+                            # 多取一筆用來判斷是否還有更早的記錄
+                            {'$limit': record_limit + 1}
+                        ],
+                        'as': 'records'
+                    }}
+                ],
+                'version': [
+                    {'$limit': 1},
+                    {'$lookup': {
+                        'from': 'cache_version',
+                        'pipeline': [{'$match': {'_id': user_id_obj}}],
+                        'as': 'cache_version'
+                    }},
+                    {'$project': {'cache_version.version': 1}}
+                ]
+            }}
+        ]
+        result = next(collection.aggregate(pipeline), None)
+        if not result:
+            return data
+        
+        data['projects'] = result['projects']
+        
+        if result['version'] and result['version'][0]['cache_version']:
+            data['version'] = result['version'][0]['cache_version'][0]['version']
+        
+        if result['current']:
+            current_project = result['current'][0]
+            records = current_project.pop('records')
+            records_page = [decode_record(record) for record in reversed(records[:record_limit])]
+            
+            data['current_project'] = current_project
+            data['records'] = records_page
+            data['has_more_records'] = len(records) > record_limit
+        
+        return data
     
     @staticmethod
     def find_by_id(project_id):
         """根據專案 ID 查找專案"""
         collection = db.get_collection('project')
-        project = collection.find_one({
+        return collection.find_one({
             '_id': ObjectId(project_id) if isinstance(project_id, str) else project_id
         })
-        if project:
-            project['_id'] = str(project['_id'])
-            project['user_id'] = str(project['user_id'])
-        return project
     
     @staticmethod
-    def update_name(project_id, new_name):
-        """更新專案名稱"""
+    def find_owned(project_id, user_id):
+        """
+        查找屬於指定用戶的專案（以 {_id, user_id} 單次查詢完成權限檢查）
+        
+        Returns:
+            專案文件；專案不存在、不屬於該用戶或 ID 格式不正確時為 None
+        """
+        project_id_obj = _to_object_id(project_id)
+        user_id_obj = _to_object_id(user_id)
+        if project_id_obj is None or user_id_obj is None:
+            return None
         collection = db.get_collection('project')
-        return collection.update_one(
-            {'_id': ObjectId(project_id) if isinstance(project_id, str) else project_id},
+        return collection.find_one({'_id': project_id_obj, 'user_id': user_id_obj})
+    
+    @staticmethod
+    def update_name(project_id, new_name, user_id):
+        """
+        更新專案名稱（只更新屬於該用戶的專案）
+        
+        Returns:
+            更新後的專案文件；專案不存在或不屬於該用戶時為 None
+        """
+        project_id_obj = _to_object_id(project_id)
+        user_id_obj = _to_object_id(user_id)
+        if project_id_obj is None or user_id_obj is None:
+            return None
+        collection = db.get_collection('project')
+        project = collection.find_one_and_update(
+            {'_id': project_id_obj, 'user_id': user_id_obj},
             {
                 '$set': {
                     'project_name': new_name,
                     'updated_at': datetime.now()
                 }
-            }
+            },
+            return_document=ReturnDocument.AFTER
         )
+        if project:
+            CacheVersionModel.bump(user_id)
+            event_hub.notify(project_id_obj, 'project', {
+                'project_id': project_id_obj,
+                'project_name': project['project_name']
+            })
+        return project
     
     @staticmethod
-    def delete(project_id):
-        """刪除專案（同時刪除相關記錄）"""
-        collection = db.get_collection('project')
-        project_id_obj = ObjectId(project_id) if isinstance(project_id, str) else project_id
-        
-        # 刪除專案
-        result = collection.delete_one({'_id': project_id_obj})
+    def delete(project_id, user_id):
+        """
+        刪除專案（只刪除屬於該用戶的專案，同時刪除相關記錄）
         
-        # 刪除專案的所有記錄
-        from models.project_record_model import ProjectRecordModel
-        ProjectRecordModel.delete_by_project_id(project_id)
+        Returns:
+            是否有專案被刪除
+        """
+        project_id_obj = _to_object_id(project_id)
+        user_id_obj = _to_object_id(user_id)
+        if project_id_obj is None or user_id_obj is None:
+            return False
+        collection = db.get_collection('project')
+        result = collection.delete_one({'_id': project_id_obj, 'user_id': user_id_obj})
+        if not result.deleted_count:
+            return False
         
-        return result
+        # 刪除專案的所有記錄（尚未寫入的延遲寫入記錄一併捨棄；已送出的由 after_insert 清除）
+        record_buffer.discard(lambda doc: doc['project_id'] == project_id_obj)
+        ProjectRecordModel.delete_by_project_id(project_id_obj)
+        CacheVersionModel.bump(user_id)
+        event_hub.notify(project_id_obj, 'project_deleted', {'project_id': project_id_obj})
+        return True
 
 
 class ProjectRecordModel:
     """專案記錄資料操作類別"""
     
     @staticmethod
-    def create(project_id, input_ad, result_law, result_advice):
-        """建立新專案記錄"""
+    def create(project_id, input_ad, result_law, result_advice, user_id=None, idempotency_key=None,
+               token_usage=None, evaluation=None):
+        """
+        建立新專案記錄
+        
+        Args:
+            user_id: 專案擁有者，冗餘儲存於記錄中（查詢以 user_id 限定範圍），並用於遞增快取版本
+            idempotency_key: 用戶端提供的 Idempotency-Key，重送時用來找回同一筆記錄
+            token_usage: 此次檢測的 Gemini token 用量（成本追蹤）
+            evaluation: 評估版本標記（law_version / prompt_version / cited_articles）
+            
+        Returns:
+            記錄 ID；啟用延遲寫入（RECORD_WRITE_BEHIND）時沒有 idempotency_key 的記錄會在背景批次寫入，稍後才查詢得到
+        
+        Raises:
+            pymongo.errors.DuplicateKeyError: 相同專案已有使用此 idempotency_key 的記錄
+        """
         collection = db.get_collection('project_record')
-        result = collection.insert_one({
+        record = {
             'project_id': ObjectId(project_id) if isinstance(project_id, str) else project_id,
+            'created_at': datetime.now()
+        }
+        if user_id:
+            record['user_id'] = ObjectId(user_id) if isinstance(user_id, str) else user_id
+        if idempotency_key:
+            record['idempotency_keys'] = [idempotency_key]
+        if token_usage:
+            record['token_usage'] = token_usage
+        if evaluation:
+            record.update(evaluation)
+        # 以精簡格式儲存（結構化條列項目、壓縮長文字）
+        record.update(encode_record_fields(input_ad, result_law, result_advice))
+        # 寫入後建立搜尋索引需要原始內容
+        entry = {
+            'doc': record,
             'input_ad': input_ad,
             'result_law': result_law,
-            'result_advice': result_advice,
-            'created_at': datetime.now()
-        })
+            'result_advice': result_advice
+        }
+        
+        # 帶有 Idempotency-Key 的記錄直接寫入：其他 worker 可能已用相同的鍵建立記錄，
+        # 需在返回前取得 DuplicateKeyError 並改用該記錄（緩衝區只能查找本行程的記錄）
+        if record_buffer.enabled and not idempotency_key:
+            # 先產生 _id 並立即返回，由背景執行緒以 insert_many 批次寫入
+            record['_id'] = ObjectId()
+            record_buffer.add(entry)
+            return record['_id']
+        
+        result = collection.insert_one(record)
+        ProjectRecordModel.after_insert([entry])
         return result.inserted_id
     
     @staticmethod
-    def find_by_project_id(project_id):
-        """根據專案 ID 查找所有記錄"""
+    def after_insert(entries):
+        """
+        記錄寫入後建立搜尋索引、遞增擁有者的快取版本並推播新記錄
+        
+        寫入前專案已被刪除（延遲寫入或並行的檢測）時，刪除該專案遺留的記錄與搜尋索引
+        
+        Args:
+            entries: [{'doc': 已寫入的記錄, 'input_ad', 'result_law', 'result_advice'}, ...]
+        """
+        for entry in entries:
+            record = entry['doc']
+            if not record.get('user_id'):
+                continue
+            # 搜尋索引失敗不影響記錄寫入，可再以 scripts/build_search_index.py 補建
+            try:
+                SearchIndexModel.index_record(record['_id'], record['user_id'], record['project_id'],
+                                              entry['input_ad'], entry['result_law'], entry['result_advice'],
+                                              record['created_at'])
+            except Exception as e:
+                print(f"建立搜尋索引時發生錯誤: {e}")
+        
+        # 在寫入與建立索引之後確認專案仍存在：專案刪除先刪除專案再刪除記錄，
+        # 此處看到專案存在時，之後的刪除會一併刪除這些記錄
+        project_ids = {entry['doc']['project_id'] for entry in entries}
+        existing = {project['_id'] for project in db.get_collection('project').find(
+            {'_id': {'$in': list(project_ids)}}, {'_id': 1}
+        )}
+        for project_id in project_ids - existing:
+            print(f"專案 {project_id} 已刪除，刪除寫入後遺留的記錄")
+            ProjectRecordModel.delete_by_project_id(project_id)
+        entries = [entry for entry in entries if entry['doc']['project_id'] in existing]
+        
+        owners, projects = set(), set()
+        for entry in entries:
+            record = entry['doc']
+            if record.get('user_id'):
+                owners.add(record['user_id'])
+            else:
+                projects.add(record['project_id'])
+        
+        # 同一批次中每位用戶只遞增一次
+        for user_id in owners:
+            CacheVersionModel.bump(user_id)
+        for project_id in projects:
+            CacheVersionModel.bump_for_project(project_id)
+        for entry in entries:
+            doc = entry['doc']
+            event_hub.notify(doc['project_id'], 'record', lambda doc=doc: record_event_payload(doc))
+    
+    @staticmethod
+    def owner_backfill_pending():
+        """是否仍有缺少 user_id 的舊記錄（以 user_id 索引查詢一筆）"""
+        now = time.monotonic()
+        checked_at = _owner_backfill['checked_at']
+        if _owner_backfill['pending'] and (checked_at is None or now - checked_at >= _OWNER_BACKFILL_RECHECK_SECONDS):
+            _owner_backfill['checked_at'] = now
+            collection = db.get_collection('project_record')
+            _owner_backfill['pending'] = collection.find_one({'user_id': None}, {'_id': 1}) is not None
+            if _owner_backfill['pending'] and checked_at is None:
+                print("仍有缺少 user_id 的專案記錄，查詢會一併包含這些記錄；"
+                      "請執行 python scripts/backfill_record_owner.py --apply")
+        return _owner_backfill['pending']
+    
+    @staticmethod
+    def find_by_project_id(project_id, user_id=None):
+        """根據專案 ID 查找所有記錄（指定 user_id 時只返回該用戶的記錄，呼叫端需已確認專案擁有者）"""
         collection = db.get_collection('project_record')
-        records = list(collection.find({
+        query = {
             'project_id': ObjectId(project_id) if isinstance(project_id, str) else project_id
-        }).sort('created_at', 1))
-        # 轉換 ObjectId 為字串
-        for record in records:
-            record['_id'] = str(record['_id'])
-            record['project_id'] = str(record['project_id'])
-        return records
+        }
+        if user_id:
+            query['user_id'] = _record_owner_filter(user_id)
+        records = collection.find(query).sort('created_at', 1)
+        return [decode_record(record) for record in records]
+    
+    @staticmethod
+    def iter_by_project_id(project_id, user_id, batch_size=200):
+        """
+        依建立順序逐筆讀取用戶專案的記錄（匯出使用，不會一次載入所有記錄）
+        
+        Yields:
+            解碼後的記錄
+        """
+        collection = db.get_collection('project_record')
+        cursor = collection.find({
+            'project_id': ObjectId(project_id) if isinstance(project_id, str) else project_id,
+            'user_id': _record_owner_filter(user_id)
+        }, batch_size=batch_size).sort('_id', 1)
+        try:
+            for record in cursor:
+                yield decode_record(record)
+        finally:
+            cursor.close()
+    
+    @staticmethod
+    def find_after(project_id, user_id, after_id, limit=100):
+        """
+        查找比 after_id 更新的記錄（推播連線重新連上時補送遺漏的記錄）
+        
+        Returns:
+            解碼後的記錄，依建立順序由舊到新
+        """
+        collection = db.get_collection('project_record')
+        records = collection.find({
+            'project_id': ObjectId(project_id) if isinstance(project_id, str) else project_id,
+            'user_id': _record_owner_filter(user_id),
+            '_id': {'$gt': ObjectId(after_id) if isinstance(after_id, str) else after_id}
+        }).sort('_id', 1).limit(limit)
+        return [decode_record(record) for record in records]
+    
+    @staticmethod
+    def find_by_ids(record_ids, user_id):
+        """
+        批次取得用戶的記錄
+        
+        Returns:
+            {record_id: 解碼後的記錄}
+        """
+        collection = db.get_collection('project_record')
+        records = collection.find({
+            '_id': {'$in': list(record_ids)},
+            'user_id': ObjectId(user_id) if isinstance(user_id, str) else user_id
+        })
+        return {record['_id']: decode_record(record) for record in records}
+    
+    @staticmethod
+    def find_by_idempotency_key(project_id, idempotency_key):
+        """根據 Idempotency-Key 查找專案記錄（包含尚未寫入的延遲寫入記錄）"""
+        collection = db.get_collection('project_record')
+        project_id_obj = ObjectId(project_id) if isinstance(project_id, str) else project_id
+        record = record_buffer.find_pending(
+            lambda doc: doc['project_id'] == project_id_obj and idempotency_key in doc.get('idempotency_keys', [])
+        ) or collection.find_one({
+            'project_id': project_id_obj,
+            'idempotency_keys': idempotency_key
+        })
+        if record:
+            record = decode_record(record)
+        return record
+    
+    @staticmethod
+    def add_idempotency_key(record_id, idempotency_key):
+        """為既有記錄加入 Idempotency-Key（合併的請求共用同一筆記錄）"""
+        record_id = ObjectId(record_id) if isinstance(record_id, str) else record_id
+        if record_buffer.add_idempotency_key(record_id, idempotency_key):
+            return None
+        collection = db.get_collection('project_record')
+        return collection.update_one(
+            {'_id': record_id},
+            {'$addToSet': {'idempotency_keys': idempotency_key}}
+        )
+    
+    @staticmethod
+    def find_page(project_id, before_id=None, limit=20, user_id=None):
+        """
+        分頁查詢專案記錄（keyset 分頁，依 _id 由新到舊）
+        
+        Args:
+            project_id: 專案 ID
+            before_id: 只返回比此記錄更早的記錄
+            limit: 最多返回筆數
+            user_id: 指定時只返回該用戶的記錄（回填完成前包含缺少 user_id 的舊記錄，
+                     呼叫端需先確認專案擁有者，見 owner_backfill_pending）
+            
+        Returns:
+            (records, has_more)，records 依建立時間由舊到新排序
+        """
+        collection = db.get_collection('project_record')
+        query = {
+            'project_id': ObjectId(project_id) if isinstance(project_id, str) else project_id
+        }
+        if user_id:
+            query['user_id'] = _record_owner_filter(user_id)
+        if before_id:
+            query['_id'] = {'$lt': ObjectId(before_id) if isinstance(before_id, str) else before_id}
+        
+        records = list(collection.find(query).sort('_id', -1).limit(limit + 1))
+        has_more = len(records) > limit
+        records = [decode_record(record) for record in reversed(records[:limit])]
+        return records, has_more
     
     @staticmethod
     def delete_by_project_id(project_id):
-        """根據專案 ID 刪除所有記錄"""
+        """根據專案 ID 刪除所有記錄（同時刪除搜尋索引）"""
+        SearchIndexModel.delete_by_project_id(project_id)
         collection = db.get_collection('project_record')
         return collection.delete_many({
             'project_id': ObjectId(project_id) if isinstance(project_id, str) else project_id
         })
+    
+    @staticmethod
+    def find_for_reevaluation(law_version, after_id=None, limit=100, include_unstamped=False):
+        """
+        依 _id 順序查找評估版本不是 law_version 的記錄（重新評估工作使用）
+        
+        Args:
+            law_version: 目前的法律文件版本
+            after_id: 只查找 _id 大於此值的記錄（從中斷處繼續）
+            include_unstamped: 是否包含尚未標記版本的舊記錄
+            
+        Returns:
+            解碼後的記錄列表
+        """
+        collection = db.get_collection('project_record')
+        if include_unstamped:
+            query = {'law_version': {'$ne': law_version}}
+        else:
+            query = {'law_version': {'$exists': True, '$ne': law_version}}
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        return [decode_record(record) for record in collection.find(query).sort('_id', 1).limit(limit)]
+    
+    @staticmethod
+    def update_evaluation(record_id, result_law, result_advice, evaluation, token_usage=None):
+        """
+        以重新評估的結果更新記錄（廣告內容不變）
+        
+        Args:
+            evaluation: 新的評估版本標記
+            token_usage: 重新評估的 token 用量
+        """
+        collection = db.get_collection('project_record')
+        fields = encode_record_fields(None, result_law, result_advice)
+        fields.pop('input_ad')
+        # 廣告內容未重新編碼，舊格式記錄仍需由遷移工具處理
+        fields.pop('storage_version')
+        fields.update(evaluation)
+        fields['reevaluated_at'] = datetime.now()
+        if token_usage:
+            fields['reevaluation_token_usage'] = token_usage
+        # 移除另一種儲存格式的欄位，避免讀取到舊結果
+        unset = {field: '' for field in ('result_law', 'result_law_items', 'result_advice', 'result_advice_z')
+                 if field not in fields}
+        update = {'$set': fields}
+        if unset:
+            update['$unset'] = unset
+        result = collection.update_one({'_id': ObjectId(record_id)}, update)
+        SearchIndexModel.update_results(record_id, result_law, result_advice)
+        return result
+    
+    @staticmethod
+    def restamp(record_id, law_version):
+        """法規變動與此記錄無關時，只更新記錄的法律文件版本"""
+        collection = db.get_collection('project_record')
+        return collection.update_one(
+            {'_id': ObjectId(record_id)},
+            {'$set': {'law_version': law_version}}
+        )
+
+
+# 檢測記錄的延遲寫入緩衝（RECORD_WRITE_BEHIND 啟用時使用）
+record_buffer = RecordWriteBuffer('project_record', ProjectRecordModel.after_insert)
@@ -0,0 +1,85 @@
+"""
+速率限制資料模型
+
+滑動視窗計數存放於 MongoDB，所有 worker 行程共用同一個視窗，
+用戶的上限不會因 worker 數量而倍增。
+每個（範圍, 鍵）一筆文件，記錄最近 limit 次請求的時間；
+最後一次請求超過一個視窗後，文件由 TTL 索引自動刪除。
+"""
+import time
+from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from database import db
+
+
+class RateLimitModel:
+    """速率限制資料操作類別"""
+    
+    @staticmethod
+    def hit(scope, key, limit, window):
+        """
+        記錄一次請求（單一原子更新，多個行程同時請求時也不會超過上限）
+        
+        Args:
+            scope: 限制的範圍（例如 detect）
+            key: 限制的對象（例如用戶 ID）
+            limit: 視窗內允許的請求數（0 表示不限制）
+            window: 視窗長度（秒）
+        
+        Returns:
+            0 表示允許；否則為視窗內最早的請求過期前需要等待的秒數（此次不計入）
+        """
+        if not limit:
+            return 0
+        collection = db.get_collection('rate_limit')
+        doc_id = f'{scope}:{key}'
+        now = time.time()
+        for _ in range(2):
+            try:
+                # hits 只保留最近 limit 次：未滿 limit 次，或其中最早的一次已在視窗外時才允許
+                collection.update_one(
+                    {
+                        '_id': doc_id,
+                        '$or': [
+                            {f'hits.{limit - 1}': {'$exists': False}},
+                            {'hits.0': {'$lte': now - window}}
+                        ]
+                    },
+                    {
+                        '$push': {'hits': {'$each': [now], '$slice': -limit}},
+                        '$set': {
+                            'scope': scope,
+                            'key': key,
+                            'expires_at': datetime.utcnow() + timedelta(seconds=window)
+                        }
+                    },
+                    upsert=True
+                )
+                return 0
+            except DuplicateKeyError:
+                # 條件不符時 upsert 改為插入而與既有文件的 _id 衝突
+                doc = collection.find_one({'_id': doc_id}, {'hits': 1})
+                hits = doc.get('hits', []) if doc else []
+                if len(hits) >= limit and hits[0] > now - window:
+                    collection.update_one({'_id': doc_id}, {'$inc': {'rejected': 1}})
+                    return hits[0] + window - now
+                # 其他行程同時建立了此文件（或文件剛過期被刪除），重試一次
+        return 1
+    
+    @staticmethod
+    def snapshot(scope, window):
+        """
+        取得範圍內各鍵目前視窗的請求數
+        
+        Returns:
+            {鍵: {'window_requests', 'rejected'}}
+        """
+        collection = db.get_collection('rate_limit')
+        since = time.time() - window
+        return {
+            doc['key']: {
+                'window_requests': sum(1 for hit in doc.get('hits', []) if hit > since),
+                'rejected': doc.get('rejected', 0)
+            }
+            for doc in collection.find({'scope': scope}, {'key': 1, 'hits': 1, 'rejected': 1})
+        }
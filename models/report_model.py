@@ -2,6 +2,8 @@
 問題回報資料模型
 """
 from database import db
+from datetime import datetime
+from bson import ObjectId
 
 
 class ReportModel:
@@ -9,17 +11,39 @@ class ReportModel:
     
     @staticmethod
     def create(user_name, user_id, report_text):
-        """建立新問題回報"""
+        """
+        建立新問題回報
+        
+        回報以 user_id 關聯用戶並存於獨立集合，不再寫入用戶文件的 reports 陣列
+        """
         collection = db.get_collection('report')
         result = collection.insert_one({
+            'user_id': ObjectId(user_id) if isinstance(user_id, str) else user_id,
             'user_name': user_name,
-            'user_id': user_id,
-            'report_text': report_text
+            'report_text': report_text,
+            'created_at': datetime.now()
         })
         return result.inserted_id
     
     @staticmethod
-    def count_all():
-        """計算所有問題回報數量"""
+    def find_page(before_id=None, limit=20, user_id=None):
+        """
+        分頁查詢問題回報（keyset 分頁，依 _id 由新到舊）
+        
+        Args:
+            before_id: 只返回比此回報更早的回報
+            limit: 最多返回筆數
+            user_id: 指定時只返回該用戶的回報
+            
+        Returns:
+            (reports, has_more)，reports 依建立時間由新到舊排序
+        """
         collection = db.get_collection('report')
-        return collection.count_documents({})
+        query = {}
+        if user_id:
+            query['user_id'] = ObjectId(user_id) if isinstance(user_id, str) else user_id
+        if before_id:
+            query['_id'] = {'$lt': ObjectId(before_id) if isinstance(before_id, str) else before_id}
+        
+        reports = list(collection.find(query).sort('_id', -1).limit(limit + 1))
+        return reports[:limit], len(reports) > limit
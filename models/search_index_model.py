@@ -0,0 +1,141 @@
+"""
+檢測記錄搜尋索引資料模型
+
+record_search 集合中每筆專案記錄對應一份索引文件（_id 與記錄相同）：
+- terms: 廣告內容與分析結果的不重複索引詞（與 user_id 建立複合多鍵索引）
+- ad_terms: 廣告內容的索引詞，查詢詞出現在廣告本身的記錄排序較前
+- verdict / articles / created_at: 搜尋篩選條件
+索引在記錄建立、重新評估與刪除時同步更新，既有記錄以 scripts/build_search_index.py 建立。
+"""
+from config import Config
+from database import db
+from bson import ObjectId
+from utils.search_utils import unique_terms
+from utils.text_utils import html_to_text
+from utils.law_version import extract_cited_articles, classify_verdict
+
+
+def _to_object_id(value):
+    return ObjectId(value) if isinstance(value, str) else value
+
+
+def _result_fields(result_law, result_advice):
+    """由分析結果產生索引文件中與結果相關的欄位"""
+    law_text = html_to_text(result_law)
+    conclusion = law_text.split('\n', 1)[0] if law_text else ''
+    return {
+        'verdict': classify_verdict(conclusion),
+        'articles': extract_cited_articles(law_text),
+        'result_terms': unique_terms(law_text + '\n' + (result_advice or ''))
+    }
+
+
+class SearchIndexModel:
+    """檢測記錄搜尋索引操作類別"""
+    
+    @staticmethod
+    def index_record(record_id, user_id, project_id, input_ad, result_law, result_advice, created_at):
+        """建立或覆寫單筆記錄的索引文件"""
+        collection = db.get_collection('record_search')
+        fields = _result_fields(result_law, result_advice)
+        ad_terms = unique_terms(input_ad)
+        result_terms = fields.pop('result_terms')
+        doc = {
+            'user_id': _to_object_id(user_id),
+            'project_id': _to_object_id(project_id),
+            'terms': list(dict.fromkeys(ad_terms + result_terms)),
+            'ad_terms': ad_terms,
+            'created_at': created_at
+        }
+        doc.update(fields)
+        collection.replace_one({'_id': _to_object_id(record_id)}, doc, upsert=True)
+    
+    @staticmethod
+    def update_results(record_id, result_law, result_advice):
+        """記錄重新評估後更新索引中與分析結果相關的欄位（廣告內容不變）"""
+        collection = db.get_collection('record_search')
+        record_id = _to_object_id(record_id)
+        doc = collection.find_one({'_id': record_id}, {'ad_terms': 1})
+        if not doc:
+            return
+        fields = _result_fields(result_law, result_advice)
+        fields['terms'] = list(dict.fromkeys(doc['ad_terms'] + fields.pop('result_terms')))
+        collection.update_one({'_id': record_id}, {'$set': fields})
+    
+    @staticmethod
+    def delete_by_project_id(project_id):
+        """刪除專案所有記錄的索引文件"""
+        collection = db.get_collection('record_search')
+        return collection.delete_many({'project_id': _to_object_id(project_id)})
+    
+    @staticmethod
+    def search(user_id, terms, verdict=None, article=None, date_from=None, date_to=None,
+               after=None, limit=20):
+        """
+        搜尋用戶的檢測記錄
+        
+        記錄需包含所有查詢詞；排序依廣告內容命中的查詢詞數（由多到少），再依建立順序（由新到舊）。
+        有查詢詞時只為符合條件的最新 SEARCH_MAX_CANDIDATES 筆計算分數並排序
+        （常見詞幾乎命中所有記錄，對全部記錄排序的成本會隨記錄數增加），更早的記錄需以日期篩選縮小範圍
+        
+        Args:
+            terms: query_terms 的結果；為空時只依篩選條件列出記錄
+            verdict: 'violation' / 'compliant' / 'non_medical'
+            article: 引用的條文名稱，例如「醫療法第85條」
+            date_from / date_to: 建立時間範圍（datetime，date_to 不含）
+            after: 上一頁最後一筆的 (score, _id)，用於 keyset 分頁
+            limit: 最多返回筆數
+            
+        Returns:
+            ([{'_id', 'project_id', 'verdict', 'created_at', 'score'}, ...], has_more, truncated)
+            truncated 表示符合條件的記錄超過候選上限，較早的記錄未列入結果
+        """
+        collection = db.get_collection('record_search')
+        match = {'user_id': _to_object_id(user_id)}
+        if terms:
+            match['terms'] = {'$all': terms}
+        if verdict:
+            match['verdict'] = verdict
+        if article:
+            match['articles'] = article
+        if date_from or date_to:
+            match['created_at'] = {}
+            if date_from:
+                match['created_at']['$gte'] = date_from
+            if date_to:
+                match['created_at']['$lt'] = date_to
+        fields = {'project_id': 1, 'verdict': 1, 'created_at': 1}
+        
+        if not terms:
+            # 沒有查詢詞時分數皆為 0，直接沿 (user_id, _id) 索引由新到舊分頁
+            if after:
+                match['_id'] = {'$lt': after[1]}
+            hits = list(collection.find(match, fields).sort('_id', -1).limit(limit + 1))
+            for hit in hits:
+                hit['score'] = 0
+            return hits[:limit], len(hits) > limit, False
+        
+        max_candidates = Config.SEARCH_MAX_CANDIDATES
+        pipeline = [
+            {'$match': match},
+            # 先依 _id 取最新的候選記錄，之後的計分與排序最多處理 max_candidates 筆
+            {'$sort': {'_id': -1}},
+            {'$limit': max_candidates},
+            {'$project': dict(fields, score={'$size': {'$setIntersection': ['$ad_terms', terms]}})}
+        ]
+        if after:
+            score, last_id = after
+            pipeline.append({'$match': {'$or': [
+                {'score': {'$lt': score}},
+                {'score': score, '_id': {'$lt': last_id}}
+            ]}})
+        pipeline += [
+            {'$sort': {'score': -1, '_id': -1}},
+            {'$limit': limit + 1}
+        ]
+        hits = list(collection.aggregate(pipeline))
+        # 只在第一頁檢查是否超過候選上限（略過 max_candidates 筆索引項目，成本同樣有上限）
+        truncated = not after and bool(list(
+            collection.find(match, {'_id': 1}).sort('_id', -1).skip(max_candidates).limit(1)
+        ))
+        return hits[:limit], len(hits) > limit, truncated
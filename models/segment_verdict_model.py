@@ -0,0 +1,51 @@
+"""
+句子判斷結果快取資料模型
+
+以句子正規化後的雜湊為鍵值，保存逐句分析的結果，
+廣告修改後重新檢測時，未變更的句子直接沿用先前的判斷。
+"""
+from database import db
+from datetime import datetime
+
+
+class SegmentVerdictModel:
+    """句子判斷結果資料操作類別"""
+    
+    @staticmethod
+    def find_many(keys):
+        """
+        批次查詢句子判斷結果
+        
+        Args:
+            keys: 句子鍵值列表
+            
+        Returns:
+            {鍵值: 判斷結果字典}
+        """
+        if not keys:
+            return {}
+        collection = db.get_collection('segment_verdict')
+        docs = collection.find({'_id': {'$in': list(set(keys))}})
+        return {doc['_id']: doc['verdict'] for doc in docs}
+    
+    @staticmethod
+    def save_many(verdicts):
+        """
+        批次儲存句子判斷結果
+        
+        Args:
+            verdicts: {鍵值: 判斷結果字典}
+        """
+        if not verdicts:
+            return
+        from pymongo import UpdateOne
+        collection = db.get_collection('segment_verdict')
+        now = datetime.now()
+        collection.bulk_write([
+            UpdateOne(
+                {'_id': key},
+                {'$set': {'verdict': verdict, 'updated_at': now}},
+                upsert=True
+            )
+            for key, verdict in verdicts.items()
+        ], ordered=False)
@@ -0,0 +1,48 @@
+"""
+系統統計資料模型
+
+管理介面顯示的集合總數以 estimated_document_count 取得（讀取集合中繼資料，不掃描文件），
+並在行程內快取 ADMIN_TOTALS_TTL 秒，文件數量增加到數百萬筆也不會拖慢管理頁面。
+"""
+import threading
+import time
+from database import db
+from config import Config
+
+# 統計名稱與集合名稱
+TOTAL_COLLECTIONS = {
+    'users': 'user',
+    'projects': 'project',
+    'records': 'project_record',
+    'reports': 'report'
+}
+
+_totals_lock = threading.Lock()
+_totals_cache = {'value': None, 'expires_at': 0.0}
+
+
+class StatsModel:
+    """系統統計資料操作類別"""
+    
+    @staticmethod
+    def totals(refresh=False):
+        """
+        取得各集合的估計總數（快取 ADMIN_TOTALS_TTL 秒）
+        
+        Args:
+            refresh: 是否忽略快取重新讀取
+            
+        Returns:
+            字典，鍵為 TOTAL_COLLECTIONS 的統計名稱，另含 age（快取秒數）
+        """
+        now = time.monotonic()
+        with _totals_lock:
+            if refresh or _totals_cache['value'] is None or now >= _totals_cache['expires_at']:
+                _totals_cache['value'] = {
+                    name: db.get_collection(collection).estimated_document_count()
+                    for name, collection in TOTAL_COLLECTIONS.items()
+                }
+                _totals_cache['expires_at'] = now + Config.ADMIN_TOTALS_TTL
+            totals = dict(_totals_cache['value'])
+            totals['age'] = round(Config.ADMIN_TOTALS_TTL - (_totals_cache['expires_at'] - now))
+        return totals
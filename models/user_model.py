@@ -2,6 +2,13 @@
 用戶資料模型
 """
 from database import db
+from bson import ObjectId
+from utils.password_utils import (
+    hash_password, check_password
+)
+
+# 用戶列表只返回的欄位
+USER_LIST_FIELDS = {'user_name': 1, 'user_email': 1, 'user_type': 1}
 
 
 class UserModel:
@@ -15,12 +22,27 @@ class UserModel:
     
     @staticmethod
     def find_by_email_and_password(email, password):
-        """根據 email 和 password 查找用戶"""
+        """
+        根據 email 和 password 查找用戶
+        
+        密碼驗證（以及帳號不存在時的等成本驗證、舊雜湊的重新雜湊）在雜湊執行緒池中以單一工作完成；
+        若儲存的雜湊為舊版明文或成本參數已變更，驗證成功後會以目前的參數重新雜湊
+        """
         collection = db.get_collection('user')
-        return collection.find_one({
-            "user_email": email,
-            "user_password": password
-        })
+        user = collection.find_one({"user_email": email})
+        
+        stored = user.get('user_password') if user is not None else None
+        valid, new_hash = check_password(password, stored)
+        if not valid:
+            return None
+        
+        if new_hash:
+            collection.update_one(
+                {'_id': user['_id'], 'user_password': stored},
+                {'$set': {'user_password': new_hash}}
+            )
+        
+        return user
     
     @staticmethod
     def find_by_name_and_email(name, email):
@@ -40,7 +62,7 @@ class UserModel:
         return collection.insert_one({
             "user_name": user_name,
             "user_email": user_email,
-            "user_password": user_password
+            "user_password": hash_password(user_password)
         })
     
     @staticmethod
@@ -49,7 +71,7 @@ class UserModel:
         collection = db.get_collection('user')
         return collection.update_one(
             {"user_email": email},
-            {"$set": {"user_password": new_password}}
+            {"$set": {"user_password": hash_password(new_password)}}
         )
     
     @staticmethod
@@ -59,16 +81,16 @@ class UserModel:
         return collection.find_one({'user_name': user_name})
     
     @staticmethod
-    def add_report_to_user(user_id, report_id):
-        """在用戶記錄中添加問題回報 ID"""
-        collection = db.get_collection('user')
-        return collection.update_one(
-            {'_id': user_id},
-            {'$push': {'reports': report_id}}
-        )
-    
-    @staticmethod
-    def count_all():
-        """計算所有用戶數量"""
+    def find_page(before_id=None, limit=50):
+        """
+        分頁查詢用戶（keyset 分頁，依 _id 由新到舊，不返回密碼）
+        
+        Returns:
+            (users, has_more)
+        """
         collection = db.get_collection('user')
-        return collection.count_documents({})
+        query = {}
+        if before_id:
+            query['_id'] = {'$lt': ObjectId(before_id) if isinstance(before_id, str) else before_id}
+        users = list(collection.find(query, USER_LIST_FIELDS).sort('_id', -1).limit(limit + 1))
+        return users[:limit], len(users) > limit
@@ -0,0 +1,66 @@
+"""
+管理介面路由（頁面路由）
+
+頁面只渲染版面與估計總數，列表資料由 static/js/admin.js 透過 /api/admin 分頁載入
+"""
+from flask import Blueprint, render_template, request, abort
+from models.stats_model import StatsModel
+from utils.jwt_utils import admin_required_page
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+# 管理列表：標題、對應的統計名稱與欄位（type 決定前端的顯示方式）
+MANAGE_TABS = {
+    'users': {
+        'title': '用戶管理',
+        'columns': [
+            {'key': 'user_name', 'label': '名稱', 'type': 'text'},
+            {'key': 'user_email', 'label': 'Email', 'type': 'text'},
+            {'key': 'user_type', 'label': '類型', 'type': 'text'},
+            {'key': '_id', 'label': '註冊時間', 'type': 'id_time'},
+            {'key': '_id', 'label': '專案', 'type': 'user_link'}
+        ]
+    },
+    'projects': {
+        'title': '專案管理',
+        'columns': [
+            {'key': 'project_name', 'label': '專案名稱', 'type': 'text'},
+            {'key': 'user_id', 'label': '擁有者', 'type': 'user_link'},
+            {'key': 'created_at', 'label': '建立時間', 'type': 'time'},
+            {'key': 'updated_at', 'label': '更新時間', 'type': 'time'}
+        ]
+    },
+    'reports': {
+        'title': '問題回報',
+        'columns': [
+            {'key': 'user_name', 'label': '用戶', 'type': 'text'},
+            {'key': 'report_text', 'label': '回報內容', 'type': 'text'},
+            {'key': 'created_at', 'label': '回報時間', 'type': 'time'},
+            {'key': 'user_id', 'label': '用戶回報', 'type': 'user_link'}
+        ]
+    }
+}
+
+
+@admin_bp.route('')
+@admin_required_page
+def dashboard():
+    """管理介面首頁（系統總覽）"""
+    return render_template('admin_home.html',
+                         active='dashboard',
+                         totals=StatsModel.totals())
+
+
+@admin_bp.route('/manage/<tab>')
+@admin_required_page
+def manage(tab):
+    """用戶 / 專案 / 問題回報管理列表"""
+    if tab not in MANAGE_TABS:
+        abort(404)
+    
+    return render_template('admin_manage.html',
+                         active=tab,
+                         title=MANAGE_TABS[tab]['title'],
+                         columns=MANAGE_TABS[tab]['columns'],
+                         # 依用戶篩選時集合總數不代表篩選結果，不顯示
+                         total=None if request.args.get('user_id') else StatsModel.totals()[tab])
@@ -0,0 +1,270 @@
+"""
+管理員 RESTful API 路由
+"""
+import os
+from flask import Blueprint, Response, request, jsonify
+from models.user_model import UserModel
+from models.project_model import ProjectModel, record_buffer
+from models.report_model import ReportModel
+from models.stats_model import StatsModel
+from utils.jwt_utils import admin_required
+from utils.cache_utils import response_cache, fragment_cache
+from utils.detect_service import detection_stats, detection_user_stats
+from utils.event_hub import event_hub
+from utils.gemini_service import gemini_service
+from utils.profiler import profile_store, memory_tracker, window_lock, profile_window
+from bson import ObjectId
+from config import Config
+
+admin_api_bp = Blueprint('admin_api', __name__, url_prefix='/api/admin')
+
+
+def _page_args():
+    """
+    解析分頁參數（before、limit、user_id）
+    
+    Returns:
+        (before_id, limit, user_id, error_response)；參數錯誤時 error_response 不為 None
+    """
+    before_id = request.args.get('before')
+    user_id = request.args.get('user_id')
+    limit = max(1, min(request.args.get('limit', 20, type=int), Config.ADMIN_PAGE_SIZE))
+    
+    if before_id and not ObjectId.is_valid(before_id):
+        return None, None, None, (jsonify({
+            'success': False,
+            'message': '無效的分頁位置'
+        }), 400)
+    
+    if user_id and not ObjectId.is_valid(user_id):
+        return None, None, None, (jsonify({
+            'success': False,
+            'message': '無效的用戶 ID'
+        }), 400)
+    
+    return before_id, limit, user_id, None
+
+
+def _page_response(key, items, has_more, total, user_id=None):
+    return jsonify({
+        'success': True,
+        key: items,
+        'has_more': has_more,
+        # 下一頁以最後一筆的 _id 作為 before 參數
+        'next_before': items[-1]['_id'] if has_more else None,
+        # 總數為整個集合快取的估計值，不隨文件數量增加而變慢；依用戶篩選時不代表篩選結果，返回 None
+        'total': None if user_id else total
+    })
+
+
+@admin_api_bp.route('/users', methods=['GET'])
+@admin_required
+def list_users():
+    """
+    分頁獲取用戶（由新到舊，不含密碼）
+    GET /api/admin/users?before=<user_id>&limit=20
+    """
+    before_id, limit, _, error = _page_args()
+    if error:
+        return error
+    
+    users, has_more = UserModel.find_page(before_id, limit)
+    return _page_response('users', users, has_more, StatsModel.totals()['users'])
+
+
+@admin_api_bp.route('/projects', methods=['GET'])
+@admin_required
+def list_projects():
+    """
+    分頁獲取專案（由新到舊）
+    GET /api/admin/projects?before=<project_id>&limit=20&user_id=<user_id>
+    """
+    before_id, limit, user_id, error = _page_args()
+    if error:
+        return error
+    
+    projects, has_more = ProjectModel.find_page(before_id, limit, user_id=user_id)
+    return _page_response('projects', projects, has_more, StatsModel.totals()['projects'], user_id)
+
+
+@admin_api_bp.route('/reports', methods=['GET'])
+@admin_required
+def list_reports():
+    """
+    分頁獲取問題回報（由新到舊）
+    GET /api/admin/reports?before=<report_id>&limit=20&user_id=<user_id>
+    """
+    before_id, limit, user_id, error = _page_args()
+    if error:
+        return error
+    
+    reports, has_more = ReportModel.find_page(before_id, limit, user_id=user_id)
+    return _page_response('reports', reports, has_more, StatsModel.totals()['reports'], user_id)
+
+
+@admin_api_bp.route('/stats', methods=['GET'])
+@admin_required
+def system_stats():
+    """
+    系統使用狀況（集合總數、檢測佇列、模型配額、快取命中率）
+    GET /api/admin/stats?refresh=1
+    """
+    pool = gemini_service.model_pool
+    models = pool.snapshot()
+    
+    response = jsonify({
+        'success': True,
+        'totals': StatsModel.totals(refresh=request.args.get('refresh') == '1'),
+        # 佇列與快取統計為處理此請求的 worker 行程的數值
+        'detection': detection_stats(),
+        # 各用戶的速率限制與公平佇列計數（最多列出 50 位）
+        'detection_users': detection_user_stats()[:50],
+        'push_subscribers': event_hub.subscriber_count(),
+        'record_buffer': record_buffer.stats() if record_buffer.enabled else None,
+        'models': models,
+        'quota': {
+            'available_models': sum(1 for model in models if model['available']),
+            'total_models': len(models),
+            'next_reset_in': round(pool.next_quota_reset())
+        },
+        'caches': {
+            'response': response_cache.stats(),
+            'fragment': fragment_cache.stats()
+        }
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _collapsed_response(profiler):
+    """以純文字回傳 collapsed stacks（可直接交給 flamegraph.pl 或 speedscope）"""
+    response = Response(profiler.collapsed(), content_type='text/plain; charset=utf-8')
+    response.headers['X-Profile-Samples'] = str(profiler.samples)
+    response.headers['X-Worker-Pid'] = str(os.getpid())
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@admin_api_bp.route('/profile', methods=['POST'])
+@admin_required
+def profile_worker():
+    """
+    取樣處理此請求的 worker 所有執行緒一段時間
+    POST /api/admin/profile?seconds=10&interval=0.005
+    """
+    seconds = request.args.get('seconds', 10, type=float)
+    interval = request.args.get('interval', Config.PROFILE_SAMPLE_INTERVAL, type=float)
+    
+    if not 0 < seconds <= Config.PROFILE_MAX_SECONDS or not 0.001 <= interval <= 1:
+        return jsonify({
+            'success': False,
+            'message': f'取樣秒數需介於 0 到 {Config.PROFILE_MAX_SECONDS:g} 之間，間隔需介於 0.001 到 1 秒之間'
+        }), 400
+    
+    if not window_lock.acquire(blocking=False):
+        return jsonify({
+            'success': False,
+            'message': '此 worker 已有進行中的取樣'
+        }), 409
+    
+    try:
+        profiler = profile_window(seconds, interval)
+    finally:
+        window_lock.release()
+    
+    return _collapsed_response(profiler)
+
+
+@admin_api_bp.route('/profile/requests', methods=['GET'])
+@admin_required
+def list_request_profiles():
+    """
+    此 worker 最近的單次請求分析（請求帶 X-Profile header 時產生）
+    GET /api/admin/profile/requests
+    """
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'profiles': profile_store.summaries()
+    })
+
+
+@admin_api_bp.route('/profile/requests/<profile_id>', methods=['GET'])
+@admin_required
+def get_request_profile(profile_id):
+    """
+    單次請求分析的 collapsed stacks
+    GET /api/admin/profile/requests/<profile_id>
+    """
+    profiler = profile_store.get(profile_id)
+    
+    if not profiler:
+        return jsonify({
+            'success': False,
+            'message': '分析結果不存在（可能已被較新的結果取代，或由其他 worker 產生）'
+        }), 404
+    
+    return _collapsed_response(profiler)
+
+
+@admin_api_bp.route('/memory/start', methods=['POST'])
+@admin_required
+def start_memory_trace():
+    """
+    開始追蹤此 worker 的記憶體配置並建立基準快照
+    POST /api/admin/memory/start?frames=1
+    """
+    frames = max(1, min(request.args.get('frames', 1, type=int), 25))
+    memory_tracker.start(frames)
+    
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'message': '已開始追蹤記憶體配置'
+    })
+
+
+@admin_api_bp.route('/memory/diff', methods=['GET'])
+@admin_required
+def memory_diff():
+    """
+    與上一次快照比較記憶體增減（比較後以本次快照作為新基準）
+    GET /api/admin/memory/diff?group=lineno|filename|traceback&limit=30
+    """
+    group = request.args.get('group', 'lineno')
+    limit = max(1, min(request.args.get('limit', 30, type=int), 200))
+    
+    if group not in ('lineno', 'filename', 'traceback'):
+        return jsonify({
+            'success': False,
+            'message': '不支援的分組方式'
+        }), 400
+    
+    result = memory_tracker.diff(group, limit)
+    
+    if result is None:
+        return jsonify({
+            'success': False,
+            'pid': os.getpid(),
+            'message': '此 worker 未追蹤記憶體配置，請先呼叫 /api/admin/memory/start'
+        }), 409
+    
+    response = jsonify(dict(result, success=True, pid=os.getpid()))
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@admin_api_bp.route('/memory/stop', methods=['POST'])
+@admin_required
+def stop_memory_trace():
+    """
+    停止追蹤記憶體配置
+    POST /api/admin/memory/stop
+    """
+    memory_tracker.stop()
+    
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'message': '已停止追蹤記憶體配置'
+    })
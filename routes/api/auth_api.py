@@ -41,11 +41,12 @@ def login():
             'message': '帳號或密碼錯誤'
         }), 401
     
-    # 生成 JWT token
+    # 生成 JWT token（管理員帳號的用戶文件帶有 user_type: 'admin'）
+    user_type = user.get('user_type', 'user')
     token = JWTManager.generate_token(
         user_id=user['_id'],
         user_name=user['user_name'],
-        user_type='user'
+        user_type=user_type
     )
     
     # 建立回應
@@ -56,7 +57,8 @@ def login():
         'user': {
             'id': str(user['_id']),
             'name': user['user_name'],
-            'email': user['user_email']
+            'email': user['user_email'],
+            'type': user_type
         }
     }))
     
@@ -0,0 +1,38 @@
+"""
+廣告即時檢查 RESTful API 路由
+"""
+from flask import Blueprint, request, jsonify
+from utils.jwt_utils import jwt_required
+from utils.lint_utils import lint_ad
+from config import Config
+
+lint_api_bp = Blueprint('lint_api', __name__, url_prefix='/api')
+
+
+@lint_api_bp.route('/lint', methods=['POST'])
+@jwt_required
+def lint():
+    """以本地規則即時檢查廣告中的禁止用語（不呼叫 Gemini）"""
+    data = request.get_json(silent=True) or {}
+    text = data.get('text', '')
+    
+    if not isinstance(text, str):
+        return jsonify({
+            'success': False,
+            'message': '廣告內容格式錯誤'
+        }), 400
+    
+    if len(text) > Config.LINT_MAX_CHARS:
+        return jsonify({
+            'success': False,
+            'message': f'廣告內容超過 {Config.LINT_MAX_CHARS} 字，無法即時檢查'
+        }), 413
+    
+    matches, articles = lint_ad(text)
+    response = jsonify({
+        'success': True,
+        'matches': matches,
+        'articles': articles
+    })
+    response.headers['Cache-Control'] = 'no-store'
+    return response
@@ -1,10 +1,18 @@
 """
 專案管理 RESTful API 路由
 """
-from flask import Blueprint, request, jsonify
+import math
+import time
+from urllib.parse import quote
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from models.project_model import ProjectModel, ProjectRecordModel
+from models.cache_version_model import CacheVersionModel
 from utils.jwt_utils import jwt_required
+from utils.cache_utils import cached_json_response
+from utils.export_utils import EXPORT_FORMATS, stream_csv, stream_jsonl, stream_xlsx
+from utils.event_hub import event_hub, RECORD_EVENT_FIELDS, SubscriberLimitReached
 from bson import ObjectId
+from config import Config
 
 project_api_bp = Blueprint('project_api', __name__, url_prefix='/api/project')
 
@@ -12,13 +20,21 @@ project_api_bp = Blueprint('project_api', __name__, url_prefix='/api/project')
 @project_api_bp.route('/list', methods=['GET'])
 @jwt_required
 def list_projects():
-    """獲取用戶的所有專案"""
+    """獲取用戶的所有專案（支援 ETag / If-None-Match）"""
     user_id = request.current_user.get('user_id')
-    projects = ProjectModel.find_by_user_id(user_id)
-    return jsonify({
-        'success': True,
-        'projects': projects
-    })
+    
+    def build_payload():
+        projects = ProjectModel.find_by_user_id(user_id)
+        return {
+            'success': True,
+            'projects': projects
+        }, 200
+    
+    return cached_json_response(
+        f'project_list:{user_id}',
+        CacheVersionModel.get(user_id),
+        build_payload
+    )
 
 
 @project_api_bp.route('/create', methods=['POST'])
@@ -35,8 +51,7 @@ def create_project():
             'message': '請輸入專案名稱'
         }), 400
     
-    project_id = ProjectModel.create(user_id, project_name)
-    project = ProjectModel.find_by_id(project_id)
+    project = ProjectModel.create(user_id, project_name)
     
     return jsonify({
         'success': True,
@@ -48,39 +63,107 @@ def create_project():
 @project_api_bp.route('/<project_id>', methods=['GET'])
 @jwt_required
 def get_project(project_id):
-    """獲取專案詳情和記錄"""
+    """
+    獲取專案詳情和記錄（支援 ETag / If-None-Match）
+    GET /api/project/<project_id>?limit=20（未指定 limit 時返回所有記錄）
+    """
     user_id = request.current_user.get('user_id')
-    project = ProjectModel.find_by_id(project_id)
+    limit = request.args.get('limit', type=int)
     
-    if not project:
+    def build_payload():
+        # 以 {_id, user_id} 查詢，不屬於當前用戶的專案與不存在的專案一律返回 404
+        project = ProjectModel.find_owned(project_id, user_id)
+        
+        if not project:
+            return {
+                'success': False,
+                'message': '專案不存在'
+            }, 404
+        
+        # 獲取專案記錄（指定 limit 時只返回最新的 limit 筆）
+        if limit:
+            records, has_more = ProjectRecordModel.find_page(project_id, limit=limit, user_id=user_id)
+        else:
+            records, has_more = ProjectRecordModel.find_by_project_id(project_id, user_id=user_id), False
+        
+        return {
+            'success': True,
+            'project': project,
+            'records': records,
+            'has_more_records': has_more
+        }, 200
+    
+    return cached_json_response(
+        f'project:{user_id}:{project_id}:{limit}',
+        CacheVersionModel.get(user_id),
+        build_payload
+    )
+
+
+@project_api_bp.route('/<project_id>/records', methods=['GET'])
+@jwt_required
+def list_records(project_id):
+    """
+    分頁獲取專案記錄（由新到舊，用於載入更早的記錄）
+    GET /api/project/<project_id>/records?before=<record_id>&limit=20
+    """
+    user_id = request.current_user.get('user_id')
+    before_id = request.args.get('before')
+    limit = min(request.args.get('limit', Config.HOME_RECORD_LIMIT, type=int), 100)
+    
+    if before_id and not ObjectId.is_valid(before_id):
+        return jsonify({
+            'success': False,
+            'message': '無效的記錄 ID'
+        }), 400
+    
+    if not ObjectId.is_valid(project_id):
         return jsonify({
             'success': False,
             'message': '專案不存在'
         }), 404
     
-    # 檢查專案是否屬於當前用戶
-    if str(project['user_id']) != str(user_id):
+    # 記錄帶有 user_id，查詢本身即限定為當前用戶的記錄，只有查無記錄時才需要確認專案是否存在；
+    # 舊記錄回填 user_id 前查詢會包含缺少 user_id 的記錄，因此需先確認專案擁有者
+    backfill_pending = ProjectRecordModel.owner_backfill_pending()
+    if backfill_pending and not ProjectModel.find_owned(project_id, user_id):
         return jsonify({
             'success': False,
-            'message': '無權限訪問此專案'
-        }), 403
+            'message': '專案不存在'
+        }), 404
     
-    # 獲取專案記錄
-    records = ProjectRecordModel.find_by_project_id(project_id)
+    records, has_more = ProjectRecordModel.find_page(project_id, before_id, limit, user_id=user_id)
+    
+    if not records and not backfill_pending and not ProjectModel.find_owned(project_id, user_id):
+        return jsonify({
+            'success': False,
+            'message': '專案不存在'
+        }), 404
     
     return jsonify({
         'success': True,
-        'project': project,
-        'records': records
+        'records': records,
+        'has_more_records': has_more
     })
 
 
-@project_api_bp.route('/<project_id>', methods=['PUT'])
+@project_api_bp.route('/<project_id>/export', methods=['GET'])
 @jwt_required
-def update_project(project_id):
-    """更新專案名稱"""
+def export_records(project_id):
+    """
+    匯出專案的所有記錄（串流輸出，記憶體用量與記錄數量無關）
+    GET /api/project/<project_id>/export?format=csv|jsonl|xlsx
+    """
     user_id = request.current_user.get('user_id')
-    project = ProjectModel.find_by_id(project_id)
+    export_format = request.args.get('format', 'csv')
+    
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({
+            'success': False,
+            'message': '不支援的匯出格式（csv、jsonl、xlsx）'
+        }), 400
+    
+    project = ProjectModel.find_owned(project_id, user_id)
     
     if not project:
         return jsonify({
@@ -88,13 +171,111 @@ def update_project(project_id):
             'message': '專案不存在'
         }), 404
     
-    # 檢查專案是否屬於當前用戶
-    if str(project['user_id']) != str(user_id):
+    records = ProjectRecordModel.iter_by_project_id(project['_id'], user_id)
+    if export_format == 'csv':
+        body = stream_csv(records)
+    elif export_format == 'jsonl':
+        body = stream_jsonl(records, current_app.json.dumps)
+    else:
+        body = stream_xlsx(records, sheet_name=project['project_name'])
+    
+    filename = f"{project['project_name']}.{export_format}"
+    response = Response(stream_with_context(body), content_type=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename=\"export.{export_format}\"; filename*=UTF-8''{quote(filename, safe='')}"
+    )
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def _sse_message(event_type, data, event_id=None):
+    """格式化一則 Server-Sent Events 訊息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {current_app.json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+@project_api_bp.route('/<project_id>/events', methods=['GET'])
+@jwt_required
+def project_events(project_id):
+    """
+    專案即時推播（Server-Sent Events）
+    GET /api/project/<project_id>/events
+    事件：record（新記錄）、record_updated（重新評估）、project（改名）、project_deleted、resync（需重新載入）
+    此行程的連線數已達 PUSH_MAX_SUBSCRIBERS 時返回 503 與 Retry-After
+    """
+    user_id = request.current_user.get('user_id')
+    
+    if not Config.PUSH_ENABLED:
+        return jsonify({
+            'success': False,
+            'message': '即時推播未啟用'
+        }), 404
+    
+    project = ProjectModel.find_owned(project_id, user_id)
+    
+    if not project:
         return jsonify({
             'success': False,
-            'message': '無權限修改此專案'
-        }), 403
+            'message': '專案不存在'
+        }), 404
+    
+    # 先訂閱再補送遺漏的記錄，兩者之間寫入的記錄可能重複送出（前端依記錄 ID 去除重複）
+    try:
+        subscription = event_hub.subscribe(project['_id'])
+    except SubscriberLimitReached as e:
+        response = jsonify({
+            'success': False,
+            'message': str(e)
+        })
+        response.headers['Retry-After'] = str(math.ceil(e.retry_after))
+        return response, 503
+    # 瀏覽器自動重新連線時帶 Last-Event-ID Header；前端手動重新訂閱時改用查詢參數
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    missed = []
+    if ObjectId.is_valid(last_event_id):
+        missed = ProjectRecordModel.find_after(project['_id'], user_id, last_event_id)
+    
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            for record in missed:
+                payload = {field: record.get(field) for field in RECORD_EVENT_FIELDS}
+                yield _sse_message('record', payload, record['_id'])
+            
+            while time.monotonic() < subscription.deadline:
+                event = subscription.get(timeout=Config.PUSH_HEARTBEAT_SECONDS)
+                if subscription.overflowed:
+                    yield _sse_message('resync', {})
+                    return
+                if event is None:
+                    # 心跳：維持連線並偵測已關閉的連線
+                    yield ': ping\n\n'
+                    continue
+                event_type, data = event
+                # 只有新記錄帶 id，重新連線時以 Last-Event-ID 補送之後的記錄
+                event_id = data['_id'] if event_type == 'record' else None
+                yield _sse_message(event_type, data, event_id)
+                if event_type == 'project_deleted':
+                    return
+        finally:
+            event_hub.unsubscribe(subscription)
     
+    response = Response(stream_with_context(stream()), content_type='text/event-stream; charset=utf-8')
+    response.headers['Cache-Control'] = 'no-store'
+    # 避免反向代理緩衝事件
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@project_api_bp.route('/<project_id>', methods=['PUT'])
+@jwt_required
+def update_project(project_id):
+    """更新專案名稱"""
+    user_id = request.current_user.get('user_id')
     data = request.get_json()
     new_name = data.get('project_name', '').strip()
     
@@ -104,8 +285,14 @@ def update_project(project_id):
             'message': '請輸入專案名稱'
         }), 400
     
-    ProjectModel.update_name(project_id, new_name)
-    updated_project = ProjectModel.find_by_id(project_id)
+    # 單次 find_one_and_update 完成權限檢查、更新並取回更新後的專案
+    updated_project = ProjectModel.update_name(project_id, new_name, user_id)
+    
+    if not updated_project:
+        return jsonify({
+            'success': False,
+            'message': '專案不存在'
+        }), 404
     
     return jsonify({
         'success': True,
@@ -119,23 +306,13 @@ def update_project(project_id):
 def delete_project(project_id):
     """刪除專案"""
     user_id = request.current_user.get('user_id')
-    project = ProjectModel.find_by_id(project_id)
     
-    if not project:
+    if not ProjectModel.delete(project_id, user_id):
         return jsonify({
             'success': False,
             'message': '專案不存在'
         }), 404
     
-    # 檢查專案是否屬於當前用戶
-    if str(project['user_id']) != str(user_id):
-        return jsonify({
-            'success': False,
-            'message': '無權限刪除此專案'
-        }), 403
-    
-    ProjectModel.delete(project_id)
-    
     return jsonify({
         'success': True,
         'message': '專案刪除成功'
@@ -147,27 +324,20 @@ def delete_project(project_id):
 def create_record(project_id):
     """建立專案記錄"""
     user_id = request.current_user.get('user_id')
-    project = ProjectModel.find_by_id(project_id)
     
-    if not project:
+    if not ProjectModel.find_owned(project_id, user_id):
         return jsonify({
             'success': False,
             'message': '專案不存在'
         }), 404
     
-    # 檢查專案是否屬於當前用戶
-    if str(project['user_id']) != str(user_id):
-        return jsonify({
-            'success': False,
-            'message': '無權限訪問此專案'
-        }), 403
-    
     data = request.get_json()
     input_ad = data.get('input_ad', '')
     result_law = data.get('result_law', '')
     result_advice = data.get('result_advice', '')
     
-    record_id = ProjectRecordModel.create(project_id, input_ad, result_law, result_advice)
+    record_id = ProjectRecordModel.create(project_id, input_ad, result_law, result_advice,
+                                         user_id=user_id)
     
     return jsonify({
         'success': True,
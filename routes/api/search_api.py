@@ -0,0 +1,129 @@
+"""
+檢測記錄搜尋 RESTful API 路由
+"""
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify
+from models.project_model import ProjectModel, ProjectRecordModel
+from models.search_index_model import SearchIndexModel
+from utils.jwt_utils import jwt_required
+from utils.law_index import normalize_article_ref
+from utils.search_utils import query_terms, build_snippet
+from utils.text_utils import html_to_text
+from bson import ObjectId
+
+search_api_bp = Blueprint('search_api', __name__, url_prefix='/api')
+
+VERDICTS = ('violation', 'compliant', 'non_medical')
+
+
+def _error(message):
+    return jsonify({
+        'success': False,
+        'message': message
+    }), 400
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def _parse_cursor(value):
+    """分頁游標格式為「score:record_id」"""
+    score, _, record_id = value.partition(':')
+    if not score.isdigit() or not ObjectId.is_valid(record_id):
+        return None
+    return int(score), ObjectId(record_id)
+
+
+def _parse_article(value):
+    """接受「醫療法第85條」或只有條號「85」"""
+    if value.isdigit():
+        return f'醫療法第{value}條'
+    return normalize_article_ref(value)
+
+
+@search_api_bp.route('/search', methods=['GET'])
+@jwt_required
+def search():
+    """
+    搜尋用戶所有專案的檢測記錄（廣告內容與分析結果）
+    GET /api/search?q=關鍵字&verdict=violation&article=85&from=2024-01-01&to=2024-12-31&cursor=<next_cursor>&limit=20
+    """
+    user_id = request.current_user.get('user_id')
+    query = request.args.get('q', '').strip()
+    verdict = request.args.get('verdict') or None
+    article = request.args.get('article') or None
+    date_from = request.args.get('from') or None
+    date_to = request.args.get('to') or None
+    cursor = request.args.get('cursor') or None
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    
+    terms = query_terms(query)
+    if query and not terms:
+        return _error('請輸入至少兩個字的關鍵字')
+    if not terms and not (verdict or article or date_from or date_to):
+        return _error('請輸入關鍵字或篩選條件')
+    if verdict and verdict not in VERDICTS:
+        return _error('無效的檢測結果篩選')
+    if article:
+        article = _parse_article(article)
+        if not article:
+            return _error('無效的條文')
+    if date_from:
+        date_from = _parse_date(date_from)
+        if not date_from:
+            return _error('日期格式應為 YYYY-MM-DD')
+    if date_to:
+        date_to = _parse_date(date_to)
+        if not date_to:
+            return _error('日期格式應為 YYYY-MM-DD')
+        date_to += timedelta(days=1)  # 包含結束日當天
+    if cursor:
+        cursor = _parse_cursor(cursor)
+        if not cursor:
+            return _error('無效的分頁游標')
+    
+    hits, has_more, truncated = SearchIndexModel.search(
+        user_id, terms,
+        verdict=verdict, article=article,
+        date_from=date_from, date_to=date_to,
+        after=cursor, limit=limit
+    )
+    
+    # 以兩次批次查詢取得記錄內容與專案名稱
+    records = ProjectRecordModel.find_by_ids([hit['_id'] for hit in hits], user_id)
+    project_names = ProjectModel.find_names({hit['project_id'] for hit in hits}, user_id)
+    
+    results = []
+    for hit in hits:
+        record = records.get(hit['_id'])
+        if not record:
+            continue
+        # 查詢詞出現在廣告內容時擷取廣告片段，否則擷取分析結果片段
+        field = 'input_ad'
+        text = record['input_ad']
+        if terms and not hit['score']:
+            field = 'result'
+            text = html_to_text(record['result_law']) + '\n' + (record['result_advice'] or '')
+        results.append({
+            'record_id': hit['_id'],
+            'project_id': hit['project_id'],
+            'project_name': project_names.get(hit['project_id'], ''),
+            'verdict': hit.get('verdict'),
+            'created_at': hit.get('created_at'),
+            'score': hit['score'],
+            'field': field,
+            'snippet': build_snippet(text, query, terms)
+        })
+    
+    last = hits[-1] if hits else None
+    return jsonify({
+        'success': True,
+        'results': results,
+        'has_more': has_more,
+        'truncated': truncated,
+        'next_cursor': f"{last['score']}:{last['_id']}" if has_more else None
+    })
@@ -17,8 +17,10 @@ def login_page():
     if token:
         payload = JWTManager.verify_token(token)
         # 確保 payload 有效且包含必要的資訊
-        if payload and payload.get('user_id') and payload.get('user_type') == 'user':
-            # 已登入，重定向到首頁
+        if payload and payload.get('user_id') and payload.get('user_type') in ('user', 'admin'):
+            # 已登入，重定向到首頁（管理員重定向到管理介面）
+            if payload.get('user_type') == 'admin':
+                return redirect(url_for('admin.dashboard'))
             return redirect(url_for('user.home'))
         else:
             # Token 無效，清除它
@@ -45,8 +47,10 @@ def signup_page():
     if token:
         payload = JWTManager.verify_token(token)
         # 確保 payload 有效且包含必要的資訊
-        if payload and payload.get('user_id') and payload.get('user_type') == 'user':
-            # 已登入，重定向到首頁
+        if payload and payload.get('user_id') and payload.get('user_type') in ('user', 'admin'):
+            # 已登入，重定向到首頁（管理員重定向到管理介面）
+            if payload.get('user_type') == 'admin':
+                return redirect(url_for('admin.dashboard'))
             return redirect(url_for('user.home'))
         else:
             # Token 無效，清除它
@@ -1,51 +1,82 @@
 """
 用戶功能路由
 """
+import math
 from flask import Blueprint, render_template, request, redirect, url_for, jsonify
-from models.user_model import UserModel
 from models.report_model import ReportModel
-from utils.gemini_service import gemini_service
-from utils.text_utils import clean_markdown, format_as_list_html, format_as_list_html
-from utils.file_utils import load_law_document
+from pymongo.errors import DuplicateKeyError
+from utils.detect_service import detect_coalesced, check_rate_limit
+from utils.rate_limiter import RateLimitExceeded
+from utils.token_utils import PromptTooLargeError
 from utils.jwt_utils import jwt_required_page, jwt_required, JWTManager
+from utils.cache_utils import render_fragment
+from config import Config
 
 user_bp = Blueprint('user', __name__)
 
 
+def _rate_limited_response(error):
+    """429 回應，Retry-After 為預估可再送出的秒數"""
+    retry_after = max(1, math.ceil(error.retry_after))
+    response = jsonify({
+        'success': False,
+        'message': f'{error}，請於 {retry_after} 秒後再試',
+        'error_type': 'rate_limited',
+        'retry_after': retry_after
+    })
+    response.headers['Retry-After'] = str(retry_after)
+    return response, 429
+
+
 @user_bp.route('/home')
 @jwt_required_page
 def home():
     """主功能頁面"""
     from flask import request
-    from models.project_model import ProjectModel, ProjectRecordModel
+    from models.project_model import ProjectModel
     
     # 從 JWT 獲取用戶 ID
     user_id = request.current_user.get('user_id')
     
-    # 獲取用戶的所有專案
-    projects = ProjectModel.find_by_user_id(user_id)
-    
-    # 獲取當前專案 ID（從 query parameter 或 session）
+    # 獲取當前專案 ID（從 query parameter）；未指定時使用最新的專案
     current_project_id = request.args.get('project_id')
-    current_project = None
-    records = []
-    
-    if current_project_id:
-        # 驗證專案是否屬於當前用戶
-        project = ProjectModel.find_by_id(current_project_id)
-        if project and str(project['user_id']) == str(user_id):
-            current_project = project
-            records = ProjectRecordModel.find_by_project_id(current_project_id)
-    elif projects:
-        # 如果沒有指定專案，使用第一個專案
-        current_project = ProjectModel.find_by_id(projects[0]['_id'])
-        if current_project:
-            records = ProjectRecordModel.find_by_project_id(current_project['_id'])
+    
+    # 以單次聚合查詢取得專案列表、當前專案及其最新記錄
+    data = ProjectModel.find_home_data(
+        user_id,
+        current_project_id,
+        record_limit=Config.HOME_RECORD_LIMIT
+    )
+    current_project = data['current_project']
+    
+    # 側邊欄依用戶資料版本快取，模態框內容固定
+    sidebar_html = render_fragment(
+        'components/sidebar.html',
+        cache_key=(user_id, data['version'], current_project['_id'] if current_project else None),
+        projects=data['projects'],
+        current_project=current_project
+    )
+    modals_html = render_fragment('components/modals.html')
     
     return render_template('home.html', 
-                         projects=projects,
+                         projects=data['projects'],
                          current_project=current_project,
-                         records=records)
+                         records=data['records'],
+                         has_more_records=data['has_more_records'],
+                         push_enabled=Config.PUSH_ENABLED,
+                         sidebar_html=sidebar_html,
+                         modals_html=modals_html)
+
+
+def _replayed_response(record):
+    """返回先前以相同 Idempotency-Key 儲存的檢測結果"""
+    return jsonify({
+        'success': True,
+        'result_advice': record['result_advice'],
+        'result_law': record['result_law'],
+        'record_id': record['_id'],
+        'replayed': True
+    })
 
 
 @user_bp.route('/madetect', methods=['POST'])
@@ -54,7 +85,10 @@ def madetect():
     """
     連接 Gemini 辨認廣告 API
     POST /madetect
+    Header: Idempotency-Key（選填，重送時返回同一筆結果）
     Body: { "input_ad": "廣告內容", "project_id": "專案ID" }
+    
+    超過用戶速率限制或檢測佇列已滿時返回 429 與 Retry-After
     """
     from models.project_model import ProjectModel, ProjectRecordModel
     
@@ -74,51 +108,77 @@ def madetect():
             'message': '請提供專案 ID'
         }), 400
     
-    # 驗證專案是否屬於當前用戶
+    # 驗證專案是否屬於當前用戶（以 {_id, user_id} 單次查詢）
     user_id = request.current_user.get('user_id')
-    project = ProjectModel.find_by_id(project_id)
     
-    if not project:
+    if not ProjectModel.find_owned(project_id, user_id):
         return jsonify({
             'success': False,
             'message': '專案不存在'
         }), 404
     
-    if str(project['user_id']) != str(user_id):
-        return jsonify({
-            'success': False,
-            'message': '無權限訪問此專案'
-        }), 403
-    
     print(f"收到廣告內容: {input_ad}")
     
+    # 用戶端重送同一個請求時，直接返回先前儲存的結果
+    idempotency_key = request.headers.get('Idempotency-Key', '').strip()[:128] or None
+    if idempotency_key:
+        record = ProjectRecordModel.find_by_idempotency_key(project_id, idempotency_key)
+        if record:
+            return _replayed_response(record)
+    
+    # 重送不計入速率限制
     try:
-        # 載入法律文件
-        law_text = load_law_document()
-        
-        # 分析廣告是否違法
-        result_law = gemini_service.analyze_ad_law(input_ad, law_text)
-        print(f'法律分析結果: {result_law}')
-        
-        # 建議修改方案
-        result_advice = gemini_service.suggest_ad_revision(input_ad, result_law)
-        print(f'修改建議: {result_advice}')
-        
-        # 清理 Markdown 格式並格式化為條列式
-        result_law = clean_markdown(result_law)
-        result_law = format_as_list_html(result_law)  # 轉換為 HTML 條列式
-        result_advice = clean_markdown(result_advice)
+        check_rate_limit(user_id)
+    except RateLimitExceeded as e:
+        return _rate_limited_response(e)
+    
+    def store_result(result):
+        """儲存檢測結果；若其他 worker 已用相同 Idempotency-Key 建立記錄則沿用該記錄"""
+        try:
+            record_id = ProjectRecordModel.create(
+                project_id, input_ad, result['result_law'], result['result_advice'],
+                user_id=user_id,
+                idempotency_key=idempotency_key,
+                token_usage=result.get('token_usage'),
+                evaluation=result.get('evaluation')
+            )
+        except DuplicateKeyError:
+            record = ProjectRecordModel.find_by_idempotency_key(project_id, idempotency_key)
+            return dict(result, record_id=record['_id'])
+        return dict(result, record_id=str(record_id))
+    
+    try:
+        # 相同用戶、專案與廣告內容的並行請求只會呼叫一次 Gemini 並建立一筆記錄
+        weight = Config.DETECT_ADMIN_WEIGHT if request.current_user.get('user_type') == 'admin' else 1
+        result, shared = detect_coalesced(user_id, project_id, input_ad, store_result, weight)
         
-        # 儲存記錄到資料庫
-        ProjectRecordModel.create(project_id, input_ad, result_law, result_advice)
+        if shared and idempotency_key:
+            try:
+                ProjectRecordModel.add_idempotency_key(result['record_id'], idempotency_key)
+            except DuplicateKeyError:
+                # 相同 Idempotency-Key 的重送請求已由其他 worker 建立記錄，返回該記錄
+                record = ProjectRecordModel.find_by_idempotency_key(project_id, idempotency_key)
+                if record:
+                    return _replayed_response(record)
         
         response = {
             'success': True,
-            'result_advice': result_advice,
-            'result_law': result_law
+            'result_advice': result['result_advice'],
+            'result_law': result['result_law'],
+            'record_id': result['record_id']
         }
         
         return jsonify(response)
+    
+    except RateLimitExceeded as e:
+        return _rate_limited_response(e)
+    
+    except PromptTooLargeError as e:
+        return jsonify({
+            'success': False,
+            'message': str(e),
+            'error_type': 'input_too_large'
+        }), 413
         
     except Exception as e:
         error_message = str(e)
@@ -158,21 +218,8 @@ def add_report():
             'message': '請提供回報內容'
         }), 400
     
-    # 獲取用戶完整資訊
-    user = UserModel.find_by_name(user_name)
-    if not user:
-        return jsonify({
-            'success': False,
-            'message': '用戶不存在'
-        }), 404
-    
-    user_id_obj = user['_id']
-    
-    # 建立問題回報
-    report_id = ReportModel.create(user_name, user_id_obj, report_text)
-    
-    # 在用戶記錄中添加問題回報 ID
-    UserModel.add_report_to_user(user_id_obj, report_id)
+    # 建立問題回報（JWT 已帶有 user_id，不需再查詢用戶）
+    report_id = ReportModel.create(user_name, user_id, report_text)
     
     return jsonify({
         'success': True,
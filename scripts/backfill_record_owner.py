@@ -0,0 +1,65 @@
+"""
+專案記錄擁有者回填工具
+
+專案 API 以 {project_id, user_id} 查詢記錄，舊記錄缺少 user_id 時不會被查到。
+此工具依所屬專案為缺少 user_id 的 project_record 補上擁有者。
+
+用法：
+    python scripts/backfill_record_owner.py            # 只輸出統計，不修改資料
+    python scripts/backfill_record_owner.py --apply    # 執行回填
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db  # noqa: E402
+
+
+def backfill(apply=False):
+    records = db.get_collection('project_record')
+    projects = db.get_collection('project')
+    
+    # 依專案分組統計缺少 user_id 的記錄，每個專案只需一次 update_many
+    pipeline = [
+        {'$match': {'user_id': {'$exists': False}}},
+        {'$group': {'_id': '$project_id', 'count': {'$sum': 1}}}
+    ]
+    total = updated = orphaned = 0
+    for group in records.aggregate(pipeline):
+        total += group['count']
+        project = projects.find_one({'_id': group['_id']}, {'user_id': 1})
+        if not project:
+            # 專案已刪除但記錄殘留，保持原樣
+            orphaned += group['count']
+            continue
+        if apply:
+            result = records.update_many(
+                {'project_id': group['_id'], 'user_id': {'$exists': False}},
+                {'$set': {'user_id': project['user_id']}}
+            )
+            updated += result.modified_count
+        else:
+            updated += group['count']
+    
+    return total, updated, orphaned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='專案記錄擁有者回填工具')
+    parser.add_argument('--apply', action='store_true', help='實際寫入資料庫（預設只輸出統計）')
+    args = parser.parse_args()
+    
+    total, updated, orphaned = backfill(apply=args.apply)
+    if total == 0:
+        print('所有記錄皆已帶有 user_id')
+        return
+    
+    print(f"缺少 user_id 的記錄: {total}，可回填: {updated}{'（已寫入）' if args.apply else '（未寫入）'}")
+    if orphaned:
+        print(f"找不到所屬專案的記錄: {orphaned}")
+
+
+if __name__ == '__main__':
+    main()
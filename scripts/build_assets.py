@@ -0,0 +1,243 @@
+"""
+靜態資源建置工具
+
+將 static/ 下的 JS 打包（見 utils/assets.py 的 BUNDLES）、精簡 JS 與 CSS、
+以內容雜湊命名後輸出到 static/dist/，並預先產生 gzip（及 brotli，需安裝 brotli 套件）壓縮版本；
+安裝 Pillow 時另外重新壓縮 JPEG 並產生 WebP 版本。
+
+用法：
+    python scripts/build_assets.py
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from utils.assets import BUNDLES  # noqa: E402
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PILLOW_AVAILABLE = True
+except ImportError:
+    PILLOW_AVAILABLE = False
+
+STATIC_DIR = 'static'
+SOURCE_DIRS = ('pic', 'css', 'js')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# 小於此大小的檔案不預先壓縮
+COMPRESS_MIN_BYTES = 1024
+# 背景圖的最大寬度（px）
+IMAGE_MAX_WIDTH = 2560
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def hashed_name(path, data):
+    root, ext = posixpath.splitext(path)
+    return f'{root}.{content_hash(data)}{ext}'
+
+
+def minify_css(text):
+    """移除註解與多餘空白"""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    # 冒號前的空白在選擇器中有意義（例如「.a :hover」），只移除冒號後的空白
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """
+    保守的 JS 精簡：移除整行註解、區塊註解與縮排
+    （不改寫程式碼本身；多行樣板字串內的內容保持原樣）
+    """
+    lines = []
+    in_template = False
+    in_comment = False
+    for line in text.split('\n'):
+        stripped = line.strip()
+        if in_template:
+            lines.append(line)
+        elif in_comment:
+            if '*/' in stripped:
+                in_comment = False
+                rest = stripped.split('*/', 1)[1].strip()
+                if rest:
+                    lines.append(rest)
+            continue
+        elif stripped.startswith('/*'):
+            if '*/' not in stripped:
+                in_comment = True
+            else:
+                rest = stripped.split('*/', 1)[1].strip()
+                if rest:
+                    lines.append(rest)
+            continue
+        elif not stripped or stripped.startswith('//'):
+            continue
+        else:
+            lines.append(stripped)
+        # 奇數個反引號表示進入或離開多行樣板字串
+        if (line.count('`') - line.count('\\`')) % 2 == 1:
+            in_template = not in_template
+    return '\n'.join(lines) + '\n'
+
+
+def rewrite_css_urls(text, css_path, files):
+    """將 CSS 中的相對路徑改為雜湊後的 /assets/ 路徑"""
+    def replace(match):
+        url = match.group(2)
+        if url.startswith(('data:', 'http:', 'https:', '/')):
+            return match.group(0)
+        source = posixpath.normpath(posixpath.join(posixpath.dirname(css_path), url))
+        if source in files:
+            return f'url("/assets/{files[source]}")'
+        return match.group(0)
+    return re.sub(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', replace, text)
+
+
+def rewrite_static_paths(text, files):
+    """將 JS 中寫死的 /static/ 路徑改為雜湊後的 /assets/ 路徑"""
+    def replace(match):
+        source = match.group(1)
+        return f'/assets/{files[source]}' if source in files else match.group(0)
+    return re.sub(r'/static/([\w./-]+)', replace, text)
+
+
+def optimize_image(path, data):
+    """
+    重新壓縮 JPEG（需 Pillow）並產生 WebP 版本
+    
+    Returns:
+        (最佳化後的內容, WebP 內容或 None)
+    """
+    if not PILLOW_AVAILABLE:
+        return data, None
+    
+    image = Image.open(io.BytesIO(data))
+    if image.width > IMAGE_MAX_WIDTH:
+        image = image.resize((IMAGE_MAX_WIDTH, round(image.height * IMAGE_MAX_WIDTH / image.width)))
+    
+    optimized = data
+    if path.lower().endswith(('.jpg', '.jpeg')):
+        buffer = io.BytesIO()
+        image.convert('RGB').save(buffer, 'JPEG', quality=82, optimize=True, progressive=True)
+        if buffer.tell() < len(data):
+            optimized = buffer.getvalue()
+    
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=80, method=6)
+    webp = buffer.getvalue() if buffer.tell() < len(optimized) else None
+    return optimized, webp
+
+
+def write_output(dist_dir, name, data, variants):
+    """寫入檔案與預先壓縮的版本"""
+    path = os.path.join(dist_dir, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as file:
+        file.write(data)
+    
+    if len(data) < COMPRESS_MIN_BYTES or name.endswith(IMAGE_EXTENSIONS):
+        return
+    with open(path + '.gz', 'wb') as file:
+        # mtime 固定為 0，相同內容重複建置會得到相同檔案
+        file.write(gzip.compress(data, compresslevel=9, mtime=0))
+    variants.setdefault(name, []).append('.gz')
+    if BROTLI_AVAILABLE:
+        with open(path + '.br', 'wb') as file:
+            file.write(brotli.compress(data, quality=11))
+        variants[name].append('.br')
+
+
+def read_source(path):
+    with open(os.path.join(STATIC_DIR, path), 'rb') as file:
+        return file.read()
+
+
+def list_sources(directory):
+    root = os.path.join(STATIC_DIR, directory)
+    return sorted(
+        posixpath.join(directory, name) for name in os.listdir(root)
+        if os.path.isfile(os.path.join(root, name))
+    )
+
+
+def build(dist_dir=Config.ASSET_DIST_DIR):
+    if os.path.exists(dist_dir):
+        shutil.rmtree(dist_dir)
+    os.makedirs(dist_dir)
+    
+    files = {}
+    variants = {}
+    sizes = []
+    
+    # 1. 圖片（CSS 與 JS 會引用，需先建置）
+    for path in list_sources('pic'):
+        data = read_source(path)
+        optimized, webp = optimize_image(path, data) if path.lower().endswith(IMAGE_EXTENSIONS) else (data, None)
+        name = hashed_name(path, optimized)
+        write_output(dist_dir, name, optimized, variants)
+        if webp:
+            with open(os.path.join(dist_dir, name + '.webp'), 'wb') as file:
+                file.write(webp)
+            variants.setdefault(name, []).append('.webp')
+        files[path] = name
+        sizes.append((path, len(data), len(webp or optimized)))
+    
+    # 2. CSS
+    for path in list_sources('css'):
+        data = read_source(path)
+        text = minify_css(rewrite_css_urls(data.decode('utf-8'), path, files)).encode('utf-8')
+        name = hashed_name(path, text)
+        write_output(dist_dir, name, text, variants)
+        files[path] = name
+        sizes.append((path, len(data), len(text)))
+    
+    # 3. JS：個別檔案與打包
+    sources = {path: rewrite_static_paths(read_source(path).decode('utf-8'), files) for path in list_sources('js')}
+    outputs = {path: minify_js(text) for path, text in sources.items()}
+    for bundle, members in BUNDLES.items():
+        # 各檔案在瀏覽器中原本就是各自獨立的 script，串接時以分號分隔避免語句相連
+        outputs[bundle] = ';\n'.join(minify_js(sources[member]) for member in members)
+    for path, text in outputs.items():
+        data = text.encode('utf-8')
+        name = hashed_name(path, data)
+        write_output(dist_dir, name, data, variants)
+        files[path] = name
+        original = sum(len(sources[m].encode('utf-8')) for m in BUNDLES.get(path, [path]))
+        sizes.append((path, original, len(data)))
+    
+    with open(os.path.join(dist_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump({'files': files, 'variants': variants}, file, ensure_ascii=False, indent=2, sort_keys=True)
+    
+    return sizes
+
+
+def main():
+    sizes = build()
+    for path, before, after in sizes:
+        print(f'{path:32s} {before:>9,d} -> {after:>9,d} bytes')
+    print(f"輸出至 {Config.ASSET_DIST_DIR}（brotli: {'是' if BROTLI_AVAILABLE else '否'}，"
+          f"Pillow: {'是' if PILLOW_AVAILABLE else '否'}）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+檢測記錄搜尋索引建立工具
+
+新記錄在建立時即寫入 record_search 索引；此工具為既有記錄建立（或重建）索引。
+沒有 user_id 的舊記錄需先執行 scripts/backfill_record_owner.py。
+
+用法：
+    python scripts/build_search_index.py              # 只為尚未建立索引的記錄建立
+    python scripts/build_search_index.py --rebuild    # 清空後重建所有索引
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db  # noqa: E402
+from models.search_index_model import SearchIndexModel  # noqa: E402
+from utils.record_codec import decode_record  # noqa: E402
+
+
+def build(rebuild=False, batch_size=500):
+    records = db.get_collection('project_record')
+    index = db.get_collection('record_search')
+    
+    if rebuild:
+        index.delete_many({})
+    
+    indexed = skipped = without_owner = 0
+    last_id = None
+    while True:
+        # 依 _id 分批處理，每批只查詢一次已建立索引的記錄
+        query = {'_id': {'$gt': last_id}} if last_id else {}
+        batch = list(records.find(query).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+        
+        existing = set()
+        if not rebuild:
+            existing = {doc['_id'] for doc in index.find(
+                {'_id': {'$in': [doc['_id'] for doc in batch]}}, {'_id': 1}
+            )}
+        
+        for doc in batch:
+            if doc['_id'] in existing:
+                skipped += 1
+                continue
+            if not doc.get('user_id'):
+                without_owner += 1
+                continue
+            record = decode_record(doc)
+            SearchIndexModel.index_record(
+                record['_id'], record['user_id'], record['project_id'],
+                record['input_ad'], record['result_law'], record['result_advice'],
+                record['created_at']
+            )
+            indexed += 1
+    
+    return indexed, skipped, without_owner
+
+
+def main():
+    parser = argparse.ArgumentParser(description='檢測記錄搜尋索引建立工具')
+    parser.add_argument('--rebuild', action='store_true', help='清空後重建所有索引')
+    args = parser.parse_args()
+    
+    indexed, skipped, without_owner = build(rebuild=args.rebuild)
+    print(f"已建立索引: {indexed}，已存在: {skipped}")
+    if without_owner:
+        print(f"缺少 user_id 的記錄: {without_owner}（請先執行 scripts/backfill_record_owner.py --apply）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+專案記錄儲存格式遷移工具
+
+將舊格式的 project_record（HTML 字串、未壓縮長文字）轉為精簡格式，
+並輸出遷移前後每筆記錄的平均大小（BSON bytes）。
+處理過的記錄帶有 storage_version（無法精簡的純文字結果、短欄位也會標記），
+重複執行只會處理尚未遷移的記錄。
+
+用法：
+    python scripts/migrate_record_storage.py            # 只輸出報告，不修改資料
+    python scripts/migrate_record_storage.py --apply    # 執行遷移
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bson  # noqa: E402
+from database import db  # noqa: E402
+from utils.record_codec import encode_record_fields, decode_record, STORAGE_VERSION  # noqa: E402
+
+RECORD_FIELDS = ('input_ad', 'result_law', 'result_advice', 'result_law_items', 'input_ad_z', 'result_advice_z')
+
+
+def migrate(apply=False, batch_size=500):
+    """
+    遷移尚未標記目前儲存格式版本的記錄
+    
+    Returns:
+        (待處理記錄數, 需改寫格式的記錄數, 遷移前總大小, 遷移後總大小)；
+        其餘待處理記錄的格式已無法再精簡，只加上版本標記
+    """
+    collection = db.get_collection('project_record')
+    total = migrated = 0
+    bytes_before = bytes_after = 0
+    
+    for doc in collection.find({'storage_version': {'$ne': STORAGE_VERSION}}, batch_size=batch_size):
+        total += 1
+        bytes_before += len(bson.encode(doc))
+        
+        record = decode_record(doc)
+        encoded = {
+            key: value for key, value in doc.items()
+            if key not in RECORD_FIELDS
+        }
+        encoded.update(encode_record_fields(
+            record['input_ad'], record['result_law'], record['result_advice']
+        ))
+        bytes_after += len(bson.encode(encoded))
+        
+        changed = any(encoded.get(field) != doc.get(field) for field in RECORD_FIELDS)
+        if changed:
+            migrated += 1
+        if apply:
+            if changed:
+                collection.replace_one({'_id': doc['_id']}, encoded)
+            else:
+                collection.update_one({'_id': doc['_id']}, {'$set': {'storage_version': STORAGE_VERSION}})
+    
+    return total, migrated, bytes_before, bytes_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='專案記錄儲存格式遷移工具')
+    parser.add_argument('--apply', action='store_true', help='實際寫入資料庫（預設只輸出報告）')
+    args = parser.parse_args()
+    
+    total, migrated, bytes_before, bytes_after = migrate(apply=args.apply)
+    if total == 0:
+        print('沒有需要遷移的記錄')
+        return
+    
+    print(f"待處理記錄: {total}，需改寫格式: {migrated}，只標記版本: {total - migrated}"
+          f"{'（已寫入）' if args.apply else '（未寫入）'}")
+    print(f"遷移前平均大小: {bytes_before / total:.1f} bytes/筆")
+    print(f"遷移後平均大小: {bytes_after / total:.1f} bytes/筆")
+    if bytes_before:
+        print(f"節省: {(1 - bytes_after / bytes_before) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
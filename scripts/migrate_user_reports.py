@@ -0,0 +1,66 @@
+"""
+問題回報遷移工具
+
+問題回報改以 user_id 存於 report 集合後，用戶文件不再需要 reports 陣列。
+此工具為舊回報補上 user_id（ObjectId）與 created_at，並移除用戶文件中的 reports 陣列。
+
+用法：
+    python scripts/migrate_user_reports.py            # 只輸出統計，不修改資料
+    python scripts/migrate_user_reports.py --apply    # 執行遷移
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId  # noqa: E402
+from database import db  # noqa: E402
+
+
+def migrate(apply=False, batch_size=500):
+    users = db.get_collection('user')
+    reports = db.get_collection('report')
+    report_fixed = users_cleaned = 0
+    
+    # 舊回報的 user_id 可能是字串或缺少 created_at（以 ObjectId 的建立時間補上）
+    query = {'$or': [
+        {'created_at': {'$exists': False}},
+        {'user_id': {'$type': 'string'}}
+    ]}
+    for report in reports.find(query, {'user_id': 1, 'created_at': 1}, batch_size=batch_size):
+        fields = {}
+        if 'created_at' not in report:
+            fields['created_at'] = report['_id'].generation_time.replace(tzinfo=None)
+        user_id = report.get('user_id')
+        if isinstance(user_id, str) and ObjectId.is_valid(user_id):
+            fields['user_id'] = ObjectId(user_id)
+        if not fields:
+            continue
+        if apply:
+            reports.update_one({'_id': report['_id']}, {'$set': fields})
+        report_fixed += 1
+    
+    users_with_reports = users.count_documents({'reports': {'$exists': True}})
+    if apply and users_with_reports:
+        users_cleaned = users.update_many(
+            {'reports': {'$exists': True}},
+            {'$unset': {'reports': ''}}
+        ).modified_count
+    
+    return report_fixed, users_with_reports, users_cleaned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='問題回報遷移工具')
+    parser.add_argument('--apply', action='store_true', help='實際寫入資料庫（預設只輸出統計）')
+    args = parser.parse_args()
+    
+    report_fixed, users_with_reports, users_cleaned = migrate(apply=args.apply)
+    suffix = '（已寫入）' if args.apply else '（未寫入）'
+    print(f"需補上欄位的回報: {report_fixed}{suffix}")
+    print(f"帶有 reports 陣列的用戶: {users_with_reports}，已移除: {users_cleaned}{suffix}")
+
+
+if __name__ == '__main__':
+    main()
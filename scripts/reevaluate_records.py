@@ -0,0 +1,189 @@
+"""
+法規更新後重新評估專案記錄
+
+比對記錄評估時的法律文件版本與目前版本的條文差異，只重新評估引用或相關條文有變動的記錄；
+其餘記錄只更新版本標記。條文的比對範圍包含其相關的公告與說明章節（見 utils/law_index.py）。重新評估以令牌桶限制速率，並在配額用完時暫停。
+進度保存於 reevaluation_job 集合，中斷後重新執行會從上次處理到的記錄繼續。
+
+用法：
+    python scripts/reevaluate_records.py                      # 只輸出需要重新評估的記錄數
+    python scripts/reevaluate_records.py --apply              # 執行重新評估
+    python scripts/reevaluate_records.py --apply --rate 5     # 每分鐘最多重新評估 5 筆
+    python scripts/reevaluate_records.py --apply --restart    # 忽略先前的進度重新開始
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+from database import db  # noqa: E402
+from models.project_model import ProjectRecordModel  # noqa: E402
+from models.cache_version_model import CacheVersionModel  # noqa: E402
+from models.law_version_model import LawVersionModel  # noqa: E402
+from utils.law_index import law_index, GENERAL_SECTION  # noqa: E402
+from utils.law_version import diff_articles, changed_articles, relevant_articles  # noqa: E402
+from utils.rate_limiter import TokenBucket  # noqa: E402
+
+
+class ChangedArticles:
+    """各舊版本相對於目前版本有變動的條文（每個舊版本只計算一次）"""
+    
+    def __init__(self, current_hashes):
+        self.current_hashes = current_hashes
+        self._cache = {}
+    
+    def get(self, version):
+        """
+        Returns:
+            有變動的條文集合；版本未知（未標記或未登記）時返回 None，表示必須重新評估
+        """
+        if not version:
+            return None
+        if version not in self._cache:
+            previous = LawVersionModel.get(version)
+            self._cache[version] = changed_articles(
+                diff_articles(previous['article_hashes'], self.current_hashes)
+            ) if previous else None
+        return self._cache[version]
+
+
+def needs_reevaluation(record, changed):
+    """記錄引用或相關的條文是否有變動；沒有引用條文的內容有變動時所有記錄都需要重新評估"""
+    if changed is None or GENERAL_SECTION in changed:
+        return True
+    return bool(relevant_articles(record['input_ad'], record.get('cited_articles')) & changed)
+
+
+def load_job(law_version, restart=False):
+    collection = db.get_collection('reevaluation_job')
+    if restart:
+        collection.delete_one({'_id': law_version})
+    job = collection.find_one({'_id': law_version})
+    if job is None:
+        job = {
+            '_id': law_version,
+            'last_id': None,
+            'status': 'running',
+            'reevaluated': 0,
+            'restamped': 0,
+            'failed': 0,
+            'started_at': datetime.now()
+        }
+        collection.insert_one(job)
+    return job
+
+
+def save_job(job):
+    job['updated_at'] = datetime.now()
+    db.get_collection('reevaluation_job').replace_one({'_id': job['_id']}, job)
+
+
+def dry_run(law_version, changed_lookup, include_unstamped, batch_size):
+    rerun = restamp = 0
+    last_id = None
+    while True:
+        records = ProjectRecordModel.find_for_reevaluation(
+            law_version, last_id, batch_size, include_unstamped
+        )
+        if not records:
+            break
+        for record in records:
+            if needs_reevaluation(record, changed_lookup.get(record.get('law_version'))):
+                rerun += 1
+            else:
+                restamp += 1
+        last_id = records[-1]['_id']
+    print(f'需要重新評估: {rerun} 筆，只需更新版本標記: {restamp} 筆（未寫入）')
+
+
+def reevaluate(law_version, changed_lookup, include_unstamped, batch_size, rate_per_minute, restart):
+    # 只在實際執行時載入 Gemini 服務
+    from utils.detect_service import run_detection
+    from utils.gemini_service import gemini_service
+    from utils.token_utils import PromptTooLargeError
+    
+    job = load_job(law_version, restart)
+    if job['status'] == 'done':
+        print(f'版本 {law_version} 的重新評估已完成（使用 --restart 重新執行）')
+        return
+    
+    limiter = TokenBucket(rate_per_minute / 60.0, capacity=1)
+    while True:
+        records = ProjectRecordModel.find_for_reevaluation(
+            law_version, job['last_id'], batch_size, include_unstamped
+        )
+        if not records:
+            break
+        
+        for record in records:
+            if not needs_reevaluation(record, changed_lookup.get(record.get('law_version'))):
+                ProjectRecordModel.restamp(record['_id'], law_version)
+                job['restamped'] += 1
+            else:
+                limiter.acquire()
+                # 所有模型的配額都用完時，等到最早恢復的模型可用
+                quota_wait = gemini_service.model_pool.next_quota_reset()
+                if quota_wait > 0:
+                    print(f'API 配額已用完，等待 {quota_wait:.0f} 秒')
+                    time.sleep(quota_wait)
+                try:
+                    result = run_detection(record['input_ad'])
+                except PromptTooLargeError as e:
+                    print(f"記錄 {record['_id']} 略過: {e}")
+                    job['failed'] += 1
+                except Exception as e:
+                    if 'API 配額已用完' in str(e):
+                        # 保留進度，稍後重新執行即可從這筆記錄繼續
+                        save_job(job)
+                        print(f'配額不足，已暫停（進度已保存）: {e}')
+                        return
+                    print(f"記錄 {record['_id']} 重新評估失敗: {e}")
+                    job['failed'] += 1
+                else:
+                    ProjectRecordModel.update_evaluation(
+                        record['_id'], result['result_law'], result['result_advice'],
+                        result['evaluation'], result.get('token_usage')
+                    )
+                    CacheVersionModel.bump_for_project(record['project_id'])
+                    job['reevaluated'] += 1
+            
+            job['last_id'] = record['_id']
+            save_job(job)
+        
+        print(f"進度: 重新評估 {job['reevaluated']} 筆，更新版本 {job['restamped']} 筆，失敗 {job['failed']} 筆")
+    
+    job['status'] = 'done'
+    save_job(job)
+    print(f"完成: 重新評估 {job['reevaluated']} 筆，更新版本 {job['restamped']} 筆，失敗 {job['failed']} 筆")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='法規更新後重新評估專案記錄')
+    parser.add_argument('--apply', action='store_true', help='實際重新評估並寫入資料庫（預設只輸出統計）')
+    parser.add_argument('--rate', type=float, default=Config.REEVALUATION_RATE_PER_MINUTE,
+                        help='每分鐘最多重新評估的記錄數')
+    parser.add_argument('--batch', type=int, default=100, help='每批讀取的記錄數')
+    parser.add_argument('--include-unstamped', action='store_true',
+                        help='包含尚未標記法律文件版本的舊記錄（全部重新評估）')
+    parser.add_argument('--restart', action='store_true', help='忽略先前保存的進度')
+    args = parser.parse_args()
+    
+    law_version = law_index.version
+    diff = LawVersionModel.register(law_version, law_index.article_hashes)
+    print(f'目前法律文件版本: {law_version}')
+    if diff:
+        print(f"條文差異: 新增 {diff['added']}，刪除 {diff['removed']}，修改 {diff['changed']}")
+    
+    changed_lookup = ChangedArticles(law_index.article_hashes)
+    if args.apply:
+        reevaluate(law_version, changed_lookup, args.include_unstamped, args.batch, args.rate, args.restart)
+    else:
+        dry_run(law_version, changed_lookup, args.include_unstamped, args.batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+/**
+ * 管理介面 JavaScript 模組
+ */
+
+// 系統總覽的即時統計更新間隔
+const ADMIN_STATS_INTERVAL_MS = 10000;
+
+// 管理列表每次載入的筆數
+const ADMIN_PAGE_SIZE = 20;
+
+/**
+ * 以管理員身分呼叫 /api/admin
+ */
+async function adminFetch(url) {
+    const token = localStorage.getItem('jwt_token');
+    const headers = {};
+    if (token) {
+        headers['Authorization'] = `Bearer ${token}`;
+    }
+    const response = await fetch(url, {
+        method: 'GET',
+        headers: headers,
+        credentials: 'include'
+    });
+    if (response.status === 401 || response.status === 403) {
+        window.location.href = '/login';
+        return null;
+    }
+    return response.json();
+}
+
+function escapeAdminHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value == null ? '' : String(value);
+    return div.innerHTML;
+}
+
+/**
+ * 從 ObjectId 前 4 bytes 取得建立時間（用戶文件沒有 created_at 欄位）
+ */
+function objectIdTime(id) {
+    return new Date(parseInt(String(id).substring(0, 8), 16) * 1000);
+}
+
+function formatAdminTime(date) {
+    return date && !isNaN(date) ? date.toLocaleString('zh-TW') : '';
+}
+
+/**
+ * 取得巢狀欄位（例如 'caches.response.hit_rate'）
+ */
+function getStatValue(stats, path) {
+    return path.split('.').reduce((value, key) => (value == null ? undefined : value[key]), stats);
+}
+
+/**
+ * 初始化系統總覽頁面，定期更新即時統計
+ */
+function initAdminDashboard() {
+    refreshAdminStats();
+    setInterval(refreshAdminStats, ADMIN_STATS_INTERVAL_MS);
+}
+
+async function refreshAdminStats() {
+    try {
+        const data = await adminFetch('/api/admin/stats');
+        if (!data || !data.success) return;
+        
+        document.querySelectorAll('[data-stat]').forEach(el => {
+            const value = getStatValue(data, el.dataset.stat);
+            if (value === undefined) return;
+            el.textContent = el.dataset.format === 'percent'
+                ? `${(value * 100).toFixed(1)}%`
+                : value;
+        });
+        renderModelHealth(data.models);
+    } catch (error) {
+        console.error('載入系統統計失敗:', error);
+    }
+}
+
+function renderModelHealth(models) {
+    const tbody = document.getElementById('admin-models');
+    if (!tbody) return;
+    
+    tbody.innerHTML = models.map(model => `
+        <tr>
+            <td>${escapeAdminHtml(model.name)}</td>
+            <td>${escapeAdminHtml(model.available ? model.state : `${model.state}（停用）`)}</td>
+            <td>${escapeAdminHtml(model.mean_latency_ms ?? '-')}</td>
+            <td>${escapeAdminHtml(model.p95_latency_ms ?? '-')}</td>
+            <td>${escapeAdminHtml((model.error_rate * 100).toFixed(1))}%</td>
+            <td>${escapeAdminHtml(model.quota_limited_for)}</td>
+            <td>${escapeAdminHtml(model.total_requests)}</td>
+        </tr>
+    `).join('');
+}
+
+/**
+ * 初始化管理列表頁面（keyset 分頁，點擊「載入更多」載入下一頁）
+ *
+ * @param {Object} options - { tab, columns }
+ */
+function initAdminManage(options) {
+    const state = {
+        tab: options.tab,
+        columns: options.columns,
+        userId: new URLSearchParams(window.location.search).get('user_id'),
+        nextBefore: null,
+        loading: false
+    };
+    
+    const button = document.getElementById('admin-load-more');
+    button.addEventListener('click', () => loadAdminPage(state));
+    loadAdminPage(state);
+}
+
+async function loadAdminPage(state) {
+    if (state.loading) return;
+    state.loading = true;
+    
+    const button = document.getElementById('admin-load-more');
+    button.disabled = true;
+    
+    const params = new URLSearchParams({ limit: ADMIN_PAGE_SIZE });
+    if (state.nextBefore) params.set('before', state.nextBefore);
+    if (state.userId) params.set('user_id', state.userId);
+    
+    try {
+        const data = await adminFetch(`/api/admin/${state.tab}?${params}`);
+        if (!data || !data.success) {
+            console.error('載入列表失敗:', data && data.message);
+            return;
+        }
+        
+        const rows = data[state.tab].map(item => renderAdminRow(state, item)).join('');
+        document.getElementById('admin-rows').insertAdjacentHTML('beforeend', rows);
+        // 依用戶篩選時 total 為 null（集合總數不代表篩選結果）
+        document.getElementById('admin-total').textContent =
+            data.total === null ? '（篩選用戶）' : `（約 ${data.total} 筆）`;
+        
+        state.nextBefore = data.next_before;
+        button.style.display = data.has_more ? '' : 'none';
+    } catch (error) {
+        console.error('載入列表時發生錯誤:', error);
+    } finally {
+        state.loading = false;
+        button.disabled = false;
+    }
+}
+
+function renderAdminRow(state, item) {
+    const cells = state.columns.map(column => {
+        const value = item[column.key];
+        switch (column.type) {
+            case 'time':
+                return formatAdminTime(value ? new Date(value) : null);
+            case 'id_time':
+                return formatAdminTime(objectIdTime(value));
+            case 'user_link': {
+                // 用戶列表連到該用戶的專案，其他列表篩選同一用戶的項目
+                const target = state.tab === 'users' ? 'projects' : state.tab;
+                return value
+                    ? `<a href="/admin/manage/${target}?user_id=${encodeURIComponent(value)}">查看</a>`
+                    : '';
+            }
+            default:
+                return escapeAdminHtml(value);
+        }
+    });
+    return `<tr>${cells.map(cell => `<td>${cell}</td>`).join('')}</tr>`;
+}
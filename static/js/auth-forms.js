@@ -52,7 +52,7 @@ function initLoginForm(form, isAdmin) {
         const result = await login(email, password);
         
         if (result.success) {
-            window.location.href = "/home";
+            window.location.href = result.user && result.user.type === 'admin' ? "/admin" : "/home";
         } else {
             if (errorElement) {
                 errorElement.textContent = result.message || 'Invalid email or password';
@@ -96,6 +96,8 @@ function madetect() {
     // 發送請求
     sendDetectionRequest(inputAD)
         .then((response) => {
+            // 推播稍後送來同一筆記錄時略過
+            if (typeof markRecordRendered !== 'undefined') markRecordRendered(response.record_id);
             // 更新結果框內容
             updateResults(response.result_law, response.result_advice);
             // 添加新的輸入框
@@ -146,6 +148,8 @@ function madetects(container) {
     // 發送請求
     sendDetectionRequest(inputAD)
         .then((response) => {
+            // 推播稍後送來同一筆記錄時略過
+            if (typeof markRecordRendered !== 'undefined') markRecordRendered(response.record_id);
             // 更新結果框內容
             updateResultsForContainer(container, response.result_law, response.result_advice);
             // 添加新的輸入框
@@ -163,6 +167,19 @@ function madetects(container) {
         });
 }
 
+/**
+ * 產生 Idempotency-Key（同一次送出的重試使用相同的 key）
+ */
+function generateIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === 'function') {
+        return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// 網路中斷或閘道錯誤時自動重試的次數
+const DETECTION_MAX_RETRIES = 2;
+
 /**
  * 發送檢測請求
  */
@@ -180,60 +197,79 @@ function sendDetectionRequest(inputAd) {
         
         // 使用 authenticatedFetch 或直接使用 fetch with token
         const token = getToken();
+        // 重試時沿用同一個 key，伺服器會返回同一筆結果而不會重複分析
+        const idempotencyKey = generateIdempotencyKey();
         
-        $.ajax({
-            url: '/madetect',
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': token ? `Bearer ${token}` : ''
-            },
-            data: JSON.stringify({ 
-                input_ad: inputAd,
-                project_id: projectId
-            }),
-            success: function(response) {
-                // 檢查 response 是否包含 success 欄位
-                if (response && response.success === false) {
-                    reject(new Error(response.message || '請求失敗'));
-                } else {
-                    resolve(response);
-                }
-            },
-            error: function(error) {
-                const errorData = error.responseJSON || {};
-                const errorMessage = errorData.message || '請求失敗';
-                
-                // 如果是 401，可能需要重新登入
-                if (error.status === 401) {
-                    alert('登入已過期，請重新登入');
-                    window.location.href = '/login';
-                } else if (error.status === 429) {
-                    // API 配額限制
-                    alert(errorMessage + '\n\n免費層每日限制為 20 次請求，請稍後再試。');
-                } else if (error.status === 400) {
-                    alert(errorMessage || '請求失敗，請檢查是否已選擇專案');
-                } else if (error.status === 500) {
-                    alert(errorMessage || '伺服器錯誤，請稍後再試');
-                } else if (error.status === 200) {
-                    // 如果狀態碼是 200 但進入 error，可能是 JSON 解析問題
-                    try {
-                        const response = typeof error.responseJSON !== 'undefined' ? error.responseJSON : JSON.parse(error.responseText);
-                        if (response && response.success === false) {
-                            alert(response.message || '請求失敗');
-                        } else {
-                            resolve(response);
-                            return;
+        function attempt(retriesLeft) {
+            $.ajax({
+                url: '/madetect',
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': token ? `Bearer ${token}` : '',
+                    'Idempotency-Key': idempotencyKey
+                },
+                data: JSON.stringify({ 
+                    input_ad: inputAd,
+                    project_id: projectId
+                }),
+                success: function(response) {
+                    // 檢查 response 是否包含 success 欄位
+                    if (response && response.success === false) {
+                        reject(new Error(response.message || '請求失敗'));
+                    } else {
+                        resolve(response);
+                    }
+                },
+                error: function(error) {
+                    // 網路中斷或閘道錯誤，使用相同的 Idempotency-Key 重試
+                    if (retriesLeft > 0 && [0, 502, 503, 504].includes(error.status)) {
+                        setTimeout(() => attempt(retriesLeft - 1), 1000);
+                        return;
+                    }
+                    
+                    const errorData = error.responseJSON || {};
+                    const errorMessage = errorData.message || '請求失敗';
+                    
+                    // 如果是 401，可能需要重新登入
+                    if (error.status === 401) {
+                        alert('登入已過期，請重新登入');
+                        window.location.href = '/login';
+                    } else if (error.status === 429 && errorData.error_type === 'rate_limited') {
+                        // 用戶速率限制或檢測佇列已滿（訊息包含建議等待的秒數）
+                        alert(errorMessage);
+                    } else if (error.status === 429) {
+                        // API 配額限制
+                        alert(errorMessage + '\n\n免費層每日限制為 20 次請求，請稍後再試。');
+                    } else if (error.status === 413) {
+                        // 廣告內容過長
+                        alert(errorMessage);
+                    } else if (error.status === 400) {
+                        alert(errorMessage || '請求失敗，請檢查是否已選擇專案');
+                    } else if (error.status === 500) {
+                        alert(errorMessage || '伺服器錯誤，請稍後再試');
+                    } else if (error.status === 200) {
+                        // 如果狀態碼是 200 但進入 error，可能是 JSON 解析問題
+                        try {
+                            const response = typeof error.responseJSON !== 'undefined' ? error.responseJSON : JSON.parse(error.responseText);
+                            if (response && response.success === false) {
+                                alert(response.message || '請求失敗');
+                            } else {
+                                resolve(response);
+                                return;
+                            }
+                        } catch (e) {
+                            console.error('解析回應錯誤:', e);
                         }
-                    } catch (e) {
-                        console.error('解析回應錯誤:', e);
+                    } else {
+                        alert(errorMessage || '請求失敗，請稍後再試');
                     }
-                } else {
-                    alert(errorMessage || '請求失敗，請稍後再試');
+                    reject(error);
                 }
-                reject(error);
-            }
-        });
+            });
+        }
+        
+        attempt(DETECTION_MAX_RETRIES);
     });
 }
 
@@ -243,6 +279,11 @@ function sendDetectionRequest(inputAd) {
 function setProcessingState(processing, container = null) {
     isProcessing = processing;
     
+    // 檢測完成後顯示期間收到的推播記錄
+    if (!processing && typeof flushPushedRecords !== 'undefined') {
+        flushPushedRecords();
+    }
+    
     let editableContent;
     let submitButton;
     
@@ -566,9 +607,117 @@ function setBorderColors(pinkDiv, greenDiv, darkGreenDiv = null) {
     }
 }
 
+// 即時檢查：輸入停頓超過此毫秒數才送出請求
+const LINT_DEBOUNCE_MS = 400;
+// 提示中命中用語前後顯示的字數
+const LINT_CONTEXT_CHARS = 8;
+
+let lintTimer = null;
+let lintController = null;
+
+/**
+ * 輸入時延遲觸發即時檢查（只檢查目前的輸入框）
+ */
+function scheduleLint(element) {
+    clearTimeout(lintTimer);
+    lintTimer = setTimeout(() => lintInput(element), LINT_DEBOUNCE_MS);
+}
+
+/**
+ * 送出即時檢查請求並顯示提示（新的請求會取消尚未完成的舊請求）
+ */
+async function lintInput(element) {
+    const text = element.textContent;
+    const hints = getLintHintsContainer(element);
+
+    if (lintController) {
+        lintController.abort();
+    }
+    if (!text.trim()) {
+        hints.innerHTML = '';
+        return;
+    }
+
+    lintController = new AbortController();
+    try {
+        const token = getToken();
+        const response = await fetch('/api/lint', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Authorization': token ? `Bearer ${token}` : ''
+            },
+            body: JSON.stringify({ text: text }),
+            signal: lintController.signal
+        });
+        const data = await response.json();
+        // 回應期間內容已變更時，以之後的請求結果為準
+        if (!data.success || element.textContent !== text) {
+            return;
+        }
+        renderLintHints(hints, text, data.matches, data.articles);
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error('即時檢查失敗:', error);
+        }
+    }
+}
+
+/**
+ * 取得（或建立）輸入框下方的提示區塊
+ */
+function getLintHintsContainer(element) {
+    const inputBlock = element.closest('.input-block') || element.parentElement;
+    let hints = inputBlock.nextElementSibling;
+    if (!hints || !hints.classList.contains('lint-hints')) {
+        hints = document.createElement('div');
+        hints.classList.add('lint-hints');
+        inputBlock.after(hints);
+    }
+    // 移除已送出的舊輸入框留下的提示
+    document.querySelectorAll('.lint-hints').forEach(other => {
+        if (other !== hints) {
+            other.remove();
+        }
+    });
+    return hints;
+}
+
+/**
+ * 顯示命中的用語（含前後文）與相關法條
+ */
+function renderLintHints(hints, text, matches, articles) {
+    hints.innerHTML = '';
+    matches.forEach(match => {
+        const hint = document.createElement('div');
+        hint.classList.add('lint-hint');
+
+        const before = text.slice(Math.max(0, match.start - LINT_CONTEXT_CHARS), match.start);
+        const after = text.slice(match.end, match.end + LINT_CONTEXT_CHARS);
+        const mark = document.createElement('mark');
+        mark.textContent = text.slice(match.start, match.end);
+        hint.append(`…${before}`, mark, `${after}…　${match.message}`);
+
+        const article = document.createElement('span');
+        article.classList.add('lint-article');
+        article.textContent = `（${match.article}）`;
+        article.title = articles[match.article] || '';
+        hint.appendChild(article);
+
+        hints.appendChild(hint);
+    });
+}
+
 // 頁面載入完成後設置所有輸入框的貼上處理器
 document.addEventListener('DOMContentLoaded', function() {
     if (typeof setupAllPasteHandlers !== 'undefined') {
         setupAllPasteHandlers();
     }
+
+    // 輸入框會在每次檢測後重新建立，因此以事件委派監聽目前的輸入框
+    document.addEventListener('input', function(e) {
+        if (e.target.id === 'inputAD') {
+            scheduleLint(e.target);
+        }
+    });
 });
@@ -5,6 +5,27 @@
 // 全域變數：當前專案 ID
 let currentProjectId = null;
 
+// 每次載入的記錄數（更早的記錄點擊「載入更早的記錄」後才載入）
+const RECORD_PAGE_SIZE = 20;
+
+// 當前專案的即時推播連線（新記錄、重新評估、改名、刪除）
+let projectEventSource = null;
+
+// 伺服器是否啟用即時推播（未啟用時不建立連線，避免每次切換專案都得到 404）
+const PUSH_ENABLED = Boolean(window.initialHomeData && window.initialHomeData.push_enabled);
+
+// 連線被伺服器拒絕（例如 503 連線數已滿）後重新連線的等待時間（毫秒），每次失敗加倍
+const PUSH_RETRY_MIN_MS = 2000;
+const PUSH_RETRY_MAX_MS = 60000;
+let pushRetryTimer = null;
+let pushRetryDelay = PUSH_RETRY_MIN_MS;
+
+// 已顯示的記錄 ID（推播與檢測回應可能送來同一筆記錄）
+const renderedRecordIds = new Set();
+
+// 檢測進行中收到的推播記錄，檢測完成後再顯示（避免與檢測回應重複）
+let pendingPushedRecords = [];
+
 /**
  * 獲取 JWT Token
  */
@@ -22,6 +43,7 @@ function showDefaultPage() {
     
     // 清除當前專案 ID
     currentProjectId = null;
+    closeProjectEvents();
     
     // 更新 URL
     window.history.pushState({}, '', '/home');
@@ -69,8 +91,10 @@ function showDefaultPage() {
 async function loadProjects() {
     try {
         const token = getToken();
+        // cache: 'no-cache' 讓瀏覽器帶上 If-None-Match，未變更時伺服器回應 304
         const response = await fetch('/api/project/list', {
             method: 'GET',
+            cache: 'no-cache',
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -190,8 +214,9 @@ async function loadProjectData(projectId) {
     
     try {
         const token = getToken();
-        const response = await fetch(`/api/project/${projectId}`, {
+        const response = await fetch(`/api/project/${projectId}?limit=${RECORD_PAGE_SIZE}`, {
             method: 'GET',
+            cache: 'no-cache',
             headers: {
                 'Authorization': `Bearer ${token}`,
                 'Content-Type': 'application/json'
@@ -222,11 +247,14 @@ async function loadProjectData(projectId) {
             
             // 載入記錄
             if (data.records && data.records.length > 0) {
-                renderProjectRecords(data.records);
+                renderProjectRecords(data.records, data.has_more_records);
             } else {
                 // 顯示初始輸入框
                 showInitialInput();
             }
+            
+            // 之後的新記錄由伺服器推送，不需要再重新載入
+            subscribeProjectEvents(projectId);
         } else {
             console.error('載入專案資料失敗:', data.message);
             alert(data.message || '載入專案資料失敗');
@@ -340,72 +368,147 @@ function createProjectBlackLine() {
     return newDivBlackLine;
 }
 
+/**
+ * 創建單筆記錄的元素（輸入、專業醫療建議、修改建議、分隔線）
+ */
+function createRecordNodes(record) {
+    // 輸入框
+    const inputDiv = createProjectDiv('請輸入廣告詞', 'Dgreen-bg', true, '');
+    inputDiv.dataset.recordId = record._id;
+    renderedRecordIds.add(record._id);
+    inputDiv.querySelector('.editable-content').textContent = record.input_ad;
+    inputDiv.querySelector('.editable-content').setAttribute('contenteditable', 'false');
+    
+    // 專業醫療建議
+    const lawDiv = createProjectDiv('專業醫療建議：', 'pink-bg', false, record.result_law);
+    
+    // 修改建議
+    const adviceDiv = createProjectDiv('以下是修改後的廣告詞：', 'Lgreen-bg', false, record.result_advice);
+    
+    // 分隔線
+    const blackLine = createProjectBlackLine();
+    
+    return [inputDiv, lawDiv, adviceDiv, blackLine];
+}
+
+/**
+ * 設置記錄區塊的邊框顏色
+ */
+function applyRecordBorderColors(root) {
+    root.querySelectorAll('.pink-bg, .Lgreen-bg, .Dgreen-bg').forEach(div => {
+        const title = div.querySelector('.title');
+        if (title) {
+            div.style.borderColor = window.getComputedStyle(title).backgroundColor;
+        }
+    });
+}
+
+/**
+ * 創建「載入更早的記錄」按鈕
+ */
+function createLoadEarlierButton(beforeId) {
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.id = 'load-earlier-records';
+    button.className = 'btn btn-outline-secondary btn-sm load-earlier-records';
+    button.dataset.beforeId = beforeId;
+    button.textContent = '載入更早的記錄';
+    button.onclick = loadEarlierRecords;
+    return button;
+}
+
 /**
  * 渲染專案記錄
  */
-function renderProjectRecords(records) {
+function renderProjectRecords(records, hasMore = false) {
     const rSide = document.querySelector('.r_side');
     if (!rSide) return;
     
     // 清空現有內容
     rSide.innerHTML = '';
+    renderedRecordIds.clear();
     
-    records.forEach((record, index) => {
-        // 輸入框
-        const inputDiv = createProjectDiv('請輸入廣告詞', 'Dgreen-bg', true, '');
-        inputDiv.querySelector('.editable-content').textContent = record.input_ad;
-        inputDiv.querySelector('.editable-content').setAttribute('contenteditable', 'false');
-        
-        // 專業醫療建議
-        const lawDiv = createProjectDiv('專業醫療建議：', 'pink-bg', false, record.result_law);
+    if (hasMore && records.length > 0) {
+        rSide.appendChild(createLoadEarlierButton(records[0]._id));
+    }
+    
+    records.forEach(record => {
+        createRecordNodes(record).forEach(node => rSide.appendChild(node));
+    });
+    
+    // 新的輸入框（最後一個記錄後）
+    const newInputDiv = createProjectDiv('請輸入廣告詞', 'Dgreen-bg', true, '');
+    const buttonContainer = document.createElement('div');
+    buttonContainer.classList.add('button-container');
+    newInputDiv.appendChild(buttonContainer);
+    
+    const newButton = document.createElement('button');
+    newButton.classList.add('custom-button');
+    newButton.innerHTML = '<img src="/static/pic/send4.png" width="24px" height="24px" alt="送出">';
+    newButton.onclick = function() {
+        if (typeof madetects !== 'undefined') {
+            madetects(newInputDiv);
+        } else {
+            alert('請先載入 home.js');
+        }
+    };
+    buttonContainer.appendChild(newButton);
+    rSide.appendChild(newInputDiv);
+    
+    // 設置邊框顏色
+    applyRecordBorderColors(rSide);
+}
+
+/**
+ * 載入更早的記錄並插入到目前記錄之前
+ */
+async function loadEarlierRecords() {
+    const button = document.getElementById('load-earlier-records');
+    if (!button || !currentProjectId) return;
+    
+    const projectId = currentProjectId;
+    button.disabled = true;
+    
+    try {
+        const token = getToken();
+        const response = await fetch(
+            `/api/project/${projectId}/records?before=${button.dataset.beforeId}&limit=${RECORD_PAGE_SIZE}`, {
+            method: 'GET',
+            headers: {
+                'Authorization': `Bearer ${token}`,
+                'Content-Type': 'application/json'
+            },
+            credentials: 'include'
+        });
         
-        // 修改建議
-        const adviceDiv = createProjectDiv('以下是修改後的廣告詞：', 'Lgreen-bg', false, record.result_advice);
+        const data = await response.json();
         
-        // 分隔線
-        const blackLine = createProjectBlackLine();
+        // 載入期間已切換專案則忽略結果
+        if (projectId !== currentProjectId) return;
         
-        // 新的輸入框（最後一個記錄後）
-        let newInputDiv = null;
-        if (index === records.length - 1) {
-            newInputDiv = createProjectDiv('請輸入廣告詞', 'Dgreen-bg', true, '');
-            const buttonContainer = document.createElement('div');
-            buttonContainer.classList.add('button-container');
-            newInputDiv.appendChild(buttonContainer);
-            
-            const newButton = document.createElement('button');
-            newButton.classList.add('custom-button');
-            newButton.innerHTML = '<img src="/static/pic/send4.png" width="24px" height="24px" alt="送出">';
-            newButton.onclick = function() {
-                if (typeof madetects !== 'undefined') {
-                    madetects(newInputDiv);
-                } else {
-                    alert('請先載入 home.js');
-                }
-            };
-            buttonContainer.appendChild(newButton);
+        if (!response.ok || !data.success) {
+            alert(data.message || '載入記錄失敗');
+            button.disabled = false;
+            return;
         }
         
-        // 添加到頁面
-        rSide.appendChild(inputDiv);
-        rSide.appendChild(lawDiv);
-        rSide.appendChild(adviceDiv);
-        if (index < records.length - 1) {
-            rSide.appendChild(blackLine);
-        }
-        if (newInputDiv) {
-            rSide.appendChild(blackLine);
-            rSide.appendChild(newInputDiv);
-        }
-    });
-    
-    // 設置邊框顏色
-    document.querySelectorAll('.pink-bg, .Lgreen-bg, .Dgreen-bg').forEach(div => {
-        const title = div.querySelector('.title');
-        if (title) {
-            div.style.borderColor = window.getComputedStyle(title).backgroundColor;
+        const fragment = document.createDocumentFragment();
+        data.records.forEach(record => {
+            createRecordNodes(record).forEach(node => fragment.appendChild(node));
+        });
+        applyRecordBorderColors(fragment);
+        button.after(fragment);
+        
+        if (data.has_more_records && data.records.length > 0) {
+            button.dataset.beforeId = data.records[0]._id;
+            button.disabled = false;
+        } else {
+            button.remove();
         }
-    });
+    } catch (error) {
+        console.error('載入記錄錯誤:', error);
+        button.disabled = false;
+    }
 }
 
 /**
@@ -567,6 +670,7 @@ async function deleteProject() {
             // 如果刪除的是當前專案，清空內容
             if (deleteProjectId === currentProjectId) {
                 currentProjectId = null;
+                closeProjectEvents();
                 clearProjectContent();
             }
             
@@ -581,6 +685,124 @@ async function deleteProject() {
     }
 }
 
+/**
+ * 訂閱專案的即時推播（Server-Sent Events，以 Cookie 中的 token 驗證）
+ * 連線中斷時瀏覽器會自動重新連線，並以 Last-Event-ID 補送遺漏的記錄；
+ * 伺服器拒絕連線（非 200 回應）時瀏覽器不再重試，改由此處以遞增間隔重新訂閱
+ */
+function subscribeProjectEvents(projectId, lastEventId = '') {
+    closeProjectEvents();
+    if (!PUSH_ENABLED || !projectId || typeof EventSource === 'undefined') return;
+    
+    // 手動重新連線無法設定 Last-Event-ID Header，改以查詢參數帶上最後收到的記錄
+    const query = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : '';
+    const source = new EventSource(`/api/project/${projectId}/events${query}`, { withCredentials: true });
+    
+    source.addEventListener('open', () => {
+        pushRetryDelay = PUSH_RETRY_MIN_MS;
+    });
+    source.addEventListener('error', () => {
+        // CONNECTING 表示瀏覽器正在自動重新連線；CLOSED 表示已放棄
+        if (source.readyState !== EventSource.CLOSED || source !== projectEventSource) return;
+        projectEventSource = null;
+        const delay = pushRetryDelay;
+        pushRetryDelay = Math.min(pushRetryDelay * 2, PUSH_RETRY_MAX_MS);
+        pushRetryTimer = setTimeout(() => {
+            pushRetryTimer = null;
+            if (projectId === currentProjectId) subscribeProjectEvents(projectId, lastEventId);
+        }, delay);
+    });
+    source.addEventListener('record', event => {
+        if (event.lastEventId) lastEventId = event.lastEventId;
+        handlePushedRecord(JSON.parse(event.data));
+    });
+    source.addEventListener('record_updated', event => {
+        updatePushedRecord(JSON.parse(event.data));
+    });
+    source.addEventListener('project', event => {
+        const data = JSON.parse(event.data);
+        const title = document.querySelector(`.l_middle .title[data-project-id="${data.project_id}"] .text`);
+        if (title) title.textContent = data.project_name;
+    });
+    source.addEventListener('project_deleted', () => {
+        closeProjectEvents();
+        const item = document.querySelector(`.l_middle .title[data-project-id="${projectId}"]`);
+        if (item) item.remove();
+        if (projectId === currentProjectId) showDefaultPage();
+    });
+    source.addEventListener('resync', () => {
+        // 伺服器端佇列已滿而遺漏事件，重新載入專案
+        closeProjectEvents();
+        if (projectId === currentProjectId) loadProjectData(projectId);
+    });
+    
+    projectEventSource = source;
+}
+
+/**
+ * 關閉即時推播連線（並取消尚未執行的重新連線）
+ */
+function closeProjectEvents() {
+    if (projectEventSource) {
+        projectEventSource.close();
+        projectEventSource = null;
+    }
+    if (pushRetryTimer) {
+        clearTimeout(pushRetryTimer);
+        pushRetryTimer = null;
+    }
+    pendingPushedRecords = [];
+}
+
+/**
+ * 記錄已由檢測回應顯示（之後推播送來同一筆時略過）
+ */
+function markRecordRendered(recordId) {
+    if (recordId) renderedRecordIds.add(recordId);
+}
+
+/**
+ * 顯示推播送來的新記錄（插入在目前的輸入框之前）
+ */
+function handlePushedRecord(record) {
+    if (record.project_id !== currentProjectId || renderedRecordIds.has(record._id)) return;
+    
+    if (typeof isProcessing !== 'undefined' && isProcessing) {
+        pendingPushedRecords.push(record);
+        return;
+    }
+    
+    const rSide = document.querySelector('.r_side');
+    const containers = rSide ? rSide.querySelectorAll(':scope > .r_container') : [];
+    if (containers.length === 0) return;
+    
+    const currentInput = containers[containers.length - 1];
+    createRecordNodes(record).forEach(node => currentInput.before(node));
+    applyRecordBorderColors(rSide);
+}
+
+/**
+ * 檢測完成後顯示期間收到的推播記錄
+ */
+function flushPushedRecords() {
+    const records = pendingPushedRecords;
+    pendingPushedRecords = [];
+    records.forEach(handlePushedRecord);
+}
+
+/**
+ * 更新已顯示記錄的分析結果（重新評估）
+ */
+function updatePushedRecord(record) {
+    const inputDiv = document.querySelector(`.r_side [data-record-id="${record._id}"]`);
+    if (!inputDiv) return;
+    
+    const lawDiv = inputDiv.nextElementSibling;
+    const adviceDiv = lawDiv && lawDiv.nextElementSibling;
+    if (lawDiv) lawDiv.querySelector('.editable-content').innerHTML = record.result_law || '';
+    if (adviceDiv) adviceDiv.querySelector('.editable-content').innerHTML = record.result_advice || '';
+}
+
 /**
  * HTML 轉義
  */
@@ -602,8 +824,19 @@ function getProjectIdFromURL() {
 document.addEventListener('DOMContentLoaded', async function() {
     // 從 URL 獲取專案 ID
     const projectId = getProjectIdFromURL();
+    const initialData = window.initialHomeData;
     
-    if (projectId) {
+    if (initialData) {
+        // 伺服器端已渲染專案列表並附帶當前專案的最新記錄，不需要再請求 API
+        currentProjectId = initialData.current_project_id;
+        if (currentProjectId && !projectId) {
+            window.history.replaceState({}, '', `/home?project_id=${currentProjectId}`);
+        }
+        if (currentProjectId && initialData.records.length > 0) {
+            renderProjectRecords(initialData.records, initialData.has_more_records);
+        }
+        subscribeProjectEvents(currentProjectId);
+    } else if (projectId) {
         // 如果有 project_id 參數，直接載入該專案資料（使用 /api/project/{project_id}）
         currentProjectId = projectId;
         await loadProjectData(projectId);
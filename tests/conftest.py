@@ -0,0 +1,84 @@
+"""
+測試共用設定
+
+所有測試以記憶體資料庫（DATABASE_BACKEND=memory）執行，不需要 MongoDB；
+Gemini 檢測以固定結果取代，不會呼叫 API。環境變數需在匯入應用程式前設定。
+"""
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['DATABASE_BACKEND'] = 'memory'
+os.environ.setdefault('GEMINI_API_KEY', 'test-key')
+os.environ.setdefault('GEMINI_MODELS', 'gemini-1.5-flash')
+os.environ['RECORD_WRITE_BEHIND'] = 'false'
+os.environ['PUSH_ENABLED'] = 'false'
+# 降低 scrypt 成本，測試不需要正式環境的雜湊強度
+os.environ['PASSWORD_SCRYPT_N'] = str(2 ** 10)
+
+import pytest  # noqa: E402
+
+DETECTION_RESULT = {
+    'result_law': '<ol><li class="list-item">違法</li><li class="list-item">第1條</li></ol>',
+    'result_advice': '建議改為：本產品為一般食品',
+    'token_usage': {'prompt_tokens': 10, 'response_tokens': 5, 'total_tokens': 15, 'calls': 1},
+    'evaluation': {}
+}
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def fake_detection(monkeypatch):
+    """以固定結果取代 Gemini 檢測，返回被檢測的廣告內容列表"""
+    import utils.detect_service as detect_service
+    
+    calls = []
+    
+    def run_detection(input_ad, incremental=None, **kwargs):
+        calls.append(input_ad)
+        return dict(DETECTION_RESULT)
+    
+    monkeypatch.setattr(detect_service, 'run_detection', run_detection)
+    return calls
+
+
+@pytest.fixture
+def user(client):
+    """註冊並登入一位新用戶，返回 {'email', 'password', 'token', 'headers'}"""
+    email = f'{uuid.uuid4().hex}@example.com'
+    password = 'password123'
+    response = client.post('/api/auth/register', json={'name': '測試用戶', 'email': email, 'password': password})
+    assert response.status_code == 201
+    
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    assert response.status_code == 200
+    token = response.get_json()['token']
+    return {
+        'email': email,
+        'password': password,
+        'token': token,
+        'headers': {'Authorization': f'Bearer {token}'}
+    }
+
+
+@pytest.fixture
+def project(client, user):
+    """建立屬於 user 的專案，返回專案 ID"""
+    response = client.post('/api/project/create', json={'project_name': '測試專案'}, headers=user['headers'])
+    assert response.status_code == 201
+    return response.get_json()['project']['_id']
@@ -0,0 +1,240 @@
+"""
+以記憶體資料庫執行主要流程：註冊、登入、專案、檢測與匯出
+"""
+import json
+import uuid
+
+
+def test_register_rejects_duplicate_email(client, user):
+    response = client.post('/api/auth/register', json={
+        'name': '重複', 'email': user['email'], 'password': 'another'
+    })
+    assert response.status_code == 409
+
+
+def test_login(client, user):
+    response = client.post('/api/auth/login', json={'email': user['email'], 'password': 'wrong'})
+    assert response.status_code == 401
+    
+    response = client.post('/api/auth/login', json={'email': f'{uuid.uuid4().hex}@example.com', 'password': 'x'})
+    assert response.status_code == 401
+    
+    response = client.post('/api/auth/login', json={'email': user['email'], 'password': user['password']})
+    assert response.status_code == 200
+    assert response.get_json()['token']
+    assert 'access_token=' in response.headers['Set-Cookie']
+
+
+def test_project_list_and_detail_etag(client, user, project):
+    response = client.get('/api/project/list', headers=user['headers'])
+    assert response.status_code == 200
+    assert [item['_id'] for item in response.get_json()['projects']] == [project]
+    
+    response = client.get(f'/api/project/{project}', headers=user['headers'])
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    response = client.get(f'/api/project/{project}', headers={**user['headers'], 'If-None-Match': etag})
+    assert response.status_code == 304
+    
+    # 改名後版本遞增，舊 ETag 不再有效
+    response = client.put(f'/api/project/{project}', json={'project_name': '新名稱'}, headers=user['headers'])
+    assert response.status_code == 200
+    response = client.get(f'/api/project/{project}', headers={**user['headers'], 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['project']['project_name'] == '新名稱'
+
+
+def test_project_is_hidden_from_other_users(client, user, project):
+    email = f'{uuid.uuid4().hex}@example.com'
+    response = client.post('/api/auth/register', json={'name': '其他用戶', 'email': email, 'password': 'password123'})
+    assert response.status_code == 201
+    
+    login = client.post('/api/auth/login', json={'email': email, 'password': 'password123'})
+    headers = {'Authorization': f"Bearer {login.get_json()['token']}"}
+    assert client.get(f'/api/project/{project}', headers=headers).status_code == 404
+    assert client.get(f'/api/project/{project}/records', headers=headers).status_code == 404
+    assert client.get(f'/api/project/{project}/export', headers=headers).status_code == 404
+
+
+def test_detect_stores_record_and_replays(client, user, project, fake_detection):
+    headers = {**user['headers'], 'Idempotency-Key': uuid.uuid4().hex}
+    body = {'input_ad': '喝了就能治療糖尿病', 'project_id': project}
+    
+    response = client.post('/madetect', json=body, headers=headers)
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['result_advice'] == '建議改為：本產品為一般食品'
+    
+    # 相同 Idempotency-Key 的重送返回同一筆記錄，不再檢測
+    replay = client.post('/madetect', json=body, headers=headers)
+    assert replay.get_json()['record_id'] == data['record_id']
+    assert replay.get_json()['replayed'] is True
+    assert fake_detection == ['喝了就能治療糖尿病']
+    
+    records = client.get(f'/api/project/{project}', headers=user['headers']).get_json()['records']
+    assert [record['_id'] for record in records] == [data['record_id']]
+    assert records[0]['input_ad'] == '喝了就能治療糖尿病'
+    assert records[0]['result_law'] == data['result_law']
+
+
+def test_detect_requires_owned_project(client, user, fake_detection):
+    response = client.post('/madetect', json={'input_ad': '廣告', 'project_id': str(uuid.uuid4().hex[:24])},
+                           headers=user['headers'])
+    assert response.status_code == 404
+    assert fake_detection == []
+
+
+def test_record_text_round_trips(client, user, project):
+    """純文字與 HTML 條列的法律分析結果讀回時內容不變"""
+    texts = ['1. 違法\n2. 第1條', '<ol><li class="list-item">不違法</li></ol>', '<b>其他格式</b>']
+    for text in texts:
+        response = client.post(f'/api/project/{project}/record', json={
+            'input_ad': '廣告' * 400, 'result_law': text, 'result_advice': '建議'
+        }, headers=user['headers'])
+        assert response.status_code == 201
+    
+    records = client.get(f'/api/project/{project}', headers=user['headers']).get_json()['records']
+    assert [record['result_law'] for record in records] == texts
+    assert all(record['input_ad'] == '廣告' * 400 for record in records)
+
+
+def test_records_pagination(client, user, project):
+    for index in range(5):
+        client.post(f'/api/project/{project}/record', json={
+            'input_ad': f'廣告 {index}', 'result_law': '', 'result_advice': ''
+        }, headers=user['headers'])
+    
+    page = client.get(f'/api/project/{project}/records?limit=2', headers=user['headers']).get_json()
+    assert [record['input_ad'] for record in page['records']] == ['廣告 3', '廣告 4']
+    assert page['has_more_records'] is True
+    
+    before = page['records'][0]['_id']
+    page = client.get(f'/api/project/{project}/records?limit=10&before={before}', headers=user['headers']).get_json()
+    assert [record['input_ad'] for record in page['records']] == ['廣告 0', '廣告 1', '廣告 2']
+    assert page['has_more_records'] is False
+
+
+def test_export(client, user, project, fake_detection):
+    client.post('/madetect', json={'input_ad': '保證瘦身十公斤', 'project_id': project}, headers=user['headers'])
+    
+    response = client.get(f'/api/project/{project}/export?format=csv', headers=user['headers'])
+    assert response.status_code == 200
+    assert '保證瘦身十公斤' in response.get_data(as_text=True)
+    
+    response = client.get(f'/api/project/{project}/export?format=jsonl', headers=user['headers'])
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    assert [line['input_ad'] for line in lines] == ['保證瘦身十公斤']
+    
+    response = client.get(f'/api/project/{project}/export?format=pdf', headers=user['headers'])
+    assert response.status_code == 400
+
+
+def test_delete_project(client, user, project):
+    assert client.delete(f'/api/project/{project}', headers=user['headers']).status_code == 200
+    assert client.get(f'/api/project/{project}', headers=user['headers']).status_code == 404
+
+
+def test_search_ranks_newest_candidates(client, user, project, monkeypatch):
+    from config import Config
+    monkeypatch.setattr(Config, 'SEARCH_MAX_CANDIDATES', 3)
+    for index in range(5):
+        client.post(f'/api/project/{project}/record', json={
+            'input_ad': f'保證瘦身 {index}', 'result_law': '', 'result_advice': ''
+        }, headers=user['headers'])
+    
+    # 只有最新 3 筆列入排序，超過上限時標示 truncated
+    page = client.get('/api/search?q=瘦身&limit=2', headers=user['headers']).get_json()
+    assert len(page['results']) == 2
+    assert page['has_more'] is True and page['truncated'] is True
+    seen = [item['record_id'] for item in page['results']]
+    
+    page = client.get(f"/api/search?q=瘦身&limit=2&cursor={page['next_cursor']}", headers=user['headers']).get_json()
+    assert page['has_more'] is False
+    seen += [item['record_id'] for item in page['results']]
+    assert len(set(seen)) == 3
+    
+    # 沒有關鍵字時沿索引由新到舊分頁，不受候選上限影響
+    page = client.get('/api/search?from=2000-01-01&limit=4', headers=user['headers']).get_json()
+    assert len(page['results']) == 4 and page['has_more'] is True and page['truncated'] is False
+    page = client.get(f"/api/search?from=2000-01-01&limit=4&cursor={page['next_cursor']}",
+                      headers=user['headers']).get_json()
+    assert len(page['results']) == 1 and page['has_more'] is False
+
+
+def test_etag_changes_with_response_schema(client, user, project, monkeypatch):
+    import utils.cache_utils as cache_utils
+    etag = client.get(f'/api/project/{project}', headers=user['headers']).headers['ETag']
+    
+    # 回應格式變更後，部署前取得的 ETag 不再得到 304
+    monkeypatch.setattr(cache_utils, 'RESPONSE_SCHEMA_VERSION', cache_utils.RESPONSE_SCHEMA_VERSION + 1)
+    response = client.get(f'/api/project/{project}', headers={**user['headers'], 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_home_page_disables_push_subscription(client, user, project):
+    response = client.get('/home', headers=user['headers'])
+    assert response.status_code == 200
+    assert '"push_enabled":false' in response.get_data(as_text=True)
+
+
+def test_coalesced_detect_replays_record_with_same_idempotency_key(client, user, project, monkeypatch):
+    """合併的請求加入 Idempotency-Key 時，其他 worker 已用相同 key 建立記錄"""
+    import routes.user
+    from bson import ObjectId
+    from models.project_model import ProjectRecordModel
+    key = uuid.uuid4().hex
+    user_id = ObjectId(client.get('/api/project/list', headers=user['headers']).get_json()['projects'][0]['user_id'])
+    
+    def detect_coalesced(user_id_, project_id, input_ad, store_result, weight):
+        shared_id = ProjectRecordModel.create(project_id, input_ad, '1. 違法', '共用', user_id=user_id)
+        ProjectRecordModel.create(project_id, input_ad, '1. 違法', '重送', user_id=user_id, idempotency_key=key)
+        return {'result_law': '1. 違法', 'result_advice': '共用', 'record_id': str(shared_id)}, True
+    
+    monkeypatch.setattr(routes.user, 'detect_coalesced', detect_coalesced)
+    response = client.post('/madetect', json={'input_ad': '保證根治', 'project_id': project},
+                           headers={**user['headers'], 'Idempotency-Key': key})
+    assert response.status_code == 200
+    assert response.get_json()['replayed'] is True
+    assert response.get_json()['result_advice'] == '重送'
+
+
+def test_admin_list_total_is_omitted_when_filtered(client, user, project):
+    from database import db
+    users = db.get_collection('user')
+    users.update_one({'user_email': user['email']}, {'$set': {'user_type': 'admin'}})
+    user_id = str(users.find_one({'user_email': user['email']})['_id'])
+    login = client.post('/api/auth/login', json={'email': user['email'], 'password': user['password']})
+    headers = {'Authorization': f"Bearer {login.get_json()['token']}"}
+    
+    page = client.get('/api/admin/projects', headers=headers).get_json()
+    assert isinstance(page['total'], int)
+    
+    # 依用戶篩選時集合總數不代表篩選結果
+    page = client.get(f'/api/admin/projects?user_id={user_id}', headers=headers).get_json()
+    assert [item['_id'] for item in page['projects']] == [project]
+    assert page['total'] is None
+
+
+def test_record_storage_migration_is_idempotent(client, user, project):
+    from bson import ObjectId
+    from database import db
+    from scripts.migrate_record_storage import migrate
+    records = db.get_collection('project_record')
+    project_doc = db.get_collection('project').find_one({'_id': ObjectId(project)})
+    owner = {'project_id': project_doc['_id'], 'user_id': project_doc['user_id']}
+    html = '<ol><li class="list-item">違法</li></ol>'
+    # 舊格式記錄：可轉為條列項目的 HTML，以及無法精簡的純文字結果與短欄位
+    legacy = [
+        {**owner, 'input_ad': '廣告' * 400, 'result_law': html, 'result_advice': '建議'},
+        {**owner, 'input_ad': '廣告', 'result_law': '純文字結果', 'result_advice': '建議'}
+    ]
+    records.insert_many(legacy)
+    
+    total, migrated, _, _ = migrate(apply=True)
+    assert (total, migrated) == (2, 1)
+    assert migrate(apply=True)[0] == 0
+    
+    stored = client.get(f'/api/project/{project}', headers=user['headers']).get_json()['records']
+    assert [record['result_law'] for record in stored] == [html, '純文字結果']
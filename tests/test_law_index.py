@@ -0,0 +1,55 @@
+"""
+法律文件條文雜湊的涵蓋範圍
+"""
+from utils.law_index import GENERAL_SECTION, hash_articles, parse_article_sources, parse_articles
+from utils.law_version import changed_articles, diff_articles
+
+LAW_TEXT = '\n'.join([
+    '醫療廣告法規指南',
+    '',
+    '條文\t內容',
+    '醫療法第61條\t1. 醫療機構，不得以不正當方法招攬病人。',
+    '公告醫療法第61條第1項規定「禁止之不正當方法」',
+    '醫療法第86條\t醫療廣告不得以下列方式為之：',
+    '一、假借他人名義為宣傳。',
+    '',
+    '【醫療法第61條第1項公告禁止之不正當方法】',
+    '一、公開宣稱就醫即贈送禮品。',
+    '',
+    '第四章 醫療廣告之禁止行為態樣分析',
+    '《醫療法》第85、86條是判斷醫療廣告是否違規的關鍵。',
+    '最高級與誇張用語之宣傳。',
+    '',
+    '第五章 結論',
+    '業者應建立內部審查機制。'
+])
+
+
+def _changed(old_text, new_text):
+    return changed_articles(diff_articles(
+        hash_articles(parse_article_sources(old_text)), hash_articles(parse_article_sources(new_text))
+    ))
+
+
+def test_table_articles_are_unchanged():
+    assert parse_articles(LAW_TEXT) == {
+        '醫療法第61條': '1. 醫療機構，不得以不正當方法招攬病人。',
+        '醫療法第86條': '醫療廣告不得以下列方式為之：\n一、假借他人名義為宣傳。'
+    }
+
+
+def test_every_line_is_attributed():
+    sources = '\n'.join(parse_article_sources(LAW_TEXT).values())
+    assert all(line.strip() in sources for line in LAW_TEXT.split('\n'))
+
+
+def test_sections_change_the_articles_they_cite():
+    assert _changed(LAW_TEXT, LAW_TEXT.replace('贈送禮品', '贈送禮品或折扣')) == {'醫療法第61條'}
+    assert _changed(LAW_TEXT, LAW_TEXT.replace('公告醫療法第61條第1項規定', '公告醫療法第61條第1項修正規定')) == {
+        '醫療法第61條'
+    }
+    # 章節內沒有引用條文的段落歸入該章引用的條文
+    assert _changed(LAW_TEXT, LAW_TEXT.replace('誇張用語', '誇張或比較用語')) == {'醫療法第85條', '醫療法第86條'}
+    assert _changed(LAW_TEXT, LAW_TEXT.replace('內部審查', '外部審查')) == {GENERAL_SECTION}
+    # 只有空白差異時沒有變動
+    assert _changed(LAW_TEXT, LAW_TEXT.replace('第五章 結論', '第五章  結論')) == set()
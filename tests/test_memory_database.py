@@ -0,0 +1,166 @@
+"""
+記憶體資料庫與 pymongo / MongoDB 行為一致性（只涵蓋模型使用到的功能）
+"""
+import pytest
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne, InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database.memory import MemoryClient
+
+
+@pytest.fixture
+def collection():
+    return MemoryClient()['test']['items']
+
+
+def test_insert_assigns_object_id_and_copies(collection):
+    doc = {'name': 'a', 'tags': ['x']}
+    inserted_id = collection.insert_one(doc).inserted_id
+    assert isinstance(inserted_id, ObjectId)
+    assert doc['_id'] == inserted_id
+    
+    # 修改返回的文件不影響儲存的資料
+    found = collection.find_one({'_id': inserted_id})
+    found['tags'].append('y')
+    assert collection.find_one({'_id': inserted_id})['tags'] == ['x']
+    
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({'_id': inserted_id})
+
+
+def test_query_operators(collection):
+    owner = ObjectId()
+    collection.insert_many([
+        {'n': 1, 'owner': owner, 'tags': ['a', 'b']},
+        {'n': 2, 'owner': None, 'tags': ['b']},
+        {'n': 3, 'tags': []},
+        {'n': 4, 'owner': ObjectId(), 'text': '糖尿病'}
+    ])
+    
+    def numbers(query):
+        return sorted(doc['n'] for doc in collection.find(query))
+    
+    # None 同時符合欄位為 null 與欄位不存在
+    assert numbers({'owner': None}) == [2, 3]
+    assert numbers({'owner': {'$in': [owner, None]}}) == [1, 2, 3]
+    assert numbers({'owner': {'$exists': False}}) == [3]
+    # 陣列欄位比對任一元素
+    assert numbers({'tags': 'b'}) == [1, 2]
+    assert numbers({'tags': {'$all': ['a', 'b']}}) == [1]
+    assert numbers({'tags': {'$size': 0}}) == [3]
+    assert numbers({'n': {'$gt': 1, '$lte': 3}}) == [2, 3]
+    assert numbers({'$or': [{'n': 1}, {'text': {'$regex': '糖尿'}}]}) == [1, 4]
+    assert numbers({'n': {'$nin': [1, 2]}, 'tags': {'$exists': True}}) == [3]
+
+
+def test_sort_projection_skip_limit(collection):
+    collection.insert_many([{'n': value, 'extra': value * 10} for value in (3, 1, 2)] + [{'extra': 0}])
+    
+    # 欄位不存在（null）排在數字之前
+    docs = list(collection.find({}, {'n': 1, '_id': 0}).sort('n', 1))
+    assert docs == [{}, {'n': 1}, {'n': 2}, {'n': 3}]
+    
+    docs = list(collection.find({'n': {'$exists': True}}).sort([('n', -1)]).skip(1).limit(1))
+    assert [doc['n'] for doc in docs] == [2]
+    assert collection.count_documents({'n': {'$gte': 2}}) == 2
+
+
+def test_update_operators(collection):
+    inserted_id = collection.insert_one({'n': 1, 'keys': ['a']}).inserted_id
+    
+    result = collection.update_one({'_id': inserted_id}, {
+        '$inc': {'n': 2}, '$addToSet': {'keys': 'a'}, '$set': {'nested.value': True}
+    })
+    assert (result.matched_count, result.modified_count) == (1, 1)
+    collection.update_one({'_id': inserted_id}, {'$push': {'keys': {'$each': ['b', 'c']}}, '$unset': {'nested': ''}})
+    collection.update_one({'_id': inserted_id}, {'$pull': {'keys': 'b'}})
+    assert collection.find_one({'_id': inserted_id}, {'_id': 0}) == {'n': 3, 'keys': ['a', 'c']}
+    
+    result = collection.update_one({'name': 'new'}, {'$set': {'n': 5}, '$setOnInsert': {'created': True}}, upsert=True)
+    assert result.upserted_id is not None
+    assert collection.find_one({'name': 'new'})['created'] is True
+
+
+def test_push_slice_and_array_index(collection):
+    inserted_id = collection.insert_one({'hits': [1, 2]}).inserted_id
+    collection.update_one({'_id': inserted_id}, {'$push': {'hits': {'$each': [3, 4], '$slice': -3}}})
+    assert collection.find_one({'_id': inserted_id})['hits'] == [2, 3, 4]
+    
+    assert collection.count_documents({'hits.0': 2}) == 1
+    assert collection.count_documents({'hits.2': {'$exists': True}}) == 1
+    assert collection.count_documents({'hits.3': {'$exists': True}}) == 0
+    
+    # 條件不符的 upsert 改為插入，與既有文件的 _id 衝突
+    with pytest.raises(DuplicateKeyError):
+        collection.update_one({'_id': inserted_id, 'hits.0': {'$lte': 1}}, {'$push': {'hits': 5}}, upsert=True)
+
+
+def test_find_one_and_update(collection):
+    collection.insert_one({'_id': 'version', 'value': 1})
+    after = collection.find_one_and_update(
+        {'_id': 'version'}, {'$inc': {'value': 1}}, return_document=ReturnDocument.AFTER
+    )
+    assert after['value'] == 2
+    before = collection.find_one_and_update({'_id': 'version'}, {'$inc': {'value': 1}})
+    assert before['value'] == 2
+    assert collection.find_one_and_update({'_id': 'missing'}, {'$set': {'value': 1}}) is None
+
+
+def test_partial_unique_index(collection):
+    project_id = ObjectId()
+    collection.create_index([('project_id', 1), ('keys', 1)], unique=True,
+                            partialFilterExpression={'keys': {'$exists': True}})
+    
+    # 不含索引欄位的文件不受唯一限制
+    collection.insert_one({'project_id': project_id})
+    collection.insert_one({'project_id': project_id})
+    collection.insert_one({'project_id': project_id, 'keys': ['k1']})
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({'project_id': project_id, 'keys': ['k1']})
+    collection.insert_one({'project_id': ObjectId(), 'keys': ['k1']})
+    
+    # 更新造成重複時拒絕且不修改文件
+    other = collection.insert_one({'project_id': project_id, 'keys': ['k2']}).inserted_id
+    with pytest.raises(DuplicateKeyError):
+        collection.update_one({'_id': other}, {'$addToSet': {'keys': 'k1'}})
+    assert collection.find_one({'_id': other})['keys'] == ['k2']
+
+
+def test_insert_many_unordered_reports_write_errors(collection):
+    existing = collection.insert_one({'n': 0}).inserted_id
+    with pytest.raises(BulkWriteError) as error:
+        collection.insert_many([{'n': 1}, {'_id': existing}, {'n': 2}], ordered=False)
+    
+    write_errors = error.value.details['writeErrors']
+    assert [(item['index'], item['code']) for item in write_errors] == [(1, 11000)]
+    assert sorted(doc['n'] for doc in collection.find()) == [0, 1, 2]
+
+
+def test_bulk_write(collection):
+    collection.insert_one({'_id': 1, 'n': 0})
+    result = collection.bulk_write([UpdateOne({'_id': 1}, {'$set': {'n': 1}}), InsertOne({'_id': 2, 'n': 2})])
+    assert (result.modified_count, result.inserted_count) == (1, 1)
+    assert [doc['n'] for doc in collection.find().sort('_id', 1)] == [1, 2]
+
+
+def test_aggregate(collection):
+    owner = ObjectId()
+    collection.insert_many([
+        {'owner': owner, 'kind': 'a', 'size': 1},
+        {'owner': owner, 'kind': 'a', 'size': 2},
+        {'owner': owner, 'kind': 'b', 'size': 3},
+        {'owner': ObjectId(), 'kind': 'a', 'size': 4}
+    ])
+    
+    groups = list(collection.aggregate([
+        {'$match': {'owner': owner}},
+        {'$group': {'_id': '$kind', 'count': {'$sum': 1}, 'total': {'$sum': '$size'}}},
+        {'$sort': {'_id': 1}}
+    ]))
+    assert groups == [{'_id': 'a', 'count': 2, 'total': 3}, {'_id': 'b', 'count': 1, 'total': 3}]
+    
+    facet = list(collection.aggregate([{'$facet': {
+        'largest': [{'$sort': {'size': -1}}, {'$limit': 1}, {'$project': {'_id': 0, 'size': 1}}],
+        'total': [{'$count': 'count'}]
+    }}]))
+    assert facet == [{'largest': [{'size': 4}], 'total': [{'count': 4}]}]
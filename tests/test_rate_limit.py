@@ -0,0 +1,97 @@
+"""
+檢測速率限制（MongoDB 共用視窗）與公平佇列
+"""
+import threading
+import time
+import uuid
+import pytest
+from config import Config
+from models import rate_limit_model
+from models.rate_limit_model import RateLimitModel
+from utils.rate_limiter import FairQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """可手動推進的 time.time()"""
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit_model.time, 'time', lambda: now[0])
+    return now
+
+
+def test_sliding_window_is_shared_per_key(clock):
+    key = uuid.uuid4().hex
+    for _ in range(3):
+        assert RateLimitModel.hit('test', key, 3, 60) == 0
+        clock[0] += 10
+    
+    # 請求時間為 1000、1010、1020，目前為 1030
+    assert RateLimitModel.hit('test', key, 3, 60) == pytest.approx(30)
+    # 其他鍵不受影響
+    assert RateLimitModel.hit('test', uuid.uuid4().hex, 3, 60) == 0
+    
+    # 最早的請求過期後只空出一個名額
+    clock[0] = 1060
+    assert RateLimitModel.hit('test', key, 3, 60) == 0
+    assert RateLimitModel.hit('test', key, 3, 60) == pytest.approx(10)
+    
+    assert RateLimitModel.snapshot('test', 60)[key] == {'window_requests': 3, 'rejected': 2}
+
+
+def test_zero_limit_is_unlimited(clock):
+    key = uuid.uuid4().hex
+    assert all(RateLimitModel.hit('test', key, 0, 60) == 0 for _ in range(50))
+    assert key not in RateLimitModel.snapshot('test', 60)
+
+
+def test_detect_returns_429_past_limit(client, user, project, fake_detection, monkeypatch):
+    monkeypatch.setattr(Config, 'DETECT_RATE_LIMIT', 1)
+    response = client.post('/madetect', json={'input_ad': '廣告一', 'project_id': project}, headers=user['headers'])
+    assert response.status_code == 200
+    
+    response = client.post('/madetect', json={'input_ad': '廣告二', 'project_id': project}, headers=user['headers'])
+    assert response.status_code == 429
+    assert response.get_json()['error_type'] == 'rate_limited'
+    assert int(response.headers['Retry-After']) >= 1
+    assert fake_detection == ['廣告一']
+
+
+def test_fair_queue_evicts_idle_keys():
+    queue = FairQueue(2, 1, 1, 0.1, idle_ttl=0)
+    queue.acquire('busy')
+    assert queue.run('idle', lambda: 'done') == 'done'
+    
+    # 完成的鍵被移除，仍在執行的鍵保留
+    assert set(queue.snapshot()['keys']) == {'busy'}
+    queue.release('busy')
+    assert queue.snapshot()['keys'] == {}
+
+
+def test_long_document_chunks_borrow_queue_slots(monkeypatch):
+    import utils.detect_service as detect_service
+    
+    queue = FairQueue(2, 1, 1, 0.1)
+    monkeypatch.setattr(detect_service, 'detection_queue', queue)
+    monkeypatch.setattr(Config, 'LONG_DOC_PARALLELISM', 4)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+    
+    def analyze_chunk(chunk, law_text):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return [chunk], {}
+    
+    monkeypatch.setattr(detect_service, '_analyze_chunk', analyze_chunk)
+    # 檢測本身佔用一個名額，區塊最多再借用一個
+    queue.acquire('user')
+    results = detect_service._analyze_chunks_with_slots(list('abcd'), '', detect_service.ChunkSlots('user'))
+    assert [items for items, _ in results] == [['a'], ['b'], ['c'], ['d']]
+    assert peak[0] == 2
+    # 借用的名額已歸還，且不計入完成數
+    snapshot = queue.snapshot()
+    assert snapshot['running'] == 1
+    assert snapshot['keys']['user']['completed'] == 0
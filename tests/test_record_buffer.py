@@ -0,0 +1,128 @@
+"""
+檢測記錄延遲寫入（RecordWriteBuffer）
+"""
+import time
+import uuid
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect
+from config import Config
+from database import db
+from models.project_model import ProjectModel, ProjectRecordModel, record_buffer
+from utils.record_buffer import RecordWriteBuffer
+
+
+@pytest.fixture
+def buffer(monkeypatch, tmp_path):
+    """寫入獨立集合的緩衝區，返回 (buffer, 寫入後處理收到的記錄 _id 列表)"""
+    monkeypatch.setattr(Config, 'RECORD_SPOOL_DIR', str(tmp_path))
+    monkeypatch.setattr(Config, 'RECORD_BUFFER_FLUSH_SECONDS', 60)
+    monkeypatch.setattr(Config, 'RECORD_SPOOL_RETRY_SECONDS', 3600)
+    written = []
+    buffer = RecordWriteBuffer(f'buffer_{uuid.uuid4().hex}', lambda entries: written.extend(
+        entry['doc']['_id'] for entry in entries
+    ))
+    yield buffer, written
+    buffer.close()
+
+
+def _entry(**fields):
+    return {'doc': dict(fields, _id=ObjectId())}
+
+
+def _collection(buffer):
+    return db.get_collection(buffer.collection_name)
+
+
+def test_flushes_when_batch_is_full(buffer, monkeypatch):
+    buffer, written = buffer
+    monkeypatch.setattr(Config, 'RECORD_BUFFER_MAX_BATCH', 2)
+    first, second = _entry(n=1), _entry(n=2)
+    buffer.add(first)
+    time.sleep(0.1)
+    assert written == []
+    
+    buffer.add(second)
+    deadline = time.monotonic() + 2
+    while len(written) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert written == [first['doc']['_id'], second['doc']['_id']]
+    assert _collection(buffer).count_documents({}) == 2
+
+
+def test_spools_and_replays_when_database_fails(buffer, monkeypatch, tmp_path):
+    buffer, written = buffer
+    collection = _collection(buffer)
+    entry = _entry(n=1)
+    
+    def unavailable(*args, **kwargs):
+        raise AutoReconnect('connection refused')
+    
+    monkeypatch.setattr(type(collection), 'insert_many', unavailable)
+    buffer._write([entry])
+    assert written == []
+    assert len(list(tmp_path.iterdir())) == 1
+    assert buffer.stats()['spooled'] == 1
+    
+    monkeypatch.undo()
+    monkeypatch.setattr(Config, 'RECORD_SPOOL_DIR', str(tmp_path))
+    buffer.replay_spool()
+    assert written == [entry['doc']['_id']]
+    assert collection.find_one({'_id': entry['doc']['_id']})['n'] == 1
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_replaying_written_record_is_not_duplicated(buffer):
+    buffer, written = buffer
+    entry = _entry(n=1)
+    buffer._write([entry])
+    # 寫入成功但被判斷為失敗而進入暫存檔，重新寫入時 _id 重複
+    buffer._write([entry])
+    assert _collection(buffer).count_documents({}) == 1
+    assert written == [entry['doc']['_id']] * 2
+
+
+def test_conflicting_idempotency_key_keeps_record(buffer):
+    buffer, written = buffer
+    collection = _collection(buffer)
+    collection.create_index([('idempotency_keys', 1)], unique=True,
+                            partialFilterExpression={'idempotency_keys': {'$exists': True}})
+    collection.insert_one({'idempotency_keys': ['retry-key']})
+    
+    entry = _entry(idempotency_keys=['retry-key'])
+    buffer._write([entry])
+    # 已返回給用戶端的 _id 必須存在，重複的鍵留在原本的記錄
+    stored = collection.find_one({'_id': entry['doc']['_id']})
+    assert stored is not None and 'idempotency_keys' not in stored
+    assert written == [entry['doc']['_id']]
+    assert buffer.stats()['duplicates'] == 1
+
+
+def test_deleted_project_leaves_no_buffered_records(client, user, project, monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, 'RECORD_WRITE_BEHIND', True)
+    monkeypatch.setattr(Config, 'RECORD_SPOOL_DIR', str(tmp_path))
+    project_id = ObjectId(project)
+    user_id = db.get_collection('project').find_one({'_id': project_id})['user_id']
+    
+    pending = ProjectRecordModel.create(project_id, '廣告', '1. 違法', '建議', user_id=user_id)
+    # 刪除專案時已送出、之後才寫入的批次
+    inflight = {
+        'doc': {'_id': ObjectId(), 'project_id': project_id, 'user_id': user_id, 'created_at': None},
+        'input_ad': '廣告', 'result_law': '1. 違法', 'result_advice': '建議'
+    }
+    assert ProjectModel.delete(project, user_id)
+    record_buffer.flush()
+    record_buffer._write([inflight])
+    
+    records = db.get_collection('project_record')
+    assert records.find_one({'_id': pending}) is None
+    assert records.count_documents({'project_id': project_id}) == 0
+    assert db.get_collection('record_search').count_documents({'project_id': project_id}) == 0
+
+
+def test_idempotent_detect_is_written_before_responding(client, user, project, fake_detection, monkeypatch):
+    monkeypatch.setattr(Config, 'RECORD_WRITE_BEHIND', True)
+    headers = {**user['headers'], 'Idempotency-Key': uuid.uuid4().hex}
+    response = client.post('/madetect', json={'input_ad': '保證根治', 'project_id': project}, headers=headers)
+    record_id = response.get_json()['record_id']
+    assert db.get_collection('project_record').find_one({'_id': ObjectId(record_id)}) is not None
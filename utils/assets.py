@@ -0,0 +1,112 @@
+"""
+靜態資源工具
+
+scripts/build_assets.py 會將 static/ 下的 JS、CSS 與圖片打包、壓縮並以內容雜湊命名，
+輸出到 static/dist/ 與 manifest.json。存在 manifest 時，模板中的
+url_for('static', ...) 會改指向雜湊後的檔案，並以 /assets/ 路由搭配長效快取提供；
+沒有建置過（開發環境）時維持原本的 /static/ 路徑。
+"""
+import json
+import mimetypes
+import os
+from flask import Blueprint, current_app, request, send_from_directory, url_for
+from markupsafe import Markup
+from config import Config
+
+# JS 打包設定：打包後的名稱 -> 依載入順序排列的原始檔案
+BUNDLES = {
+    'js/home.bundle.js': ['js/project.js', 'js/home.js', 'js/modal-handlers.js'],
+    'js/auth.bundle.js': ['js/auth.js', 'js/auth-forms.js'],
+    'js/admin.bundle.js': ['js/admin.js'],
+}
+
+# 雜湊命名的檔案內容不會改變，可永久快取
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+assets_bp = Blueprint('assets', __name__, url_prefix='/assets')
+
+
+def load_manifest(path=None):
+    """
+    載入建置產生的 manifest
+    
+    Returns:
+        {'files': {原始路徑: 雜湊路徑}, 'variants': {雜湊路徑: [可用的變體副檔名]}}；
+        未建置時返回 None
+    """
+    path = path or Config.ASSET_MANIFEST_PATH
+    if not Config.ASSETS_ENABLED or not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def asset_url_for(endpoint, **values):
+    """
+    模板使用的 url_for：static 檔案若已建置，改為雜湊後的 /assets/ 路徑
+    """
+    manifest = current_app.extensions.get('asset_manifest')
+    if endpoint == 'static' and manifest:
+        hashed = manifest['files'].get(values.get('filename'))
+        if hashed:
+            return url_for('assets.asset', filename=hashed)
+    return url_for(endpoint, **values)
+
+
+def bundle_scripts(bundle_name):
+    """
+    輸出打包後的 <script> 標籤；未建置時依序輸出原始檔案
+    
+    Args:
+        bundle_name: BUNDLES 中的名稱，例如 'js/home.bundle.js'
+    """
+    manifest = current_app.extensions.get('asset_manifest')
+    if manifest and bundle_name in manifest['files']:
+        sources = [bundle_name]
+    else:
+        sources = BUNDLES[bundle_name]
+    return Markup(''.join(
+        f'<script src="{asset_url_for("static", filename=source)}"></script>\n'
+        for source in sources
+    ))
+
+
+def _accepts(header, value):
+    return value in request.headers.get(header, '')
+
+
+@assets_bp.route('/<path:filename>')
+def asset(filename):
+    """
+    提供建置後的靜態檔案：依 Accept 提供 WebP 圖片，依 Accept-Encoding 提供預先壓縮的版本
+    """
+    manifest = current_app.extensions.get('asset_manifest') or {}
+    variants = manifest.get('variants', {}).get(filename, [])
+    directory = os.path.abspath(Config.ASSET_DIST_DIR)
+    
+    served = filename
+    mimetype = mimetypes.guess_type(filename)[0]
+    encoding = None
+    if '.webp' in variants and _accepts('Accept', 'image/webp'):
+        served = filename + '.webp'
+        mimetype = 'image/webp'
+    elif '.br' in variants and _accepts('Accept-Encoding', 'br'):
+        served, encoding = filename + '.br', 'br'
+    elif '.gz' in variants and _accepts('Accept-Encoding', 'gzip'):
+        served, encoding = filename + '.gz', 'gzip'
+    
+    response = send_from_directory(directory, served, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if variants:
+        response.headers['Vary'] = 'Accept' if '.webp' in variants else 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
+
+
+def init_assets(app):
+    """註冊 /assets/ 路由並以 asset_url_for 取代模板中的 url_for"""
+    app.register_blueprint(assets_bp)
+    app.extensions['asset_manifest'] = load_manifest()
+    app.jinja_env.globals['url_for'] = asset_url_for
+    app.jinja_env.globals['bundle_scripts'] = bundle_scripts
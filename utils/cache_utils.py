@@ -0,0 +1,132 @@
+"""
+回應快取工具函數
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from flask import request, current_app, make_response, render_template
+from markupsafe import Markup
+from config import Config
+
+
+class ResponseCache:
+    """
+    行程內的 LRU 快取，存放已序列化的 JSON 回應內容
+    
+    鍵值包含資料版本，版本遞增後舊項目自然不會再被命中，
+    最終由 LRU 淘汰，因此不需要主動失效
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+    
+    def set(self, key, body):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def stats(self):
+        """取得快取統計資訊"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
+
+
+# 回應格式版本：變更快取回應的欄位或格式時遞增（例如新增 has_more_records、日期改為 ISO 格式），
+# 部署後用戶端持有的舊 ETag 即失效，不會以 304 沿用舊格式的內容
+RESPONSE_SCHEMA_VERSION = 3
+
+# 建立全域快取實例
+response_cache = ResponseCache(Config.RESPONSE_CACHE_SIZE)
+# 模板片段快取（側邊欄、模態框等），與回應快取分開統計命中率
+fragment_cache = ResponseCache(Config.FRAGMENT_CACHE_SIZE)
+
+
+def make_etag(cache_key, version):
+    """根據回應格式版本、快取鍵值與資料版本產生 ETag"""
+    return hashlib.sha1(f'{RESPONSE_SCHEMA_VERSION}:{cache_key}:{version}'.encode('utf-8')).hexdigest()[:20]
+
+
+def cached_json_response(cache_key, version, build_payload):
+    """
+    以 ETag 與行程內快取回應 JSON
+    
+    Args:
+        cache_key: 快取鍵值（必須包含用戶 ID）
+        version: 用戶目前的資料版本
+        build_payload: 快取未命中時呼叫，返回 (payload, status_code)；
+                       只有 200 的回應會被快取
+    
+    Returns:
+        Flask 回應物件（可能為 304 Not Modified）
+    """
+    etag = make_etag(cache_key, version)
+    
+    # ETag 只由格式版本與資料版本決定：用戶端持有目前版本時直接返回 304，
+    # 不論此 worker 的快取是否有該項目，都不需查詢資料庫或序列化
+    if request.if_none_match.contains(etag):
+        return _with_etag(make_response('', 304), etag)
+    
+    body = response_cache.get((cache_key, version))
+    if body is None:
+        payload, status_code = build_payload()
+        if status_code != 200:
+            return make_response(current_app.json.response(payload), status_code)
+        body = current_app.json.dumps(payload)
+        response_cache.set((cache_key, version), body)
+    
+    response = make_response(body, 200)
+    response.mimetype = 'application/json'
+    return _with_etag(response, etag)
+
+
+def _with_etag(response, etag):
+    response.set_etag(etag)
+    # 允許瀏覽器保存，但每次使用前都需以 If-None-Match 重新驗證
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def render_fragment(template_name, cache_key=None, **context):
+    """
+    渲染模板片段並快取渲染結果
+    
+    Args:
+        template_name: 模板名稱
+        cache_key: 決定片段內容的鍵值（例如用戶 ID 與資料版本）；None 表示片段內容固定
+        context: 模板變數
+        
+    Returns:
+        可直接輸出到模板的 HTML（Markup）
+    """
+    # 開發模式下模板可能隨時修改，不使用快取
+    if current_app.debug:
+        return Markup(render_template(template_name, **context))
+    
+    key = (template_name, cache_key)
+    html = fragment_cache.get(key)
+    if html is None:
+        html = render_template(template_name, **context)
+        fragment_cache.set(key, html)
+    return Markup(html)
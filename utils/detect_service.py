@@ -0,0 +1,510 @@
+"""
+廣告檢測服務
+
+將 /madetect 的分析流程集中於此：呼叫 Gemini 分析、產生修改建議並格式化結果，
+並以 single-flight 合併相同用戶、專案與廣告內容的並行請求。
+
+句數達 INCREMENTAL_MIN_SEGMENTS 的廣告改為逐句分析：每句的判斷結果以句子雜湊快取，
+廣告修改後重新檢測時只有變更的句子會送往 Gemini。
+
+超過 LONG_DOC_MIN_CHARS 的長篇內容（部落格文章、活動頁面）依段落切分為區塊，
+並行分析後合併為附帶違規位置的單一結論；經公平佇列的檢測，每個並行的區塊都佔用一個佇列名額。
+
+不同用戶的檢測以加權公平佇列限制同時送往 Gemini 的數量，避免單一用戶用盡共用配額；
+每位用戶另有滑動視窗速率限制，超過時以 RateLimitExceeded 拒絕（API 回應 429 與 Retry-After）。
+
+每次檢測結果都附帶評估版本標記（法律文件版本、提示詞版本、引用條文），
+法律文件更新後可據此只重新評估受影響的記錄（見 scripts/reevaluate_records.py）。
+"""
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from utils.gemini_service import gemini_service, LAW_PROMPT_VERSION, SEGMENT_PROMPT_VERSION
+from utils.segment_utils import split_segments, split_chunks, is_blank_segment, segment_key
+from models.segment_verdict_model import SegmentVerdictModel
+from models.law_version_model import LawVersionModel
+from models.rate_limit_model import RateLimitModel
+from utils.law_index import law_index
+from utils.law_version import build_evaluation_stamp, classify_verdict
+from utils.text_utils import clean_markdown, format_as_list_html, normalize_ad_text
+from utils.singleflight import SingleFlight
+from utils.rate_limiter import FairQueue, RateLimitExceeded
+from utils.token_utils import PromptTooLargeError, estimate_tokens, new_usage, merge_usage
+from config import Config
+
+# 進行中的檢測（依用戶、專案、正規化後的廣告內容合併）
+detection_flight = SingleFlight()
+
+# 送往 Gemini 的檢測（依用戶公平分配名額）；佇列在各 worker 內，全域名額依 worker 數平分，
+# 所有 worker 合計不超過 DETECT_CONCURRENCY（worker 數多於名額時每個 worker 仍有 1 個）
+detection_queue = FairQueue(
+    max(1, Config.DETECT_CONCURRENCY // Config.API_WORKERS),
+    max(1, Config.DETECT_MAX_QUEUED_PER_USER // Config.API_WORKERS),
+    Config.DETECT_MAX_QUEUE_WAIT,
+    Config.DETECT_SERVICE_TIME_SECONDS
+)
+
+# 長篇內容區塊分析的執行緒池（每則內容最多 LONG_DOC_PARALLELISM 個區塊同時分析）
+_long_doc_executor = ThreadPoolExecutor(
+    max_workers=Config.LONG_DOC_PARALLELISM,
+    thread_name_prefix='long-doc'
+)
+
+# 目前的法律文件版本是否已登記（每個行程只需登記一次）
+_law_version_registered = threading.Event()
+
+_RESULT_NOT_MEDICAL = '1. 此非醫療相關廣告詞\n2. 無\n3. 無違法行為\n4. 符合法規'
+_RESULT_COMPLIANT = '1. 不違法\n2. 無\n3. 無違法行為\n4. 符合法規'
+
+
+class ChunkSlots:
+    """
+    長篇內容並行分析區塊時向公平佇列額外借用的名額（與檢測本身屬於同一用戶）
+    
+    只在有空閒名額且沒有其他工作排隊時借用，其他工作開始排隊後分析完目前的區塊即歸還，
+    所有 worker 同時送往 Gemini 的呼叫因此仍不超過 DETECT_CONCURRENCY
+    """
+    
+    def __init__(self, key, weight=1):
+        self.key = key
+        self.weight = weight
+    
+    def borrow(self):
+        """借用一個名額，返回是否成功"""
+        return detection_queue.try_acquire(self.key, self.weight)
+    
+    def give_back(self):
+        detection_queue.release(self.key, completed=False)
+    
+    def contended(self):
+        """是否有其他工作在排隊"""
+        return detection_queue.waiting() > 0
+
+
+def ensure_law_version_registered():
+    """登記目前的法律文件版本與條文雜湊（版本變更時會輸出條文差異）"""
+    if _law_version_registered.is_set():
+        return
+    LawVersionModel.register(law_index.version, law_index.article_hashes)
+    _law_version_registered.set()
+
+
+def is_long_document(input_ad, enabled=None):
+    """
+    判斷是否以長篇模式（分塊並行分析）處理
+    
+    Args:
+        enabled: 是否啟用長篇模式；None 表示依 LONG_DOC_ENABLED（離線評估時指定）
+    """
+    if enabled is None:
+        enabled = Config.LONG_DOC_ENABLED
+    return enabled and len(input_ad) > Config.LONG_DOC_MIN_CHARS
+
+
+def check_ad_budget(input_ad, long_document=None):
+    """
+    檢查廣告長度是否在 token 上限內（長篇模式的上限為 LONG_DOC_MAX_TOKENS）
+    
+    Raises:
+        PromptTooLargeError: 廣告內容過長
+    """
+    limit = (Config.LONG_DOC_MAX_TOKENS if is_long_document(input_ad, long_document)
+             else Config.GEMINI_MAX_AD_TOKENS)
+    tokens = estimate_tokens(input_ad)
+    if tokens > limit:
+        raise PromptTooLargeError(
+            f"廣告內容過長（約 {tokens} tokens，上限 {limit}），請縮短後再試"
+        )
+
+
+def run_detection(input_ad, incremental=None, long_document=None, chunk_slots=None):
+    """
+    分析廣告並產生修改建議
+    
+    Args:
+        input_ad: 廣告內容
+        incremental: 是否使用逐句增量分析；None 表示依 INCREMENTAL_ANALYSIS_ENABLED（離線評估時指定）
+        long_document: 是否以長篇模式分析超過 LONG_DOC_MIN_CHARS 的內容；None 表示依 LONG_DOC_ENABLED
+        chunk_slots: 經公平佇列執行時的 ChunkSlots，長篇內容的並行區塊以此借用名額；
+                     None 表示不經佇列（離線評估、重新評估腳本），區塊直接在執行緒池並行
+        
+    Returns:
+        {'result_law': HTML 條列式分析結果, 'result_advice': 修改建議,
+         'token_usage': 此次檢測的 token 用量,
+         'evaluation': 評估版本標記（law_version / prompt_version / cited_articles）}
+        
+    Raises:
+        PromptTooLargeError: 廣告內容過長
+        Exception: 當 API 調用失敗時
+    """
+    check_ad_budget(input_ad, long_document)
+    ensure_law_version_registered()
+    usage = new_usage()
+    
+    # 法律文件（行程內只載入一次，與評估版本標記對應同一份內容）
+    law_text = law_index.text
+    
+    if is_long_document(input_ad, long_document):
+        return run_long_document_detection(input_ad, law_text, usage, chunk_slots)
+    
+    if incremental is None:
+        incremental = Config.INCREMENTAL_ANALYSIS_ENABLED
+    if incremental:
+        segments = split_segments(input_ad)
+        if sum(1 for segment in segments if not is_blank_segment(segment)) >= Config.INCREMENTAL_MIN_SEGMENTS:
+            result = run_segment_detection(segments, law_text, usage)
+            if result is not None:
+                return result
+    
+    # 分析廣告是否違法
+    result_law = gemini_service.analyze_ad_law(input_ad, law_text, usage=usage)
+    print(f'法律分析結果: {result_law}')
+    
+    # 建議修改方案
+    result_advice = gemini_service.suggest_ad_revision(input_ad, result_law, usage=usage)
+    print(f'修改建議: {result_advice}')
+    
+    # 清理 Markdown 格式並格式化為條列式
+    result_law = clean_markdown(result_law)
+    result_law = format_as_list_html(result_law)  # 轉換為 HTML 條列式
+    result_advice = clean_markdown(result_advice)
+    
+    print(f'Token 用量: {usage}')
+    
+    return {
+        'result_law': result_law,
+        'result_advice': result_advice,
+        'token_usage': usage,
+        'evaluation': build_evaluation_stamp(result_law, LAW_PROMPT_VERSION)
+    }
+
+
+def run_segment_detection(segments, law_text, usage):
+    """
+    逐句分析廣告：已快取的句子沿用先前的判斷，只分析新增或修改過的句子
+    
+    Args:
+        segments: split_segments 拆分的句子列表
+        law_text: 法律文件內容
+        usage: token 用量累計字典
+        
+    Returns:
+        與 run_detection 相同格式的結果；逐句分析輸出無法解析時返回 None（改用整則分析）
+    """
+    verdicts = resolve_segment_verdicts(segments, law_text, usage)
+    if verdicts is None:
+        return None
+    
+    result_law, result_advice = merge_segment_verdicts(segments, verdicts)
+    print(f'法律分析結果: {result_law}')
+    print(f'修改建議: {result_advice}')
+    print(f'Token 用量: {usage}')
+    
+    return {
+        'result_law': format_as_list_html(clean_markdown(result_law)),
+        'result_advice': clean_markdown(result_advice),
+        'token_usage': usage,
+        'evaluation': build_evaluation_stamp(result_law, SEGMENT_PROMPT_VERSION)
+    }
+
+
+def resolve_segment_verdicts(segments, law_text, usage):
+    """
+    取得每個句子的判斷結果：先查快取，未快取的句子以一次 API 調用分析後存入快取
+    
+    Returns:
+        與 segments 對應的判斷結果列表（空白句為 None）；逐句分析輸出無法解析時返回 None
+    """
+    # 快取鍵值包含提示詞與法律文件版本，任一更新後舊的判斷即不再沿用
+    version = f'{SEGMENT_PROMPT_VERSION}:{law_index.version}'
+    keys = [segment_key(segment, version) for segment in segments]
+    verdicts = SegmentVerdictModel.find_many(
+        [key for key, segment in zip(keys, segments) if not is_blank_segment(segment)]
+    )
+    
+    # 未快取的句子（相同句子只分析一次）
+    missing = {}
+    for key, segment in zip(keys, segments):
+        if key not in verdicts and key not in missing and not is_blank_segment(segment):
+            missing[key] = segment
+    
+    analyzable = sum(1 for segment in segments if not is_blank_segment(segment))
+    print(f'逐句分析: 共 {analyzable} 句，沿用快取 {analyzable - len(missing)} 句，重新分析 {len(missing)} 句')
+    
+    if missing:
+        results = gemini_service.analyze_segments(list(missing.values()), law_text, usage=usage)
+        if results is None:
+            return None
+        new_verdicts = dict(zip(missing.keys(), results))
+        SegmentVerdictModel.save_many(new_verdicts)
+        verdicts.update(new_verdicts)
+    
+    return [verdicts.get(key) for key in keys]
+
+
+def run_long_document_detection(input_ad, law_text, usage, chunk_slots=None):
+    """
+    長篇內容分析（map-reduce）：依段落切分為區塊並行分析，再合併為單一結論
+    
+    Args:
+        input_ad: 長篇廣告內容
+        law_text: 法律文件內容
+        usage: token 用量累計字典
+        chunk_slots: 並行區塊借用公平佇列名額的 ChunkSlots（None 表示不經佇列）
+        
+    Returns:
+        與 run_detection 相同格式的結果，違規內容附帶所在段落
+    """
+    chunks = split_chunks(input_ad, Config.LONG_DOC_CHUNK_CHARS)
+    print(f'長篇內容分析: {len(input_ad)} 字，切分為 {len(chunks)} 個區塊')
+    
+    # map：各區塊並行分析，token 用量各自記錄後再合併
+    if chunk_slots is None:
+        futures = [_long_doc_executor.submit(_analyze_chunk, chunk, law_text) for chunk in chunks]
+        results = [future.result() for future in futures]
+    else:
+        results = _analyze_chunks_with_slots(chunks, law_text, chunk_slots)
+    segments, verdicts, paragraphs = [], [], []
+    for chunk_items, chunk_usage in results:
+        merge_usage(usage, chunk_usage)
+        for paragraph_no, segment, verdict in chunk_items:
+            paragraphs.append(paragraph_no)
+            segments.append(segment)
+            verdicts.append(verdict)
+    
+    # reduce：合併為單一結論
+    result_law, result_advice = merge_segment_verdicts(segments, verdicts, paragraphs)
+    print(f'法律分析結果: {result_law}')
+    print(f'Token 用量: {usage}')
+    
+    return {
+        'result_law': format_as_list_html(clean_markdown(result_law)),
+        'result_advice': clean_markdown(result_advice),
+        'token_usage': usage,
+        'evaluation': build_evaluation_stamp(result_law, SEGMENT_PROMPT_VERSION)
+    }
+
+
+def _analyze_chunks_with_slots(chunks, law_text, chunk_slots):
+    """
+    在呼叫端已佔用的佇列名額中依序分析區塊，另以借用到的名額並行分析其餘區塊
+    
+    Returns:
+        與 chunks 對應的 [(區塊判斷結果, token 用量), ...]
+    """
+    results = [None] * len(chunks)
+    remaining = list(range(len(chunks)))
+    errors = []
+    lock = threading.Lock()
+    
+    def analyze_remaining(borrowed):
+        while True:
+            with lock:
+                # 借用的名額在其他工作開始排隊後歸還
+                if not remaining or errors or (borrowed and chunk_slots.contended()):
+                    return
+                index = remaining.pop(0)
+            try:
+                results[index] = _analyze_chunk(chunks[index], law_text)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                return
+    
+    def run_borrowed():
+        try:
+            analyze_remaining(True)
+        finally:
+            chunk_slots.give_back()
+    
+    helpers = []
+    while len(helpers) < min(Config.LONG_DOC_PARALLELISM, len(chunks)) - 1 and chunk_slots.borrow():
+        helpers.append(_long_doc_executor.submit(run_borrowed))
+    analyze_remaining(False)
+    for helper in helpers:
+        helper.result()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def _analyze_chunk(chunk, law_text):
+    """
+    分析單一區塊
+    
+    Args:
+        chunk: split_chunks 產生的區塊 [(段落編號, 句子), ...]
+        law_text: 法律文件內容
+        
+    Returns:
+        ([(段落編號, 句子, 判斷結果), ...], 此區塊的 token 用量)
+    """
+    usage = new_usage()
+    segments = [segment for _, segment in chunk]
+    verdicts = resolve_segment_verdicts(segments, law_text, usage)
+    if verdicts is not None:
+        return [(paragraph_no, segment, verdict)
+                for (paragraph_no, segment), verdict in zip(chunk, verdicts)], usage
+    
+    # 逐句輸出無法解析時，改以整則分析此區塊，結果視為區塊層級的單一判斷
+    chunk_text = ''.join(segments)
+    result_law = gemini_service.analyze_ad_law(chunk_text, law_text, usage=usage)
+    result_advice = gemini_service.suggest_ad_revision(chunk_text, result_law, usage=usage)
+    return [(chunk[0][0], chunk_text, _verdict_from_analysis(result_law, result_advice))], usage
+
+
+def _verdict_from_analysis(result_law, result_advice):
+    """將整則分析的 4 點結果轉換為判斷結果字典"""
+    lines = [re.sub(r'^[\d一二三四五六七八九十]+[\.、)]\s*', '', line.strip())
+             for line in clean_markdown(result_law).split('\n') if line.strip()]
+    lines += [''] * (3 - len(lines))
+    return {
+        'verdict': classify_verdict(lines[0]),
+        'article': lines[1],
+        'reason': lines[2],
+        'revision': clean_markdown(result_advice).strip()
+    }
+
+
+def merge_segment_verdicts(segments, verdicts, paragraphs=None):
+    """
+    將逐句判斷結果合併為整則廣告的分析結果與修改建議（與整則分析相同的 4 點格式）
+    
+    Args:
+        segments: 句子列表
+        verdicts: 與 segments 對應的判斷結果（空白句為 None）
+        paragraphs: 與 segments 對應的段落編號；提供時第 4 點逐項列出違規位置（長篇模式）
+        
+    Returns:
+        (分析結果文字, 修改建議文字)
+    """
+    judged = [verdict for verdict in verdicts if verdict]
+    if judged and all(verdict['verdict'] == 'non_medical' for verdict in judged):
+        return _RESULT_NOT_MEDICAL, '請輸入醫療相關廣告詞'
+    
+    paragraphs = paragraphs or [None] * len(segments)
+    articles, reasons, details, revised = [], [], [], []
+    for segment, verdict, paragraph_no in zip(segments, verdicts, paragraphs):
+        if not verdict or verdict['verdict'] != 'violation':
+            revised.append(segment)
+            continue
+        if verdict['article'] not in articles:
+            articles.append(verdict['article'])
+        if verdict['reason'] not in reasons:
+            reasons.append(verdict['reason'])
+        if paragraph_no is None:
+            details.append(f"「{segment.strip()}」違反{verdict['article']}")
+        else:
+            excerpt = segment.strip()
+            if len(excerpt) > 30:
+                excerpt = excerpt[:30] + '…'
+            details.append(f"- 第 {paragraph_no} 段「{excerpt}」違反{verdict['article']}：{verdict['reason']}")
+        # 保留原句結尾的換行，讓修改建議維持原本的段落
+        trailing = segment[len(segment.rstrip('\n')):]
+        revised.append(verdict['revision'].rstrip('\n') + trailing)
+    
+    result_advice = ''.join(revised)
+    if not articles:
+        return _RESULT_COMPLIANT, result_advice
+    
+    if paragraphs[0] is None:
+        return '\n'.join([
+            '1. 違法',
+            f"2. {'、'.join(articles)}",
+            f"3. {'；'.join(reasons)}",
+            f"4. {'；'.join(details)}"
+        ]), result_advice
+    
+    # 長篇模式：不受 110 字摘要限制，逐項列出每處違規所在段落
+    return '\n'.join([
+        f'1. 違法（共 {len(details)} 處）',
+        f"2. {'、'.join(articles)}",
+        f"3. {'；'.join(reasons)}",
+        '4. 違規位置：',
+        *details
+    ]), result_advice
+
+
+def wait_for_idle(timeout):
+    """
+    等待進行中的檢測完成（worker 關閉前排空請求）
+    
+    Returns:
+        是否已無進行中的檢測
+    """
+    deadline = time.monotonic() + timeout
+    while detection_flight.in_flight() > 0:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.2)
+    return True
+
+
+def detection_stats():
+    """本行程的檢測佇列狀態（供管理介面顯示）"""
+    return {
+        'in_flight': detection_flight.in_flight(),
+        # 已送出但尚未開始分析的長篇內容區塊
+        'long_doc_queue': _long_doc_executor._work_queue.qsize(),
+        'fair_queue': {key: value for key, value in detection_queue.snapshot().items() if key != 'keys'}
+    }
+
+
+def detection_user_stats():
+    """各用戶的速率限制（所有 worker 合計）與本行程的佇列計數（依視窗內請求數排序）"""
+    users = {}
+    for user_id, counts in RateLimitModel.snapshot('detect', Config.DETECT_RATE_WINDOW_SECONDS).items():
+        users.setdefault(user_id, {}).update(
+            window_requests=counts['window_requests'], rate_limited=counts['rejected']
+        )
+    for user_id, counts in detection_queue.snapshot()['keys'].items():
+        counts['queue_rejected'] = counts.pop('rejected')
+        users.setdefault(user_id, {}).update(counts)
+    return sorted(
+        ({'user_id': user_id, **counts} for user_id, counts in users.items()),
+        key=lambda item: item.get('window_requests', 0),
+        reverse=True
+    )
+
+
+def check_rate_limit(user_id):
+    """
+    記錄一次用戶的檢測請求
+    
+    Raises:
+        RateLimitExceeded: 超過 DETECT_RATE_LIMIT
+    """
+    retry_after = RateLimitModel.hit(
+        'detect', str(user_id), Config.DETECT_RATE_LIMIT, Config.DETECT_RATE_WINDOW_SECONDS
+    )
+    if retry_after:
+        raise RateLimitExceeded(
+            f'檢測次數已達上限（每 {Config.DETECT_RATE_WINDOW_SECONDS:g} 秒 {Config.DETECT_RATE_LIMIT} 次）',
+            retry_after
+        )
+
+
+def detect_coalesced(user_id, project_id, input_ad, store_result, weight=1):
+    """
+    執行檢測並儲存結果；相同用戶、專案與廣告內容的並行請求只會執行一次
+    
+    Args:
+        user_id: 用戶 ID
+        project_id: 專案 ID
+        input_ad: 廣告內容
+        store_result: 接收檢測結果並儲存的函數，返回值會一併回傳給所有等待的請求
+        weight: 此用戶在公平佇列中的權重
+        
+    Returns:
+        (store_result 的返回值, shared)
+    
+    Raises:
+        RateLimitExceeded: 公平佇列中此用戶排隊過多或等待過久
+    """
+    key = (str(user_id), str(project_id), normalize_ad_text(input_ad))
+    # 合併的請求只有實際執行的那一個佔用佇列名額
+    chunk_slots = ChunkSlots(str(user_id), weight)
+    return detection_flight.do(key, lambda: store_result(
+        detection_queue.run(str(user_id), lambda: run_detection(input_ad, chunk_slots=chunk_slots), weight)
+    ))
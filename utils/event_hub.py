@@ -0,0 +1,201 @@
+"""
+專案即時推播
+
+每個 worker 行程只有一個背景執行緒監看 MongoDB change stream（project_record 與 project 集合），
+收到變更後依專案分送給訂閱該專案的 SSE 連線（GET /api/project/<id>/events）。
+因此其他分頁、其他 worker 或背景工作（例如重新評估）寫入的記錄都能即時推送。
+
+change stream 需要 replica set；單機 MongoDB 不支援時改由模型在寫入後直接通知同一行程的訂閱者
+（此時只有同一個 worker 內的寫入會被推送）。
+
+每個行程最多保持 PUSH_MAX_SUBSCRIBERS 個連線；沒有訂閱者的專案不會解碼記錄內容。
+"""
+import queue
+import threading
+import time
+from pymongo.errors import OperationFailure, PyMongoError
+from database import db
+from utils.record_codec import decode_record
+from config import Config
+
+# 推送給前端的記錄欄位
+RECORD_EVENT_FIELDS = ('_id', 'project_id', 'input_ad', 'result_law', 'result_advice', 'created_at')
+
+# 重新評估等更新只有這些欄位變動時才需要推送
+_RESULT_FIELD_PREFIX = 'result_'
+
+
+def record_event_payload(doc):
+    """將資料庫中的記錄轉為推送內容"""
+    record = decode_record(doc)
+    return {field: record.get(field) for field in RECORD_EVENT_FIELDS}
+
+
+class SubscriberLimitReached(Exception):
+    """此行程的推播連線已達 PUSH_MAX_SUBSCRIBERS"""
+    
+    def __init__(self, retry_after):
+        super().__init__('推播連線數已達上限')
+        # 最早結束的連線到期前的秒數
+        self.retry_after = retry_after
+
+
+class Subscription:
+    """單一 SSE 連線的事件佇列"""
+    
+    def __init__(self, project_id, max_size):
+        self.project_id = project_id
+        self.queue = queue.Queue(maxsize=max_size)
+        # 連線最長保持到此時間（time.monotonic()）
+        self.deadline = time.monotonic() + Config.PUSH_STREAM_SECONDS
+        # 佇列已滿而遺漏事件時設定，前端收到 resync 後重新載入專案
+        self.overflowed = False
+    
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+    
+    def get(self, timeout):
+        """取得下一個事件；逾時返回 None"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventHub:
+    """依專案分送事件的行程內訂閱中心"""
+    
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        # change stream 是否正在運作；運作中時模型不需要直接通知
+        self._change_stream_active = threading.Event()
+        # 確認環境不支援 change stream 後不再嘗試
+        self._change_stream_unsupported = False
+    
+    def subscribe(self, project_id):
+        """
+        訂閱專案事件（第一次訂閱時啟動 change stream 監看執行緒）
+        
+        Raises:
+            SubscriberLimitReached: 此行程的連線數已達 PUSH_MAX_SUBSCRIBERS
+        """
+        subscription = Subscription(str(project_id), Config.PUSH_QUEUE_SIZE)
+        with self._lock:
+            current = [s for subscribers in self._subscribers.values() for s in subscribers]
+            if len(current) >= Config.PUSH_MAX_SUBSCRIBERS:
+                if current:
+                    retry_after = min(s.deadline for s in current) - time.monotonic()
+                else:
+                    # 此行程不提供推播（上限為 0）
+                    retry_after = Config.PUSH_STREAM_SECONDS
+                raise SubscriberLimitReached(max(1.0, retry_after))
+            self._subscribers.setdefault(subscription.project_id, set()).add(subscription)
+            self._ensure_watcher()
+        return subscription
+    
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.project_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.project_id]
+    
+    def subscriber_count(self):
+        """目前的訂閱連線數"""
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+    
+    def publish(self, project_id, event_type, data):
+        """
+        將事件分送給訂閱該專案的連線
+        
+        Args:
+            data: 事件內容，或產生內容的無參數函數（只有在專案有訂閱者時才呼叫）
+        """
+        with self._lock:
+            subscribers = list(self._subscribers.get(str(project_id), ()))
+        if not subscribers:
+            return
+        if callable(data):
+            data = data()
+        for subscription in subscribers:
+            subscription.put((event_type, data))
+    
+    def notify(self, project_id, event_type, data):
+        """
+        模型寫入後呼叫：change stream 運作中時由監看執行緒推送（避免重複），
+        否則直接分送給同一行程的訂閱者（data 同 publish）
+        """
+        if not self._change_stream_active.is_set():
+            self.publish(project_id, event_type, data)
+    
+    def _ensure_watcher(self):
+        if self._change_stream_unsupported or (self._watcher and self._watcher.is_alive()):
+            return
+        self._watcher = threading.Thread(target=self._watch, name='change-stream', daemon=True)
+        self._watcher.start()
+    
+    def _watch(self):
+        """監看 change stream；連線中斷時以 resume token 從中斷處繼續"""
+        pipeline = [{'$match': {
+            'ns.coll': {'$in': ['project_record', 'project']},
+            'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}
+        }}]
+        resume_token = None
+        backoff = 1
+        while True:
+            try:
+                with db.db.watch(pipeline, full_document='updateLookup',
+                                 resume_after=resume_token) as stream:
+                    self._change_stream_active.set()
+                    backoff = 1
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        self._dispatch(change)
+            except OperationFailure as e:
+                # 單機 MongoDB（非 replica set）不支援 change stream
+                print(f"change stream 無法使用，改為行程內通知: {e}")
+                self._change_stream_active.clear()
+                self._change_stream_unsupported = True
+                return
+            except PyMongoError as e:
+                print(f"change stream 中斷，{backoff} 秒後重新連線: {e}")
+                self._change_stream_active.clear()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+    
+    def _dispatch(self, change):
+        collection = change['ns']['coll']
+        operation = change['operationType']
+        
+        if collection == 'project_record':
+            doc = change.get('fullDocument')
+            if not doc:
+                return
+            # 記錄內容只在專案有訂閱者時才解碼
+            if operation == 'insert':
+                self.publish(doc['project_id'], 'record', lambda: record_event_payload(doc))
+            elif operation == 'replace' or any(
+                field.startswith(_RESULT_FIELD_PREFIX)
+                for field in change.get('updateDescription', {}).get('updatedFields', {})
+            ):
+                self.publish(doc['project_id'], 'record_updated', lambda: record_event_payload(doc))
+        elif collection == 'project':
+            project_id = change['documentKey']['_id']
+            if operation == 'delete':
+                self.publish(project_id, 'project_deleted', {'project_id': project_id})
+            elif change.get('fullDocument'):
+                self.publish(project_id, 'project', {
+                    'project_id': project_id,
+                    'project_name': change['fullDocument'].get('project_name')
+                })
+
+
+# 建立全域推播實例
+event_hub = EventHub()
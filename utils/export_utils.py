@@ -0,0 +1,212 @@
+"""
+專案記錄匯出工具
+
+以產生器逐筆輸出 CSV、JSONL 或 XLSX，搭配 MongoDB cursor 串流回應，
+記憶體用量與記錄數量無關。XLSX 以 zipfile 直接寫入串流（不需要額外套件），
+工作表使用 inline string，不需預先收集所有字串。
+"""
+import csv
+import io
+import re
+import zipfile
+from xml.sax.saxutils import escape
+from utils.text_utils import html_to_text
+
+# 匯出欄位：(記錄欄位, 標題)
+EXPORT_COLUMNS = [
+    ('_id', '記錄 ID'),
+    ('created_at', '檢測時間'),
+    ('input_ad', '廣告內容'),
+    ('result_law', '法律分析'),
+    ('result_advice', '修改建議'),
+    ('law_version', '法規版本'),
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# 每累積多少列輸出一次（避免每列一個 chunk 造成過多小封包）
+ROWS_PER_CHUNK = 50
+
+# Excel 單一儲存格的字元上限
+XLSX_CELL_MAX_CHARS = 32767
+
+# 試算表會把這些字元開頭的內容當成公式
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+# XML 1.0 不允許的控制字元
+_XML_ILLEGAL_PATTERN = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def record_to_row(record):
+    """
+    將記錄轉為匯出用的欄位值（法律分析由 HTML 轉為純文字）
+    
+    Returns:
+        與 EXPORT_COLUMNS 對應的字串列表
+    """
+    row = []
+    for field, _ in EXPORT_COLUMNS:
+        value = record.get(field)
+        if field == 'result_law':
+            value = html_to_text(value)
+        elif field == 'created_at' and value is not None:
+            value = value.strftime('%Y-%m-%d %H:%M:%S')
+        row.append('' if value is None else str(value))
+    return row
+
+
+def _csv_safe(value):
+    """避免試算表把儲存格內容當成公式執行"""
+    return "'" + value if value.startswith(_FORMULA_PREFIXES) else value
+
+
+def stream_csv(records):
+    """
+    逐批輸出 CSV（開頭加上 BOM，Excel 才會以 UTF-8 開啟）
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([title for _, title in EXPORT_COLUMNS])
+    yield '\ufeff' + buffer.getvalue()
+    
+    count = 0
+    for record in records:
+        if count == 0:
+            buffer.seek(0)
+            buffer.truncate()
+        writer.writerow([_csv_safe(value) for value in record_to_row(record)])
+        count += 1
+        if count == ROWS_PER_CHUNK:
+            yield buffer.getvalue()
+            count = 0
+    if count:
+        yield buffer.getvalue()
+
+
+def stream_jsonl(records, dumps):
+    """
+    每筆記錄輸出一行 JSON
+    
+    Args:
+        dumps: JSON 序列化函數（使用應用程式的 JSON provider，ObjectId 與 datetime 可直接序列化）
+    """
+    lines = []
+    for record in records:
+        row = {
+            field: record.get(field)
+            for field, _ in EXPORT_COLUMNS
+        }
+        row['result_law'] = html_to_text(row['result_law'])
+        lines.append(dumps(row))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+class _ChunkWriter(io.RawIOBase):
+    """zipfile 寫入的目的地：累積寫入的資料，由產生器取出後清空（不支援 seek，zipfile 會改用 data descriptor）"""
+    
+    def __init__(self):
+        self._chunks = []
+    
+    def writable(self):
+        return True
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_XLSX_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_XLSX_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_XLSX_SHEET_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_FOOTER = '</sheetData></worksheet>'
+
+
+def _xlsx_row(values):
+    cells = ''.join(
+        '<c t="inlineStr"><is><t xml:space="preserve">'
+        f'{escape(_XML_ILLEGAL_PATTERN.sub("", value[:XLSX_CELL_MAX_CHARS]))}'
+        '</t></is></c>'
+        for value in values
+    )
+    return f'<row>{cells}</row>'
+
+
+def _sheet_name(name):
+    """工作表名稱最多 31 字且不可包含 []:*?/\\"""
+    name = re.sub(r'[\[\]:*?/\\]', '_', name or '').strip() or 'Records'
+    return escape(name[:31], {'"': '&quot;'})
+
+
+def stream_xlsx(records, sheet_name='Records'):
+    """
+    逐批輸出 XLSX
+    
+    工作表 XML 以 ZIP_DEFLATED 串流壓縮，每 ROWS_PER_CHUNK 列輸出一次已壓縮的資料
+    """
+    output = _ChunkWriter()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _XLSX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _XLSX_ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _XLSX_WORKBOOK.format(name=_sheet_name(sheet_name)))
+        archive.writestr('xl/_rels/workbook.xml.rels', _XLSX_WORKBOOK_RELS)
+        
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(_XLSX_SHEET_HEADER.encode('utf-8'))
+            sheet.write(_xlsx_row([title for _, title in EXPORT_COLUMNS]).encode('utf-8'))
+            count = 0
+            for record in records:
+                sheet.write(_xlsx_row(record_to_row(record)).encode('utf-8'))
+                count += 1
+                if count % ROWS_PER_CHUNK == 0:
+                    chunk = output.drain()
+                    if chunk:
+                        yield chunk
+            sheet.write(_XLSX_SHEET_FOOTER.encode('utf-8'))
+    yield output.drain()
@@ -2,8 +2,28 @@
 Gemini API 服務模組
 """
 import google.generativeai as genai
+import re
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait, FIRST_COMPLETED
 from config import Config
+from utils.model_pool import ModelHealth, ModelPool
+from utils.token_utils import (
+    PromptTooLargeError, token_estimator, estimate_tokens, trim_to_tokens, add_usage
+)
+
+# 提示詞模板名稱（用於 token 估算校正）
+LAW_PROMPT_TEMPLATE = 'ad_law'
+SEGMENT_PROMPT_TEMPLATE = 'ad_segments'
+
+# 提示詞版本（修改提示詞或輸出格式時遞增）：記錄會標記評估時的版本，舊的句子快取即失效
+LAW_PROMPT_VERSION = 'law-v1'
+SEGMENT_PROMPT_VERSION = 'segment-v1'
+
+# 逐句分析結果的判斷類別
+SEGMENT_VERDICTS = {'違法': 'violation', '不違法': 'compliant', '非醫療': 'non_medical'}
+_SEGMENT_LINE_PATTERN = re.compile(
+    r'^\s*\[(\d+)\]\s*(不違法|違法|非醫療)\s*[|｜]\s*(.*?)\s*[|｜]\s*(.*?)\s*[|｜]\s*(.*?)\s*$'
+)
 
 # 嘗試導入 Google API 異常類別
 try:
@@ -20,77 +40,150 @@ class GeminiService:
     
     def __init__(self):
         genai.configure(api_key=Config.GEMINI_API_KEY)
-        self.model = self._get_available_model()
+        self.model_pool = self._build_model_pool()
+        # 對沖請求（hedged request）使用的執行緒池
+        self._hedge_executor = None
+        if Config.GEMINI_HEDGE_ENABLED and len(self.model_pool.entries) > 1:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=Config.GEMINI_HEDGE_WORKERS,
+                thread_name_prefix='gemini-hedge'
+            )
     
-    def _get_available_model(self):
-        """獲取可用的 Gemini 模型（優先使用最快的模型以提升速度）"""
-        model = None
+    def reset_after_fork(self):
+        """
+        fork 後重新建立 API 用戶端（gRPC 連線與執行緒不能跨 fork 使用）；
+        沿用 master 行程探索到的模型清單，不重新呼叫 list_models
+        """
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+        for entry in self.model_pool.entries:
+            entry.model = genai.GenerativeModel(entry.name)
+        if self._hedge_executor is not None:
+            self._hedge_executor = ThreadPoolExecutor(
+                max_workers=Config.GEMINI_HEDGE_WORKERS,
+                thread_name_prefix='gemini-hedge'
+            )
+    
+    @property
+    def model(self):
+        """首選模型（向後兼容）"""
+        return self.model_pool.primary.model
+    
+    def _discover_model_names(self):
+        """列出支援 generateContent 的模型名稱（flash 模型優先，通常最快）"""
+        if Config.GEMINI_MODELS:
+            return list(Config.GEMINI_MODELS)
         
-        # 動態查找可用的模型，優先尋找最快的模型
         try:
             available_models = list(genai.list_models())
             print(f"找到 {len(available_models)} 個可用模型")
             
-            # 優先尋找包含 "flash" 的模型（通常最快）
-            for m in available_models:
-                model_name = m.name.replace('models/', '')
-                if 'flash' in model_name.lower() and 'generateContent' in m.supported_generation_methods:
-                    try:
-                        model = genai.GenerativeModel(model_name)
-                        print(f"成功使用模型: {model_name} (優先選擇，速度最快)")
-                        return model
-                    except Exception as e:
-                        print(f"嘗試 {model_name} 失敗: {str(e)[:100]}")
-                        continue
-            
-            # 如果沒有 flash，找任何支援 generateContent 的模型
-            for m in available_models:
-                if 'generateContent' in m.supported_generation_methods:
-                    model_name = m.name.replace('models/', '')
-                    try:
-                        model = genai.GenerativeModel(model_name)
-                        print(f"成功使用模型: {model_name}")
-                        return model
-                    except Exception as e:
-                        print(f"嘗試 {model_name} 失敗: {str(e)[:100]}")
-                        continue
+            names = [m.name.replace('models/', '') for m in available_models
+                     if 'generateContent' in m.supported_generation_methods]
+            flash = [name for name in names if 'flash' in name.lower()]
+            others = [name for name in names if 'flash' not in name.lower()]
+            if names:
+                return flash + others
         except Exception as e:
             print(f"無法列出模型: {e}")
         
         # 如果動態查找失敗，嘗試常見模型名稱（按速度優先順序）
-        model_names = ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro', 'gemini-1.0-pro']
-        for name in model_names:
-            try:
-                model = genai.GenerativeModel(name)
-                print(f"成功使用模型: {name}")
+        return ['gemini-1.5-flash', 'gemini-1.5-pro', 'gemini-pro', 'gemini-1.0-pro']
+    
+    def _build_model_pool(self):
+        """從可用模型建立模型池（最多 GEMINI_MODEL_POOL_SIZE 個，第一個為首選模型）"""
+        entries = []
+        
+        for model_name in self._discover_model_names():
+            if len(entries) >= Config.GEMINI_MODEL_POOL_SIZE:
                 break
+            try:
+                model = genai.GenerativeModel(model_name)
             except Exception as e:
-                print(f"嘗試 {name} 失敗: {str(e)[:100]}")
+                print(f"嘗試 {model_name} 失敗: {str(e)[:100]}")
                 continue
+            entries.append(ModelHealth(
+                model_name,
+                model,
+                failure_threshold=Config.GEMINI_BREAKER_FAILURES,
+                cooldown=Config.GEMINI_BREAKER_COOLDOWN
+            ))
+            print(f"加入模型池: {model_name}{' (首選)' if len(entries) == 1 else ''}")
         
-        if model is None:
+        if not entries:
             raise Exception(
                 "無法找到可用的 Gemini 模型。"
                 "請檢查 API Key 是否正確，或更新 google-generativeai 套件版本。"
             )
         
-        return model
+        return ModelPool(entries)
     
-    def analyze_ad_law(self, ad_text, law_context):
+    def analyze_ad_law(self, ad_text, law_context, usage=None):
         """
         分析廣告是否違法
         
         Args:
             ad_text: 廣告文字
             law_context: 法律文件內容
+            usage: token 用量累計字典（見 utils.token_utils.new_usage），None 表示不記錄
             
         Returns:
             分析結果文字
             
         Raises:
+            PromptTooLargeError: 廣告內容過長，無法放入 token 預算
             Exception: 當 API 調用失敗時
         """
-        prompt = f"""你是一個專業的律師，並具有台灣的醫療法相關知識。
+        law_context = self._fit_law_context(ad_text, law_context)
+        prompt = self._build_law_prompt(ad_text, law_context)
+        
+        result = self._generate_content_with_retry(prompt, usage=usage)
+        # 格式化為條列式
+        return self._format_as_list(result)
+    
+    def _fit_law_context(self, ad_text, law_context, build_prompt=None, template=LAW_PROMPT_TEMPLATE):
+        """
+        依 token 預算調整法律文件內容：超過預算時優先截斷法律文件，
+        廣告本身已超過預算則拒絕
+        
+        Args:
+            ad_text: 廣告文字（或逐句分析時的句子清單文字）
+            law_context: 法律文件內容
+            build_prompt: 提示詞建立函數 (ad_text, law_context) -> prompt，預設為法律分析提示詞
+            template: 提示詞模板名稱（用於 token 估算校正）
+        
+        Returns:
+            可放入預算的法律文件內容
+            
+        Raises:
+            PromptTooLargeError: 扣除廣告內容後剩餘預算不足
+        """
+        build_prompt = build_prompt or self._build_law_prompt
+        if Config.GEMINI_TOKEN_CALIBRATION and not token_estimator.is_calibrated(template):
+            token_estimator.calibrate(
+                template,
+                build_prompt(ad_text, law_context),
+                self.model
+            )
+        
+        budget = Config.GEMINI_PROMPT_TOKEN_BUDGET
+        overhead = token_estimator.estimate(build_prompt(ad_text, ''), template)
+        available = budget - overhead
+        
+        if available < Config.GEMINI_MIN_LAW_CONTEXT_TOKENS:
+            raise PromptTooLargeError(
+                f"廣告內容過長（約 {estimate_tokens(ad_text)} tokens），"
+                f"超過單次分析的預算，請縮短後再試"
+            )
+        
+        if token_estimator.estimate(law_context, template) > available:
+            print(f"法律文件超過 token 預算，截斷至約 {available} tokens")
+            law_context = trim_to_tokens(law_context, available, template, token_estimator)
+        
+        return law_context
+    
+    def _build_law_prompt(self, ad_text, law_context):
+        """建立法律分析提示詞"""
+        return f"""你是一個專業的律師，並具有台灣的醫療法相關知識。
 
 請先分析相關文件：
 {law_context}
@@ -137,18 +230,95 @@ class GeminiService:
   2. 無
   3. 無違法行為
   4. 符合法規"""
+    
+    def analyze_segments(self, segments, law_context, usage=None):
+        """
+        逐句分析廣告是否違法，並同時產生每句的修改結果（一次 API 調用）
         
-        result = self._generate_content_with_retry(prompt)
-        # 格式化為條列式
-        return self._format_as_list(result)
+        Args:
+            segments: 句子列表
+            law_context: 法律文件內容
+            usage: token 用量累計字典，None 表示不記錄
+            
+        Returns:
+            與 segments 對應的判斷結果列表，每項為
+            {'verdict': 'violation'/'compliant'/'non_medical', 'article', 'reason', 'revision'}；
+            模型輸出缺少任何一句時返回 None
+            
+        Raises:
+            PromptTooLargeError: 句子內容過長，無法放入 token 預算
+            Exception: 當 API 調用失敗時
+        """
+        numbered = '\n'.join(f'[{index}] {segment.strip()}' for index, segment in enumerate(segments, 1))
+        law_context = self._fit_law_context(
+            numbered, law_context, self._build_segment_prompt, SEGMENT_PROMPT_TEMPLATE
+        )
+        prompt = self._build_segment_prompt(numbered, law_context)
+        
+        result = self._generate_content_with_retry(prompt, usage=usage)
+        return self._parse_segment_verdicts(result, len(segments))
     
-    def suggest_ad_revision(self, ad_text, law_analysis):
+    def _build_segment_prompt(self, numbered_segments, law_context):
+        """建立逐句分析提示詞"""
+        return f"""你是一個專業的律師，並具有台灣的醫療法相關知識。
+
+請先分析相關文件：
+{law_context}
+
+以下是一則廣告拆分後的句子，請逐句判斷是否違法：
+{numbered_segments}
+
+**重要原則：**
+1. 與醫療、診所、醫院、治療、健康服務等無關的句子判斷為「非醫療」
+2. 必須根據句子實際內容判斷，不要假設或推測
+3. 只有當句子明確包含禁止用語（如「免費」、「贈送」、「折扣」等）或違法行為時，才判斷為「違法」
+
+請每句輸出一行，格式為：
+[編號] 判斷 | 違反的法條 | 違法原因 | 修改後的句子
+
+重要要求：
+- 判斷只能是「違法」、「不違法」或「非醫療」
+- 違法時必須明確寫出法條名稱，例如「醫療法第61條第1項」，違法原因不超過 25 字，修改後的句子需移除違法內容並保留原意
+- 不違法或非醫療時，法條與原因寫「無」，修改後的句子照抄原句
+- 每一句都必須輸出，不要合併，不要輸出其他內容
+- 格式範例：
+  [1] 違法 | 醫療法第61條第1項 | 以免費優惠不正當招攬病人 | 首次諮詢歡迎預約
+  [2] 不違法 | 無 | 無 | 專業醫師團隊為您服務"""
+    
+    def _parse_segment_verdicts(self, text, count):
+        """
+        解析逐句分析結果
+        
+        Returns:
+            判斷結果列表；缺少任何一句時返回 None
+        """
+        verdicts = {}
+        for line in (text or '').split('\n'):
+            match = _SEGMENT_LINE_PATTERN.match(line.replace('*', ''))
+            if not match:
+                continue
+            index = int(match.group(1))
+            if 1 <= index <= count and index not in verdicts:
+                verdicts[index] = {
+                    'verdict': SEGMENT_VERDICTS[match.group(2)],
+                    'article': match.group(3),
+                    'reason': match.group(4),
+                    'revision': match.group(5)
+                }
+        
+        if len(verdicts) != count:
+            print(f"逐句分析結果不完整（{len(verdicts)}/{count} 句）")
+            return None
+        return [verdicts[index] for index in range(1, count + 1)]
+    
+    def suggest_ad_revision(self, ad_text, law_analysis, usage=None):
         """
         建議廣告修改方案
         
         Args:
             ad_text: 原始廣告文字
             law_analysis: 法律分析結果
+            usage: token 用量累計字典，None 表示不記錄
             
         Returns:
             修改建議文字
@@ -166,15 +336,19 @@ class GeminiService:
 
 請參考上述語句幫我以繁體中文建議我如何修改此廣告詞以達到不違法的目的，請只要告訴我修改後的結果就好：{ad_text}"""
         
-        return self._generate_content_with_retry(prompt)
+        return self._generate_content_with_retry(prompt, usage=usage)
     
-    def _generate_content_with_retry(self, prompt, max_retries=3):
+    def _generate_content_with_retry(self, prompt, max_retries=3, usage=None):
         """
-        生成內容，帶有重試機制
+        生成內容，帶有模型轉移與重試機制
+        
+        依健康狀態依序嘗試模型池中的模型：配額不足或暫時性錯誤（5xx、逾時）時
+        立即轉移到下一個模型；所有模型都無法使用時才等待後重試。
         
         Args:
             prompt: 提示文字
-            max_retries: 最大重試次數
+            max_retries: 最大重試輪數
+            usage: token 用量累計字典，成功時加入此次回應的 usage_metadata
             
         Returns:
             API 回應的文字內容
@@ -182,47 +356,130 @@ class GeminiService:
         Raises:
             Exception: 當所有重試都失敗時
         """
-        last_exception = None
-        
         for attempt in range(max_retries):
-            try:
-                response = self.model.generate_content(prompt)
-                return response.text
-                
-            except Exception as e:
-                # 檢查是否為配額限制錯誤
-                error_str = str(e)
-                is_quota_error = (
-                    'ResourceExhausted' in error_str or
-                    'quota' in error_str.lower() or
-                    '429' in error_str or
-                    '配額' in error_str
-                )
-                
-                if is_quota_error:
-                    # 處理配額限制錯誤
-                    last_exception = e
-                    # 從錯誤訊息中提取重試延遲時間
-                    retry_delay = self._extract_retry_delay(e)
-                    
-                    if attempt < max_retries - 1:
-                        print(f"API 配額已用完，等待 {retry_delay} 秒後重試 (嘗試 {attempt + 1}/{max_retries})...")
-                        time.sleep(retry_delay)
-                        continue  # 繼續下一次重試
+            quota_delay = None
+            transient_error = None
+            candidates = self.model_pool.ranked()
+            
+            for index, entry in enumerate(candidates):
+                if not entry.acquire():
+                    continue
+                try:
+                    backup = candidates[index + 1] if index + 1 < len(candidates) else None
+                    response = self._call_model(entry, prompt, backup)
+                    add_usage(usage, response)
+                    return response.text
+                except Exception as e:
+                    error_type = self._classify_error(e)
+                    if error_type == 'quota':
+                        quota_delay = self._extract_retry_delay(e)
+                        print(f"模型 {entry.name} 配額已用完，轉移到下一個模型")
+                    elif error_type == 'transient':
+                        transient_error = e
+                        print(f"模型 {entry.name} 暫時無法使用，轉移到下一個模型: {str(e)[:100]}")
                     else:
-                        # 最後一次嘗試也失敗
-                        raise Exception(
-                            f"API 配額已用完。免費層每日限制為 20 次請求。"
-                            f"請稍後再試（建議等待 {retry_delay} 秒），或升級您的 API 方案。"
-                            f"詳細資訊：https://ai.google.dev/gemini-api/docs/rate-limits"
-                        )
-                else:
-                    # 其他類型的錯誤，直接拋出
-                    raise Exception(f"API 調用失敗: {str(e)}")
+                        # 其他類型的錯誤，直接拋出
+                        raise Exception(f"API 調用失敗: {str(e)}")
+            
+            # 這一輪沒有任何模型成功
+            if quota_delay is None and transient_error is None and self.model_pool.next_quota_reset() > 0:
+                quota_delay = int(self.model_pool.next_quota_reset()) + 1
+            
+            if attempt == max_retries - 1:
+                break
+            
+            if quota_delay is not None:
+                print(f"所有模型的 API 配額已用完，等待 {quota_delay} 秒後重試 (嘗試 {attempt + 1}/{max_retries})...")
+                time.sleep(quota_delay)
+            elif transient_error is not None:
+                time.sleep(attempt + 1)
+            else:
+                # 所有模型的斷路器都已跳脫
+                break
+        
+        if quota_delay is not None:
+            raise Exception(
+                f"API 配額已用完。免費層每日限制為 20 次請求。"
+                f"請稍後再試（建議等待 {quota_delay} 秒），或升級您的 API 方案。"
+                f"詳細資訊：https://ai.google.dev/gemini-api/docs/rate-limits"
+            )
+        if transient_error is not None:
+            raise Exception(f"API 調用失敗: {str(transient_error)}")
+        raise Exception("API 調用失敗: 所有模型暫時無法使用，請稍後再試")
+    
+    def _call_model(self, entry, prompt, backup=None):
+        """
+        呼叫模型；啟用對沖請求時，若首選模型超過其 p95 延遲仍未回應，
+        同時向備援模型發送相同請求並採用先完成的結果
+        
+        Returns:
+            API 回應物件
+        """
+        if self._hedge_executor is None or backup is None:
+            return self._invoke(entry, prompt)
+        
+        delay = entry.p95_latency(default=Config.GEMINI_HEDGE_DEFAULT_DELAY)
+        primary = self._hedge_executor.submit(self._invoke, entry, prompt)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        
+        if not backup.acquire():
+            return primary.result()
+        
+        print(f"模型 {entry.name} 超過 {delay:.1f} 秒未回應，同時向 {backup.name} 發送備援請求")
+        hedge = self._hedge_executor.submit(self._invoke, backup, prompt)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    
+    def _invoke(self, entry, prompt):
+        """呼叫單一模型並記錄延遲與結果"""
+        start = time.monotonic()
+        try:
+            response = entry.model.generate_content(prompt)
+            # 讀取 text 以確認回應有效（被安全機制阻擋時會拋出例外）
+            response.text
+        except Exception as e:
+            if self._classify_error(e) == 'quota':
+                entry.record_failure(quota_delay=self._extract_retry_delay(e))
+            elif self._classify_error(e) == 'transient':
+                entry.record_failure()
+            else:
+                entry.release_trial()
+            raise
+        entry.record_success(time.monotonic() - start)
+        return response
+    
+    def _classify_error(self, exception):
+        """
+        判斷錯誤類型
+        
+        Returns:
+            'quota'：配額限制；'transient'：伺服器端暫時性錯誤；'fatal'：其他錯誤
+        """
+        if GOOGLE_EXCEPTIONS_AVAILABLE:
+            if isinstance(exception, google_exceptions.ResourceExhausted):
+                return 'quota'
+            if isinstance(exception, (google_exceptions.ServerError,
+                                      google_exceptions.DeadlineExceeded)):
+                return 'transient'
         
-        # 如果所有重試都失敗
-        if last_exception:
-            raise last_exception
+        error_str = str(exception)
+        if ('ResourceExhausted' in error_str or 'quota' in error_str.lower() or
+                '429' in error_str or '配額' in error_str):
+            return 'quota'
+        if any(code in error_str for code in ('500', '502', '503', '504')) or \
+                'timeout' in error_str.lower() or 'unavailable' in error_str.lower():
+            return 'transient'
+        return 'fatal'
     
     def _extract_retry_delay(self, exception):
         """
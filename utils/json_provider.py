@@ -0,0 +1,64 @@
+"""
+Flask JSON 提供者
+
+以 orjson 序列化回應，直接支援 MongoDB 文件中的 ObjectId 與 datetime，
+模型可以直接返回資料庫文件，不需要逐筆將 _id 等欄位轉為字串。
+未安裝 orjson 時改用標準函式庫，輸出格式相同。
+"""
+import datetime
+from bson import ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# orjson 支援的 dumps 參數（其餘參數改用標準函式庫處理）
+_ORJSON_KWARGS = {'sort_keys', 'indent', 'separators', 'ensure_ascii'}
+
+
+def _default(obj):
+    """序列化 JSON 原生不支援的型別"""
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        # 與 orjson 一致使用 ISO 8601（Flask 預設為 HTTP 日期格式）
+        return obj.isoformat()
+    return DefaultJSONProvider.default(obj)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """支援 ObjectId / datetime 的 JSON 提供者（優先使用 orjson）"""
+    
+    default = staticmethod(_default)
+    
+    def _orjson_option(self, sort_keys=False, indent=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj, **kwargs):
+        if not ORJSON_AVAILABLE or kwargs.keys() - _ORJSON_KWARGS:
+            return super().dumps(obj, **kwargs)
+        option = self._orjson_option(kwargs.get('sort_keys', False), kwargs.get('indent'))
+        return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        if not ORJSON_AVAILABLE or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        if not ORJSON_AVAILABLE:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # 直接輸出 bytes，省去編碼為 str 再轉回 bytes 的成本
+        body = orjson.dumps(obj, default=_default, option=self._orjson_option(indent=indent))
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
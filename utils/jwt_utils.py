@@ -161,6 +161,32 @@ def jwt_required_page(f):
     return decorated
 
 
+def admin_required_page(f):
+    """
+    管理員驗證裝飾器（用於頁面路由）
+    未登入時重定向到登入頁面，一般用戶重定向到主功能頁面
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        from flask import redirect, url_for, make_response
+        token = JWTManager.get_token_from_request()
+        payload = JWTManager.verify_token(token) if token else None
+        
+        if not payload:
+            response = make_response(redirect(url_for('auth.login_page')))
+            response.set_cookie('access_token', '', max_age=0)
+            return response
+        
+        if payload.get('user_type') != 'admin':
+            return redirect(url_for('user.home'))
+        
+        request.current_user = payload
+        
+        return f(*args, **kwargs)
+    
+    return decorated
+
+
 def admin_required(f):
     """
     管理員驗證裝飾器
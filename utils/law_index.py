@@ -0,0 +1,191 @@
+"""
+法規條文索引
+
+解析法律文件開頭的「重要法條索引」表格（條文\t內容），建立條文名稱到條文內容的對照，
+供即時檢查提示與記錄引用條文使用；並計算文件版本與各條文的雜湊，用於判斷法規更新影響哪些記錄。
+條文雜湊涵蓋整份文件（同樣會送給 Gemini）：表格外的公告、【】段落與各章說明歸入其引用的條文，
+沒有引用條文的內容歸入 GENERAL_SECTION。
+"""
+import hashlib
+import re
+import threading
+from utils.file_utils import load_law_document
+
+# 表格中的條文列，例如「醫療法第61條\t1. 醫療機構，不得以...」
+_ARTICLE_ROW_PATTERN = re.compile(r'^((?:醫療法施行細則|醫療法)第\d+條)\t(.*)$')
+# 條文引用，例如「醫療法第61條第1項」「醫療法第86條第7款」
+ARTICLE_REF_PATTERN = re.compile(r'(醫療法施行細則|醫療法)\s*第\s*(\d+)\s*條')
+# 說明文字中的條文引用，例如「《醫療法》第85、86條」
+_SECTION_REF_PATTERN = re.compile(r'(醫療法施行細則|醫療法)》?\s*第\s*(\d+(?:\s*[、，,及與和]\s*\d+)*)\s*條')
+# 段落標題，例如「【醫療法第61條第1項公告禁止之不正當方法】」「第四章 醫療廣告之禁止行為態樣分析」
+_SECTION_HEADING_PATTERN = re.compile(r'^(?:【.*】|第[一二三四五六七八九十]+章\s)')
+# 沒有引用任何條文的內容（變動時所有記錄都需要重新評估）
+GENERAL_SECTION = '一般內容'
+
+
+def parse_articles(law_text):
+    """
+    解析法律文件中的條文
+    
+    Args:
+        law_text: 法律文件內容
+        
+    Returns:
+        {條文名稱: 條文內容}，例如 {'醫療法第61條': '1. 醫療機構，不得...'}
+    """
+    articles = {}
+    current = None
+    
+    for line in law_text.split('\n'):
+        match = _ARTICLE_ROW_PATTERN.match(line)
+        if match:
+            current = match.group(1)
+            articles[current] = [match.group(2).strip()]
+            continue
+        if current is None:
+            continue
+        stripped = line.strip()
+        # 空行、表頭或公告說明結束目前條文
+        if not stripped or '\t' in line or stripped.startswith(('公告', '發布', '(', '（', '【')):
+            current = None
+            continue
+        articles[current].append(stripped)
+    
+    return {name: '\n'.join(lines) for name, lines in articles.items()}
+
+
+def _section_refs(text):
+    """段落中引用的條文名稱"""
+    refs = set()
+    for match in _SECTION_REF_PATTERN.finditer(text):
+        for number in re.findall(r'\d+', match.group(2)):
+            refs.add(f'{match.group(1)}第{number}條')
+    return refs
+
+
+def parse_article_sources(law_text):
+    """
+    將整份法律文件分配到條文，作為條文雜湊的內容
+    
+    表格中的條文列與其後的公告、發布說明歸入該條文；【】段落與各章（至下一個標題為止）
+    歸入段落中引用的每個條文，沒有引用條文的段落歸入 GENERAL_SECTION。
+    
+    Returns:
+        {條文名稱: 內容}
+    """
+    sources = {}
+    section = []
+    owner = None
+    
+    def flush():
+        if section:
+            text = '\n'.join(section)
+            for name in _section_refs(text) or {GENERAL_SECTION}:
+                sources.setdefault(name, []).append(text)
+            section.clear()
+    
+    for line in law_text.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            # 表格中的條文與其公告之間沒有空行
+            owner = None
+            continue
+        match = _ARTICLE_ROW_PATTERN.match(line)
+        if match:
+            owner = match.group(1)
+            sources.setdefault(owner, []).append(stripped)
+            continue
+        if _SECTION_HEADING_PATTERN.match(stripped):
+            flush()
+            owner = None
+        elif owner and '\t' not in line:
+            sources[owner].append(stripped)
+            continue
+        owner = None
+        section.append(stripped)
+    flush()
+    
+    return {name: '\n'.join(lines) for name, lines in sources.items()}
+
+
+def normalize_article_ref(text):
+    """
+    將條文引用正規化為條文名稱（忽略項、款）
+    
+    Returns:
+        例如「醫療法第61條」；無法辨識時返回 None
+    """
+    match = ARTICLE_REF_PATTERN.search(text or '')
+    if not match:
+        return None
+    return f'{match.group(1)}第{match.group(2)}條'
+
+
+def document_version(law_text):
+    """法律文件版本（內容雜湊）"""
+    return hashlib.sha256(law_text.encode('utf-8')).hexdigest()[:12]
+
+
+def hash_articles(articles):
+    """
+    計算各條文內容的雜湊
+    
+    Returns:
+        {條文名稱: 雜湊}
+    """
+    return {
+        name: hashlib.sha1(' '.join(text.split()).encode('utf-8')).hexdigest()[:12]
+        for name, text in articles.items()
+    }
+
+
+class LawIndex:
+    """法規條文索引（首次使用時載入，之後常駐記憶體）"""
+    
+    def __init__(self):
+        self._state = None
+        self._lock = threading.Lock()
+    
+    def _load(self):
+        if self._state is None:
+            with self._lock:
+                if self._state is None:
+                    law_text = load_law_document()
+                    articles = parse_articles(law_text)
+                    hashes = hash_articles(parse_article_sources(law_text))
+                    self._state = (articles, document_version(law_text), hashes, law_text)
+        return self._state
+    
+    @property
+    def text(self):
+        """法律文件全文（與 version 對應的同一份內容）"""
+        return self._load()[3]
+    
+    @property
+    def articles(self):
+        """{條文名稱: 條文內容}"""
+        return self._load()[0]
+    
+    @property
+    def version(self):
+        """目前法律文件的版本"""
+        return self._load()[1]
+    
+    @property
+    def article_hashes(self):
+        """{條文名稱: 雜湊}（含條文相關的公告與說明，以及 GENERAL_SECTION）"""
+        return self._load()[2]
+    
+    def get(self, article_ref):
+        """依條文引用（可含項、款）取得條文內容，找不到時返回 None"""
+        name = normalize_article_ref(article_ref)
+        return self.articles.get(name) if name else None
+    
+    def reload(self):
+        """重新載入法律文件"""
+        with self._lock:
+            self._state = None
+
+
+# 建立全域索引實例
+law_index = LawIndex()
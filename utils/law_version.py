@@ -0,0 +1,90 @@
+"""
+法規版本工具函數
+
+每筆檢測記錄會標記評估時的法律文件版本、提示詞版本與引用的條文；
+法律文件更新時以條文為單位比對差異，只重新評估引用或相關條文有變動的記錄。
+"""
+from utils.law_index import law_index, ARTICLE_REF_PATTERN, normalize_article_ref
+
+# 記錄沒有引用任何條文（例如判斷為不違法）時，以這些核心條文判斷是否需要重新評估
+CORE_ARTICLES = ('醫療法第61條', '醫療法第84條', '醫療法第85條', '醫療法第86條', '醫療法第87條')
+
+
+def diff_articles(old_hashes, new_hashes):
+    """
+    以條文為單位比對兩個版本的法律文件
+    
+    Args:
+        old_hashes: 舊版本的 {條文名稱: 雜湊}
+        new_hashes: 新版本的 {條文名稱: 雜湊}
+        
+    Returns:
+        {'added': [...], 'removed': [...], 'changed': [...]}
+    """
+    return {
+        'added': sorted(name for name in new_hashes if name not in old_hashes),
+        'removed': sorted(name for name in old_hashes if name not in new_hashes),
+        'changed': sorted(name for name in new_hashes
+                          if name in old_hashes and old_hashes[name] != new_hashes[name])
+    }
+
+
+def changed_articles(diff):
+    """差異中所有有變動的條文名稱"""
+    return set(diff['added']) | set(diff['removed']) | set(diff['changed'])
+
+
+def extract_cited_articles(result_law):
+    """
+    從分析結果中取出引用的條文（忽略項、款）
+    
+    Returns:
+        條文名稱列表，依出現順序且不重複
+    """
+    cited = []
+    for match in ARTICLE_REF_PATTERN.finditer(result_law or ''):
+        name = normalize_article_ref(match.group(0))
+        if name not in cited:
+            cited.append(name)
+    return cited
+
+
+def classify_verdict(conclusion):
+    """
+    依分析結果第 1 點（結論）判斷檢測結果
+    
+    Returns:
+        'non_medical'、'violation' 或 'compliant'
+    """
+    if '非醫療' in conclusion:
+        return 'non_medical'
+    if '違法' in conclusion and '不違法' not in conclusion:
+        return 'violation'
+    return 'compliant'
+
+
+def relevant_articles(input_ad, cited_articles):
+    """
+    判斷記錄與哪些條文相關：引用的條文，加上本地規則在廣告中命中的條文；
+    兩者皆無時使用核心條文
+    """
+    from utils.lint_utils import lint_matcher
+    
+    relevant = set(cited_articles or [])
+    for match in lint_matcher.lint(input_ad or ''):
+        relevant.add(normalize_article_ref(match['article']))
+    return relevant or set(CORE_ARTICLES)
+
+
+def build_evaluation_stamp(result_law, prompt_version):
+    """
+    建立記錄的評估版本標記
+    
+    Returns:
+        {'law_version', 'prompt_version', 'cited_articles'}
+    """
+    return {
+        'law_version': law_index.version,
+        'prompt_version': prompt_version,
+        'cited_articles': extract_cited_articles(result_law)
+    }
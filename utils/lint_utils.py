@@ -0,0 +1,120 @@
+"""
+廣告即時檢查（本地規則比對）
+
+依法律文件整理的禁止用語與句型編譯為單一正規表示式，一次掃描即可找出所有命中位置，
+不需呼叫 Gemini，可在使用者輸入停頓時即時提示。
+"""
+import re
+from utils.law_index import law_index
+
+# 檢查規則：(規則代碼, 相關法條, 提示訊息, 用語／正規表示式列表)
+# 同一規則內較長的用語放前面，避免被較短的用語先行比對
+LINT_RULES = [
+    ('free', '醫療法第61條第1項', '提及免費、贈送等優惠字眼屬不正當招攬病人', [
+        r'免掛號費', r'免費\S{0,2}體驗', r'免費\S{0,2}贈送', r'免費', r'贈送', r'買\S{1,3}送\S{1,3}',
+        r'送(?:禮|禮物|禮品|好禮|贈品)', r'打卡送', r'評價送',
+    ]),
+    ('discount', '醫療法第61條第1項', '折扣、特價等促銷用語屬不正當招攬病人', [
+        r'[一二三四五六七八九\d](?:\.\d)?\s*折', r'第二人半價', r'半價', r'優惠價?', r'特價', r'特惠',
+        r'(?:體驗|小資|專案|推廣|限時|早鳥)價', r'折扣', r'折價', r'週年慶', r'壽星',
+    ]),
+    ('voucher', '醫療法第61條第1項', '禮券、團購、預付療程等方式屬不正當招攬病人', [
+        r'彩券', r'(?:健康)?禮券', r'兌換券', r'療程券', r'針劑券', r'消費券', r'團購', r'預付',
+    ]),
+    ('payment', '醫療法第61條第1項', '宣傳優惠付款方式屬不正當招攬病人', [
+        r'無息貸款', r'零利率', r'分期付款', r'\d+\s*期\s*0\s*利率', r'低自備款', r'術後再繳費', r'治療完成後再繳費',
+    ]),
+    ('limited', '醫療法第61條第1項', '限時限量等促銷手法屬不正當招攬病人', [
+        r'限時(?:優惠|特惠|搶購)?', r'限量', r'名額有限', r'倒數\s*\d*\s*天',
+    ]),
+    ('superlative', '醫療法第86條第7款', '無法證明為真實的最高級或誇張用語', [
+        r'全(?:國|台|臺)第一', r'國內首創', r'全球首創', r'唯一', r'最有效', r'最(?:好|佳|強|專業|安全)',
+        r'權威', r'教父', r'神話', r'神醫', r'名醫', r'第一品牌', r'像少女一樣',
+    ]),
+    ('guarantee', '醫療法第86條第7款', '保證療效或安全性的承諾屬誇大不實宣傳', [
+        r'保證(?:有效|療效|成功|效果)?', r'完全根治', r'永不復發', r'一勞永逸', r'100\s*%\s*(?:安全|有效|成功)?',
+        r'百分之百', r'無痛', r'無副作用', r'零風險', r'零副作用', r'立即見效', r'藥到病除',
+    ]),
+    ('before_after', '醫療法第85條', '術前術後對比須符合書面同意與風險揭露等要件', [
+        r'術前術後', r'(?:治療|手術|療程)?前後(?:對比|對照|比較)', r'before\s*/?\s*&?\s*after', r'B\s*/\s*A\s*照?',
+    ]),
+    ('endorsement', '醫療法第86條第1款', '假借他人名義（代言、見證）宣傳', [
+        r'代言', r'(?:明星|藝人|網紅|名人)(?:推薦|見證|指定)', r'見證', r'真心分享',
+    ]),
+    ('sensitive', '醫療法第86條第7款', '性功能、生殖器整形等敏感療程不得宣傳', [
+        r'性功能', r'性能力', r'壯陽', r'私密處(?:整形|緊實|雷射)?', r'陰道(?:整形|緊實)',
+    ]),
+]
+
+
+class LintMatcher:
+    """已編譯的規則比對器"""
+    
+    def __init__(self, rules):
+        self.rules = {}
+        alternatives = []
+        for index, (rule_id, article, message, patterns) in enumerate(rules):
+            group = f'r{index}'
+            self.rules[group] = (rule_id, article, message)
+            alternatives.append(f"(?P<{group}>{'|'.join(patterns)})")
+        self.pattern = re.compile('|'.join(alternatives), re.IGNORECASE)
+    
+    def lint(self, text):
+        """
+        檢查文字中的違規用語
+        
+        Args:
+            text: 廣告內容
+            
+        Returns:
+            命中列表 [{'start', 'end', 'text', 'rule', 'article', 'message'}]，
+            start / end 為 UTF-16 位移（與前端 JavaScript 字串索引一致）
+        """
+        if not text:
+            return []
+        
+        # 只有含 BMP 以外字元（如 emoji）時 Python 與 JavaScript 的索引才會不同
+        to_utf16 = _utf16_offsets(text) if any(ord(char) > 0xFFFF for char in text) else None
+        
+        matches = []
+        for match in self.pattern.finditer(text):
+            rule_id, article, message = self.rules[match.lastgroup]
+            start, end = match.span()
+            if to_utf16 is not None:
+                start, end = to_utf16[start], to_utf16[end]
+            matches.append({
+                'start': start,
+                'end': end,
+                'text': match.group(),
+                'rule': rule_id,
+                'article': article,
+                'message': message
+            })
+        return matches
+
+
+def _utf16_offsets(text):
+    """建立字元索引到 UTF-16 位移的對照表（長度為 len(text) + 1）"""
+    offsets = [0]
+    for char in text:
+        offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+    return offsets
+
+
+def lint_ad(text):
+    """
+    檢查廣告並附上相關條文內容
+    
+    Returns:
+        (命中列表, {條文名稱: 條文內容})
+    """
+    matches = lint_matcher.lint(text)
+    articles = {}
+    for match in matches:
+        if match['article'] not in articles:
+            articles[match['article']] = law_index.get(match['article']) or ''
+    return matches, articles
+
+
+# 建立全域比對器實例（模組載入時編譯一次）
+lint_matcher = LintMatcher(LINT_RULES)
@@ -0,0 +1,183 @@
+"""
+Gemini 模型池
+
+追蹤每個模型的健康狀態（近期延遲、錯誤率、配額狀態），
+並以斷路器在模型連續失敗時暫時停用，讓請求自動轉移到其他模型。
+"""
+import threading
+import time
+from collections import deque
+
+
+class ModelHealth:
+    """單一模型的健康狀態與斷路器"""
+    
+    CLOSED = 'closed'        # 正常
+    OPEN = 'open'            # 已跳脫，冷卻中不接受請求
+    HALF_OPEN = 'half_open'  # 冷卻結束，允許一個試探請求
+    
+    def __init__(self, name, model, window=50, failure_threshold=3, cooldown=30):
+        self.name = name
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.quota_until = 0.0
+        self.trial_in_progress = False
+        self.total_requests = 0
+        self.total_failures = 0
+    
+    def acquire(self, now=None):
+        """
+        判斷此模型目前是否可接受請求；半開狀態下只放行一個試探請求
+        
+        Returns:
+            是否可使用
+        """
+        now = now or time.monotonic()
+        with self._lock:
+            if now < self.quota_until:
+                return False
+            if self.state == self.OPEN:
+                if now < self.open_until:
+                    return False
+                self.state = self.HALF_OPEN
+                self.trial_in_progress = False
+            if self.state == self.HALF_OPEN:
+                if self.trial_in_progress:
+                    return False
+                self.trial_in_progress = True
+            return True
+    
+    def is_available(self, now=None):
+        """不改變狀態地判斷此模型是否可能接受請求"""
+        now = now or time.monotonic()
+        with self._lock:
+            if now < self.quota_until:
+                return False
+            if self.state == self.OPEN:
+                return now >= self.open_until
+            if self.state == self.HALF_OPEN:
+                return not self.trial_in_progress
+            return True
+    
+    def record_success(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._outcomes.append(True)
+            self.total_requests += 1
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self.trial_in_progress = False
+    
+    def record_failure(self, quota_delay=None):
+        """
+        記錄失敗；連續失敗達門檻或半開試探失敗時跳脫斷路器
+        
+        Args:
+            quota_delay: 配額錯誤時 API 建議的重試延遲（秒），期間不再使用此模型
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._outcomes.append(False)
+            self.total_requests += 1
+            self.total_failures += 1
+            self.consecutive_failures += 1
+            self.trial_in_progress = False
+            if quota_delay:
+                self.quota_until = max(self.quota_until, now + quota_delay)
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.open_until = now + self.cooldown
+    
+    def release_trial(self):
+        """試探請求未實際送出（例如被其他模型的結果取代）時釋放試探名額"""
+        with self._lock:
+            self.trial_in_progress = False
+    
+    def p95_latency(self, default=None):
+        """近期請求延遲的 p95（秒）；樣本不足時返回 default"""
+        with self._lock:
+            if len(self._latencies) < 5:
+                return default
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    
+    def mean_latency(self):
+        with self._lock:
+            if not self._latencies:
+                return None
+            return sum(self._latencies) / len(self._latencies)
+    
+    def error_rate(self):
+        with self._lock:
+            if not self._outcomes:
+                return 0.0
+            return self._outcomes.count(False) / len(self._outcomes)
+    
+    def snapshot(self):
+        """健康狀態摘要（供管理介面顯示）"""
+        now = time.monotonic()
+        mean = self.mean_latency()
+        p95 = self.p95_latency()
+        return {
+            'name': self.name,
+            'state': self.state,
+            'available': self.is_available(now),
+            'mean_latency_ms': round(mean * 1000) if mean is not None else None,
+            'p95_latency_ms': round(p95 * 1000) if p95 is not None else None,
+            'error_rate': round(self.error_rate(), 3),
+            'quota_limited_for': max(0, round(self.quota_until - now)),
+            'total_requests': self.total_requests,
+            'total_failures': self.total_failures
+        }
+
+
+class ModelPool:
+    """依健康狀態排序的模型池"""
+    
+    def __init__(self, entries):
+        """
+        Args:
+            entries: ModelHealth 列表，依偏好順序排列（第一個為首選模型）
+        """
+        if not entries:
+            raise ValueError('模型池不可為空')
+        self.entries = entries
+    
+    @property
+    def primary(self):
+        return self.entries[0]
+    
+    def ranked(self):
+        """
+        依健康狀態排序的可用模型
+        
+        錯誤率高的模型排在後面；錯誤率相近時優先使用設定順序較前的模型，
+        只有在延遲明顯較差（超過兩倍）時才調整順序，避免頻繁切換
+        """
+        now = time.monotonic()
+        available = [(index, entry) for index, entry in enumerate(self.entries)
+                     if entry.is_available(now)]
+        
+        def sort_key(item):
+            index, entry = item
+            mean = entry.mean_latency()
+            primary_mean = self.primary.mean_latency()
+            slow = mean is not None and primary_mean is not None and mean > primary_mean * 2
+            return (round(entry.error_rate(), 1), slow, index)
+        
+        return [entry for _, entry in sorted(available, key=sort_key)]
+    
+    def next_quota_reset(self):
+        """所有模型都受配額限制時，最早恢復的剩餘秒數"""
+        now = time.monotonic()
+        return max(0.0, min(entry.quota_until for entry in self.entries) - now)
+    
+    def snapshot(self):
+        return [entry.snapshot() for entry in self.entries]
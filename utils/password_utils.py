@@ -0,0 +1,147 @@
+"""
+密碼雜湊工具函數
+
+使用標準函式庫的 scrypt 產生密碼雜湊，格式為：
+    scrypt$<n>$<r>$<p>$<salt>$<hash>
+成本參數記錄在雜湊字串中，因此調整 Config 後，舊的雜湊仍可驗證，
+並可在登入時透明地重新雜湊。
+"""
+import base64
+import hashlib
+import hmac
+import os
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+HASH_PREFIX = 'scrypt'
+SALT_BYTES = 16
+HASH_BYTES = 64
+
+# 驗證密碼屬 CPU 密集工作（hashlib.scrypt 執行時會釋放 GIL），
+# 交由固定大小的執行緒池處理，避免登入尖峰佔滿所有請求執行緒
+_hash_executor = ThreadPoolExecutor(
+    max_workers=Config.PASSWORD_HASH_WORKERS,
+    thread_name_prefix='password-hash'
+)
+
+
+def _current_params():
+    """取得目前設定的 scrypt 成本參數 (n, r, p)"""
+    return Config.PASSWORD_SCRYPT_N, Config.PASSWORD_SCRYPT_R, Config.PASSWORD_SCRYPT_P
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def _b64decode(text):
+    return base64.b64decode(text.encode('ascii'))
+
+
+def _scrypt(password, salt, n, r, p):
+    # scrypt 約需 128 * r * n bytes 記憶體，預留兩倍空間避免超過 OpenSSL 預設上限
+    maxmem = 128 * r * (n + p + 2) * 2
+    return hashlib.scrypt(
+        password.encode('utf-8'),
+        salt=salt,
+        n=n,
+        r=r,
+        p=p,
+        maxmem=maxmem,
+        dklen=HASH_BYTES
+    )
+
+
+def hash_password(password, n=None, r=None, p=None):
+    """
+    產生密碼雜湊
+
+    Args:
+        password: 明文密碼
+        n, r, p: scrypt 成本參數，未指定時使用 Config 設定
+
+    Returns:
+        雜湊字串
+    """
+    default_n, default_r, default_p = _current_params()
+    n = n or default_n
+    r = r or default_r
+    p = p or default_p
+    salt = os.urandom(SALT_BYTES)
+    derived = _scrypt(password, salt, n, r, p)
+    return f"{HASH_PREFIX}${n}${r}${p}${_b64encode(salt)}${_b64encode(derived)}"
+
+
+def is_hashed(stored):
+    """判斷資料庫中的密碼欄位是否已為雜湊格式"""
+    return isinstance(stored, str) and stored.startswith(HASH_PREFIX + '$')
+
+
+def verify_password(password, stored):
+    """
+    驗證密碼
+
+    Args:
+        password: 使用者輸入的明文密碼
+        stored: 資料庫中的密碼欄位（雜湊字串或舊版明文）
+
+    Returns:
+        密碼是否正確
+    """
+    if not password or not stored:
+        return False
+    
+    if not is_hashed(stored):
+        # 舊版明文密碼（遷移前建立的帳號）
+        return hmac.compare_digest(password.encode('utf-8'), str(stored).encode('utf-8'))
+    
+    try:
+        _, n, r, p, salt, expected = stored.split('$')
+        derived = _scrypt(password, _b64decode(salt), int(n), int(r), int(p))
+        return hmac.compare_digest(derived, _b64decode(expected))
+    except (ValueError, TypeError):
+        return False
+
+
+def needs_rehash(stored):
+    """判斷雜湊是否需要以目前的成本參數重新產生（含舊版明文）"""
+    if not is_hashed(stored):
+        return True
+    try:
+        _, n, r, p, _, _ = stored.split('$')
+        return (int(n), int(r), int(p)) != _current_params()
+    except ValueError:
+        return True
+
+
+# 用於不存在的帳號，讓驗證耗時與真實帳號一致，避免以回應時間探測 email
+_DUMMY_HASH = None
+
+
+def dummy_verify(password):
+    """對不存在的帳號執行一次等成本的驗證（在呼叫端的執行緒中執行）"""
+    global _DUMMY_HASH
+    if _DUMMY_HASH is None or needs_rehash(_DUMMY_HASH):
+        _DUMMY_HASH = hash_password('dummy-password')
+    return verify_password(password or '', _DUMMY_HASH)
+
+
+def _check_password(password, stored):
+    if stored is None:
+        dummy_verify(password)
+        return False, None
+    if not verify_password(password, stored):
+        return False, None
+    return True, hash_password(password) if needs_rehash(stored) else None
+
+
+def check_password(password, stored):
+    """
+    登入時的密碼檢查：驗證、需要時重新雜湊，帳號不存在時（stored 為 None）執行等成本的驗證
+
+    所有 scrypt 運算合併為一個工作交給密碼雜湊執行緒池，限制同時進行的雜湊數量
+
+    Returns:
+        (密碼是否正確, 新的雜湊字串或 None)
+    """
+    return _hash_executor.submit(_check_password, password, stored).result()
@@ -0,0 +1,241 @@
+"""
+效能分析與記憶體診斷工具（管理員使用）
+
+- 取樣分析：以背景執行緒定期讀取 sys._current_frames()，累計各呼叫堆疊出現的次數，
+  輸出 flamegraph.pl / speedscope 可讀取的 collapsed stacks 格式（"a;b;c 次數"）
+- 記憶體診斷：以 tracemalloc 比較兩次快照之間各位置的記憶體增減
+
+未啟用時沒有任何取樣或追蹤，每個請求只多一次 header 查詢。
+所有數據只屬於處理該請求的 worker 行程（回應中附上 pid）。
+"""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from flask import request, g
+from utils.jwt_utils import JWTManager
+from config import Config
+
+# 管理員在請求帶上此 header 時分析該次請求，回應以 X-Profile-Id 指向分析結果
+PROFILE_HEADER = 'X-Profile'
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _frame_label(code):
+    """堆疊中的一層：專案內檔案用相對路徑，第三方套件從 site-packages 之後開始"""
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[-1]
+    else:
+        filename = os.path.basename(filename)
+    return f'{filename}:{code.co_name}'.replace(';', ',')
+
+
+def _collapse(frame):
+    """將堆疊轉為 collapsed 格式（由外而內以分號分隔）"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ';'.join(labels)
+
+
+class SamplingProfiler:
+    """取樣分析器（指定 thread_ids 時只取樣這些執行緒，否則取樣所有執行緒）"""
+
+    def __init__(self, thread_ids=None, interval=None, label=''):
+        self.thread_ids = set(thread_ids) if thread_ids else None
+        self.interval = interval or Config.PROFILE_SAMPLE_INTERVAL
+        self.label = label
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.time() - self.started_at
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.thread_ids is not None and thread_id not in self.thread_ids:
+                    continue
+                self.stacks[_collapse(frame)] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """collapsed stacks 文字（次數多的在前）"""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def summary(self):
+        return {
+            'label': self.label,
+            'started_at': self.started_at,
+            'duration_ms': round(self.duration * 1000, 1),
+            'samples': self.samples,
+            'stacks': len(self.stacks)
+        }
+
+
+class ProfileStore:
+    """保留最近的分析結果（每個 worker 行程各自保存）"""
+
+    def __init__(self, max_size):
+        self._lock = threading.Lock()
+        self._profiles = OrderedDict()
+        self._max_size = max_size
+        self._next_id = 0
+
+    def add(self, profiler):
+        with self._lock:
+            self._next_id += 1
+            profile_id = f'{os.getpid()}-{self._next_id}'
+            self._profiles[profile_id] = profiler
+            while len(self._profiles) > self._max_size:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def summaries(self):
+        with self._lock:
+            return [dict(profiler.summary(), id=profile_id)
+                    for profile_id, profiler in reversed(self._profiles.items())]
+
+
+class MemoryTracker:
+    """tracemalloc 快照比較（每次比較後以新快照作為下一次的基準）"""
+
+    # 排除 tracemalloc 本身與匯入機制的配置
+    _FILTERS = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>')
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._baseline = None
+
+    def is_tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=1):
+        """開始追蹤並建立基準快照（已在追蹤時只重設基準）"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(frames)
+            self._baseline = self._snapshot()
+
+    def stop(self):
+        with self._lock:
+            self._baseline = None
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    def diff(self, key_type='lineno', limit=30):
+        """
+        與基準快照比較
+
+        Args:
+            key_type: 分組方式（lineno / filename / traceback）
+            limit: 回傳的項目數（依增加量排序）
+
+        Returns:
+            dict 或 None（未在追蹤）
+        """
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                return None
+            snapshot = self._snapshot()
+            baseline = self._baseline or snapshot
+            stats = snapshot.compare_to(baseline, key_type)
+            self._baseline = snapshot
+
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'total_diff_bytes': sum(stat.size_diff for stat in stats),
+            'top': [{
+                'location': [f'{frame.filename}:{frame.lineno}' for frame in stat.traceback],
+                'size_diff': stat.size_diff,
+                'size': stat.size,
+                'count_diff': stat.count_diff,
+                'count': stat.count
+            } for stat in stats[:limit]]
+        }
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(self._FILTERS)
+
+
+profile_store = ProfileStore(Config.PROFILE_KEEP)
+memory_tracker = MemoryTracker()
+
+# 時間區間取樣同時只進行一個，避免多個取樣執行緒互相干擾
+window_lock = threading.Lock()
+
+
+def profile_window(seconds, interval=None):
+    """取樣所有執行緒 seconds 秒（呼叫端持有 window_lock）"""
+    profiler = SamplingProfiler(interval=interval, label=f'window {seconds}s').start()
+    try:
+        time.sleep(seconds)
+    finally:
+        profiler.stop()
+    return profiler
+
+
+def _start_request_profile():
+    if PROFILE_HEADER not in request.headers:
+        return
+
+    token = JWTManager.get_token_from_request()
+    payload = JWTManager.verify_token(token) if token else None
+    if not payload or payload.get('user_type') != 'admin':
+        return
+
+    g._request_profiler = SamplingProfiler(
+        thread_ids=[threading.get_ident()],
+        label=f'{request.method} {request.path}'
+    ).start()
+
+
+def _finish_request_profile(response):
+    profiler = g.pop('_request_profiler', None)
+    if profiler is not None:
+        # 串流回應只包含產生回應物件前的時間
+        profiler.stop()
+        response.headers['X-Profile-Id'] = profile_store.add(profiler)
+    return response
+
+
+def init_profiler(app):
+    """註冊單次請求分析的 hook（請求帶 X-Profile header 且為管理員時才取樣）"""
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
@@ -0,0 +1,291 @@
+"""
+速率限制工具
+"""
+import heapq
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    令牌桶速率限制器（執行緒安全）
+    
+    以固定速率補充令牌，最多累積 capacity 個；每次請求消耗一個令牌，
+    令牌不足時等待補充，可平滑背景工作對 Gemini 配額的消耗。
+    """
+    
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: 每秒補充的令牌數
+            capacity: 令牌上限（允許的瞬間突發量），預設為 max(1, rate)
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+    
+    def try_acquire(self, tokens=1):
+        """
+        嘗試取得令牌（不等待）
+        
+        Returns:
+            0 表示已取得；否則為需要等待的秒數
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+    
+    def acquire(self, tokens=1):
+        """
+        取得令牌，不足時等待
+        
+        Returns:
+            實際等待的秒數
+        """
+        waited = 0
+        while True:
+            delay = self.try_acquire(tokens)
+            if delay == 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimitExceeded(Exception):
+    """請求超過速率限制或排隊上限"""
+    
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        # 建議用戶端等待的秒數（Retry-After）
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """佇列中等待執行的一個工作"""
+    
+    def __init__(self, key, start_tag, finish_tag):
+        self.key = key
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.granted = False
+        self.event = threading.Event()
+
+
+class FairQueue:
+    """
+    加權公平佇列（執行緒安全）
+    
+    限制同時執行的工作數；名額用完時工作依鍵（用戶）排隊，空出的名額交給虛擬完成時間最小的工作。
+    每個鍵的工作依序取得遞增的虛擬時間（1 / weight），持續送出大量請求的用戶只會排在自己的工作之後，
+    不會阻擋其他用戶；權重較高的鍵取得成比例較多的名額。
+    """
+    
+    def __init__(self, concurrency, max_queued_per_key, max_wait, service_time, idle_ttl=300):
+        """
+        Args:
+            concurrency: 同時執行的工作數
+            max_queued_per_key: 每個鍵最多排隊的工作數，超過時拒絕
+            max_wait: 預估或實際等待超過此秒數時拒絕
+            service_time: 每個工作執行時間的初始估計值（秒），之後以實際執行時間的移動平均更新
+            idle_ttl: 沒有執行或排隊中工作的鍵，其計數保留的秒數
+        """
+        self.concurrency = concurrency
+        self.max_queued_per_key = max_queued_per_key
+        self.max_wait = max_wait
+        self._service_time = service_time
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = 0
+        self._running = 0
+        self._virtual_time = 0.0
+        self._last_finish = {}
+        self._counters = {}
+        self._last_sweep = time.monotonic()
+    
+    def _counter(self, key):
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = {
+                'running': 0, 'queued': 0, 'completed': 0, 'rejected': 0, 'wait_seconds': 0.0
+            }
+        counter['last_active'] = time.monotonic()
+        return counter
+    
+    def _sweep(self):
+        """移除閒置超過 idle_ttl 的鍵（每個 idle_ttl 最多執行一次，呼叫端持有鎖）"""
+        now = time.monotonic()
+        if now - self._last_sweep < self.idle_ttl:
+            return
+        self._last_sweep = now
+        for key in list(self._counters):
+            counter = self._counters[key]
+            if not counter['running'] and not counter['queued'] and now - counter['last_active'] >= self.idle_ttl:
+                del self._counters[key]
+        # 虛擬完成時間不晚於目前虛擬時間的鍵，下一個工作會從目前虛擬時間開始，不需保留
+        for key in list(self._last_finish):
+            if self._last_finish[key] <= self._virtual_time:
+                del self._last_finish[key]
+    
+    def _tags(self, key, weight):
+        """此鍵下一個工作的虛擬開始與完成時間"""
+        start_tag = max(self._virtual_time, self._last_finish.get(key, 0.0))
+        return start_tag, start_tag + 1.0 / weight
+    
+    def _estimate_wait(self, finish_tag):
+        """預估虛擬完成時間為 finish_tag 的工作要等多久才能開始執行"""
+        ahead = sum(1 for _, _, waiter in self._heap if waiter.finish_tag <= finish_tag)
+        return (ahead // self.concurrency + 1) * self._service_time
+    
+    def _reject(self, key, message, retry_after):
+        self._counter(key)['rejected'] += 1
+        return RateLimitExceeded(message, retry_after)
+    
+    def _enqueue(self, key, weight):
+        """建立等待中的工作（呼叫端持有鎖）"""
+        counter = self._counter(key)
+        start_tag, finish_tag = self._tags(key, weight)
+        if counter['queued'] >= self.max_queued_per_key:
+            # 等到此鍵最早排隊的工作開始執行，才會空出排隊名額
+            earliest = min((waiter.finish_tag for _, _, waiter in self._heap if waiter.key == key),
+                           default=finish_tag)
+            raise self._reject(key, '排隊中的檢測過多', self._estimate_wait(earliest))
+        
+        estimated = self._estimate_wait(finish_tag)
+        if estimated > self.max_wait:
+            raise self._reject(key, '檢測佇列已滿', estimated - self.max_wait)
+        
+        waiter = _Waiter(key, start_tag, finish_tag)
+        self._last_finish[key] = finish_tag
+        self._seq += 1
+        heapq.heappush(self._heap, (finish_tag, self._seq, waiter))
+        counter['queued'] += 1
+        return waiter
+    
+    def _dispatch(self):
+        """將空出的名額交給虛擬完成時間最小的工作（呼叫端持有鎖）"""
+        while self._running < self.concurrency and self._heap:
+            _, _, waiter = heapq.heappop(self._heap)
+            counter = self._counter(waiter.key)
+            counter['queued'] -= 1
+            counter['running'] += 1
+            self._virtual_time = max(self._virtual_time, waiter.start_tag)
+            self._running += 1
+            waiter.granted = True
+            waiter.event.set()
+        if not self._heap and not self._running:
+            # 佇列清空後重設虛擬時間
+            self._virtual_time = 0.0
+            self._last_finish.clear()
+    
+    def _grant(self, key, weight):
+        """不經排隊直接取得名額（呼叫端持有鎖）"""
+        # 不需排隊的工作也推進此鍵的虛擬時間，之後排隊時才會排在其他鍵之後
+        self._last_finish[key] = self._tags(key, weight)[1]
+        self._running += 1
+        self._counter(key)['running'] += 1
+    
+    def try_acquire(self, key, weight=1):
+        """
+        有空閒名額且沒有排隊中的工作時取得名額（不等待）
+        
+        Returns:
+            是否已取得；取得後以 release(key, completed=False) 釋放
+        """
+        with self._lock:
+            if self._running < self.concurrency and not self._heap:
+                self._grant(key, weight)
+                return True
+            return False
+    
+    def waiting(self):
+        """排隊中的工作數"""
+        with self._lock:
+            return len(self._heap)
+    
+    def acquire(self, key, weight=1):
+        """
+        取得執行名額，名額用完時排隊等待
+        
+        Returns:
+            實際等待的秒數
+        
+        Raises:
+            RateLimitExceeded: 此鍵排隊的工作過多，或預估／實際等待超過 max_wait
+        """
+        with self._lock:
+            if self._running < self.concurrency and not self._heap:
+                self._grant(key, weight)
+                return 0
+            waiter = self._enqueue(key, weight)
+        
+        started = time.monotonic()
+        waiter.event.wait(self.max_wait)
+        waited = time.monotonic() - started
+        with self._lock:
+            counter = self._counter(key)
+            if not waiter.granted:
+                self._heap = [item for item in self._heap if item[2] is not waiter]
+                heapq.heapify(self._heap)
+                counter['queued'] -= 1
+                raise self._reject(key, '檢測等待逾時', self._service_time)
+            counter['wait_seconds'] += waited
+        return waited
+    
+    def release(self, key, duration=None, completed=True):
+        """
+        釋放執行名額
+        
+        Args:
+            duration: 此工作的執行時間（秒），用於更新預估等待時間
+            completed: 是否計入完成數（try_acquire 額外取得的名額為 False）
+        """
+        with self._lock:
+            counter = self._counter(key)
+            counter['running'] -= 1
+            if completed:
+                counter['completed'] += 1
+            if duration is not None:
+                self._service_time = self._service_time * 0.8 + duration * 0.2
+            self._running -= 1
+            self._dispatch()
+            self._sweep()
+    
+    def run(self, key, fn, weight=1):
+        """在取得名額後執行 fn 並返回其結果"""
+        self.acquire(key, weight)
+        started = time.monotonic()
+        try:
+            return fn()
+        finally:
+            self.release(key, time.monotonic() - started)
+    
+    def snapshot(self):
+        """佇列狀態與各鍵的計數"""
+        with self._lock:
+            return {
+                'running': self._running,
+                'queued': len(self._heap),
+                'concurrency': self.concurrency,
+                'service_time_seconds': round(self._service_time, 2),
+                'keys': {
+                    key: {
+                        'running': counter['running'],
+                        'queued': counter['queued'],
+                        'completed': counter['completed'],
+                        'rejected': counter['rejected'],
+                        'wait_seconds': round(counter['wait_seconds'], 2)
+                    }
+                    for key, counter in self._counters.items()
+                }
+            }
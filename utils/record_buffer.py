@@ -0,0 +1,283 @@
+"""
+檢測記錄的延遲寫入緩衝（write-behind）
+
+啟用 RECORD_WRITE_BEHIND 時，檢測結果算出後先放入緩衝區並立即回應用戶端，
+背景執行緒在累積 RECORD_BUFFER_MAX_BATCH 筆或經過 RECORD_BUFFER_FLUSH_SECONDS 秒後
+以 insert_many(ordered=False) 批次寫入；寫入成功後才建立搜尋索引、遞增快取版本並推播。
+
+MongoDB 無法寫入時，批次以 JSONL 附加到 RECORD_SPOOL_DIR 下的檔案並 fsync，
+之後定期（以及行程重新啟動後）重新寫入。記錄 _id 在加入緩衝區時即產生，重送不會產生重複記錄。
+_id 已返回給用戶端，因此記錄不會因 Idempotency-Key 重複而被捨棄（移除重複的鍵後寫入）。
+"""
+import atexit
+import glob
+import os
+import threading
+import time
+from bson import json_util
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from database import db
+from config import Config
+
+# 重複鍵錯誤（記錄已寫入，或相同 Idempotency-Key 已有記錄）
+_DUPLICATE_KEY = 11000
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _spool_owner(path):
+    """暫存檔所屬的行程 ID（records-<pid>.jsonl 或重新寫入中的 .replaying-<pid>）"""
+    name = os.path.basename(path)
+    try:
+        if '.replaying-' in name:
+            return int(name.rsplit('-', 1)[1])
+        return int(name[len('records-'):-len('.jsonl')])
+    except ValueError:
+        return None
+
+
+class RecordWriteBuffer:
+    """
+    批次寫入緩衝區
+
+    每個項目為 {'doc': 要寫入的文件, ...寫入後處理需要的欄位}；
+    after_insert(entries) 在文件寫入成功後呼叫（在背景執行緒中執行）
+    """
+
+    def __init__(self, collection_name, after_insert):
+        self.collection_name = collection_name
+        self.after_insert = after_insert
+        self._pending = []
+        self._inflight = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._closed = False
+        self._last_replay = 0.0
+        self._atexit_registered = False
+        self._stats = {'buffered': 0, 'written': 0, 'duplicates': 0, 'discarded': 0, 'spooled': 0, 'replayed': 0}
+
+    @property
+    def enabled(self):
+        return Config.RECORD_WRITE_BEHIND
+
+    def start(self):
+        """啟動背景寫入執行緒（fork 後的 worker 需各自啟動）"""
+        with self._condition:
+            self._closed = False
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='record-write-behind', daemon=True)
+                self._thread.start()
+            if not self._atexit_registered:
+                # 開發伺服器結束時也寫入剩餘的記錄
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def add(self, entry):
+        """加入一筆待寫入的記錄"""
+        self.start()
+        with self._condition:
+            self._pending.append(entry)
+            self._stats['buffered'] += 1
+            if len(self._pending) >= Config.RECORD_BUFFER_MAX_BATCH:
+                self._condition.notify()
+
+    def find_pending(self, predicate):
+        """在尚未寫入的記錄中查找第一筆符合 predicate(doc) 的文件"""
+        with self._condition:
+            for entry in self._inflight + self._pending:
+                if predicate(entry['doc']):
+                    return entry['doc']
+        return None
+
+    def discard(self, predicate):
+        """
+        移除尚未送出、符合 predicate(doc) 的記錄（例如所屬專案已刪除）
+
+        已送出或在暫存檔中的記錄無法移除，由 after_insert 在寫入後處理
+
+        Returns:
+            移除的筆數
+        """
+        with self._condition:
+            kept = [entry for entry in self._pending if not predicate(entry['doc'])]
+            discarded = len(self._pending) - len(kept)
+            self._pending = kept
+            self._stats['discarded'] += discarded
+        return discarded
+
+    def add_idempotency_key(self, record_id, idempotency_key):
+        """
+        為尚未寫入的記錄加入 Idempotency-Key
+
+        Returns:
+            記錄是否還在緩衝區中（否則需直接更新資料庫）
+        """
+        with self._condition:
+            for entry in self._pending:
+                if entry['doc']['_id'] == record_id:
+                    keys = entry['doc'].setdefault('idempotency_keys', [])
+                    if idempotency_key not in keys:
+                        keys.append(idempotency_key)
+                    return True
+            for entry in self._inflight:
+                if entry['doc']['_id'] == record_id:
+                    # 批次已送出，寫入完成後再補上
+                    entry.setdefault('extra_idempotency_keys', []).append(idempotency_key)
+                    return True
+        return False
+
+    def flush(self):
+        """立即寫入目前緩衝區中的所有記錄"""
+        with self._condition:
+            batch, self._pending = self._pending, []
+            self._inflight = batch
+        try:
+            if batch:
+                self._write(batch)
+        finally:
+            with self._condition:
+                self._inflight = []
+
+    def close(self):
+        """停止背景執行緒並寫入剩餘的記錄（行程結束前呼叫）"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=30)
+        self.flush()
+
+    def stats(self):
+        with self._condition:
+            return dict(self._stats, pending=len(self._pending) + len(self._inflight),
+                        spool_files=len(self._spool_files()))
+
+    def _run(self):
+        self.replay_spool()
+        while True:
+            with self._condition:
+                if not self._closed and len(self._pending) < Config.RECORD_BUFFER_MAX_BATCH:
+                    self._condition.wait(Config.RECORD_BUFFER_FLUSH_SECONDS)
+                closed = self._closed
+            try:
+                self.flush()
+                if time.monotonic() - self._last_replay >= Config.RECORD_SPOOL_RETRY_SECONDS:
+                    self.replay_spool()
+            except Exception as e:
+                print(f"延遲寫入記錄時發生錯誤: {e}")
+            if closed:
+                return
+
+    def _write(self, batch):
+        """批次寫入；_id 重複視為已寫入，Idempotency-Key 重複時移除該鍵後寫入，其他失敗寫入暫存檔"""
+        collection = db.get_collection(self.collection_name)
+        failed = set()
+        try:
+            collection.insert_many([entry['doc'] for entry in batch], ordered=False)
+        except BulkWriteError as e:
+            retry = []
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') == _DUPLICATE_KEY and 'index: _id_' in error.get('errmsg', ''):
+                    # 先前的寫入已成功（例如連線中斷前已寫入後又進入暫存檔），仍需完成寫入後處理
+                    continue
+                if error.get('code') == _DUPLICATE_KEY:
+                    if not self._write_without_keys(collection, batch[error['index']]):
+                        failed.add(error['index'])
+                    continue
+                failed.add(error['index'])
+                retry.append(batch[error['index']])
+            if retry:
+                print(f"延遲寫入失敗 {len(retry)} 筆，寫入暫存檔: {e.details['writeErrors'][0].get('errmsg')}")
+                self._spool(retry)
+        except PyMongoError as e:
+            print(f"MongoDB 無法寫入，{len(batch)} 筆記錄寫入暫存檔: {e}")
+            self._spool(batch)
+            return
+
+        written = [entry for index, entry in enumerate(batch) if index not in failed]
+        self._stats['written'] += len(written)
+        for entry in written:
+            for key in entry.pop('extra_idempotency_keys', []):
+                try:
+                    collection.update_one({'_id': entry['doc']['_id']}, {'$addToSet': {'idempotency_keys': key}})
+                except DuplicateKeyError:
+                    print(f"Idempotency-Key {key} 已屬於其他記錄，未加入記錄 {entry['doc']['_id']}")
+        if written:
+            self.after_insert(written)
+
+    def _write_without_keys(self, collection, entry):
+        """
+        Idempotency-Key 已屬於其他行程寫入的記錄時，移除此記錄的鍵後寫入
+        （記錄 _id 已返回給用戶端，不能捨棄）
+
+        Returns:
+            是否已寫入
+        """
+        doc = entry['doc']
+        keys = doc.pop('idempotency_keys', None)
+        if not keys:
+            print(f"延遲寫入的記錄 {doc['_id']} 發生重複鍵錯誤，已捨棄")
+            return False
+        print(f"記錄 {doc['_id']} 的 Idempotency-Key {keys} 已屬於其他記錄，移除後寫入")
+        self._stats['duplicates'] += 1
+        try:
+            collection.insert_one(doc)
+        except DuplicateKeyError:
+            # 同一筆記錄先前已寫入
+            pass
+        except PyMongoError as e:
+            print(f"MongoDB 無法寫入，記錄 {doc['_id']} 寫入暫存檔: {e}")
+            self._spool([entry])
+            return False
+        return True
+
+    def _spool_files(self):
+        return glob.glob(os.path.join(Config.RECORD_SPOOL_DIR, 'records-*.jsonl*'))
+
+    def _spool(self, entries):
+        """以 JSONL 附加到此行程的暫存檔並 fsync"""
+        os.makedirs(Config.RECORD_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(Config.RECORD_SPOOL_DIR, f'records-{os.getpid()}.jsonl')
+        with open(path, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json_util.dumps(entry, json_options=json_util.CANONICAL_JSON_OPTIONS) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._stats['spooled'] += len(entries)
+
+    def replay_spool(self):
+        """
+        重新寫入暫存檔中的記錄
+
+        只處理此行程或已結束的行程的暫存檔（其他 worker 可能正在附加），
+        以改名取得檔案，多個 worker 不會重複處理同一個檔案
+        """
+        self._last_replay = time.monotonic()
+        for path in self._spool_files():
+            owner = _spool_owner(path)
+            if owner is None or (owner != os.getpid() and _pid_alive(owner)):
+                continue
+            base = path.split('.replaying-', 1)[0]
+            claimed = f'{base}.replaying-{os.getpid()}'
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue
+
+            with open(claimed, 'r', encoding='utf-8') as f:
+                entries = [json_util.loads(line) for line in f if line.strip()]
+            if entries:
+                print(f"重新寫入暫存檔中的 {len(entries)} 筆記錄: {path}")
+                # 仍無法寫入的記錄會附加到此行程的暫存檔，下次再試
+                for start in range(0, len(entries), Config.RECORD_BUFFER_MAX_BATCH):
+                    self._write(entries[start:start + Config.RECORD_BUFFER_MAX_BATCH])
+                self._stats['replayed'] += len(entries)
+            os.remove(claimed)
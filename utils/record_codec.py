@@ -0,0 +1,89 @@
+"""
+專案記錄儲存格式編碼工具
+
+資料庫中的記錄以精簡格式儲存：
+- result_law 儲存為條列項目 result_law_items（[[類型代碼, 內容], ...]），讀取時再轉為 HTML
+- 超過門檻的長文字欄位以 zlib 壓縮後存於 <欄位>_z
+- storage_version 標記記錄已以目前的格式處理（純文字結果與短欄位維持原樣，但不需再次遷移）
+舊格式的記錄（result_law 為 HTML 字串、未壓縮欄位）仍可正常讀取。
+"""
+import zlib
+from bson import Binary
+from config import Config
+from utils.text_utils import parse_list_html, render_list_items_html
+
+COMPRESSED_SUFFIX = '_z'
+COMPRESSIBLE_FIELDS = ('input_ad', 'result_advice')
+# 儲存格式變更時遞增，遷移工具只處理版本不同的記錄
+STORAGE_VERSION = 1
+
+
+def _encode_text(doc, field, value):
+    """長文字壓縮後儲存，短文字保持原樣（壓縮效益不足以抵銷讀取成本）"""
+    if value and len(value.encode('utf-8')) >= Config.RECORD_COMPRESS_MIN_BYTES:
+        compressed = zlib.compress(value.encode('utf-8'), Config.RECORD_COMPRESS_LEVEL)
+        if len(compressed) < len(value.encode('utf-8')):
+            doc[field + COMPRESSED_SUFFIX] = Binary(compressed)
+            return
+    doc[field] = value
+
+
+def _decode_text(doc, field):
+    compressed = doc.get(field + COMPRESSED_SUFFIX)
+    if compressed is not None:
+        return zlib.decompress(bytes(compressed)).decode('utf-8')
+    return doc.get(field, '')
+
+
+def encode_result_law(result_law):
+    """
+    將法律分析結果轉為結構化條列項目
+    
+    Args:
+        result_law: format_as_list_html 產生的 HTML，或其他文字
+        
+    Returns:
+        條列項目；不是可完整還原的 format_as_list_html 輸出（例如純文字或其他 HTML）時返回 None，
+        由呼叫端原樣儲存，讀取時內容不變
+    """
+    if not result_law:
+        return []
+    return parse_list_html(result_law)
+
+
+def encode_record_fields(input_ad, result_law, result_advice):
+    """
+    將記錄內容編碼為資料庫儲存格式
+    
+    Returns:
+        可直接合併到記錄文件的欄位字典
+    """
+    doc = {'storage_version': STORAGE_VERSION}
+    _encode_text(doc, 'input_ad', input_ad)
+    items = encode_result_law(result_law)
+    if items is None:
+        doc['result_law'] = result_law
+    else:
+        doc['result_law_items'] = items
+    _encode_text(doc, 'result_advice', result_advice)
+    return doc
+
+
+def decode_record(doc):
+    """
+    將資料庫中的記錄還原為 API / 前端使用的格式
+    
+    Returns:
+        含 input_ad、result_law（HTML）、result_advice 的記錄字典
+    """
+    record = {
+        key: value for key, value in doc.items()
+        if key != 'result_law_items' and not key.endswith(COMPRESSED_SUFFIX)
+    }
+    for field in COMPRESSIBLE_FIELDS:
+        record[field] = _decode_text(doc, field)
+    if 'result_law_items' in doc:
+        record['result_law'] = render_list_items_html(doc['result_law_items'])
+    else:
+        record['result_law'] = doc.get('result_law', '')
+    return record
@@ -0,0 +1,66 @@
+"""
+搜尋工具函數
+
+MongoDB 的 text index 不會切分中文詞，因此檢測記錄以字元二元組（bigram）建立倒排索引：
+連續的中日韓文字切為相鄰兩字一組，英文與數字以整個詞為單位，皆轉為小寫並做全半形正規化。
+查詢字串以相同方式切分，記錄需包含所有查詢詞才會命中。
+"""
+import re
+import unicodedata
+
+# 中日韓文字（含擴充 A 與相容字）或英數字的連續片段
+_TOKEN_PATTERN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+
+# 單次查詢最多使用的查詢詞數（過長的查詢只取前段）
+MAX_QUERY_TERMS = 32
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFKC', text or '').lower()
+
+
+def tokenize(text):
+    """
+    將文字切分為索引詞
+    
+    Returns:
+        索引詞列表（依出現順序，可能重複）；單獨出現的一個中文字不會產生索引詞
+    """
+    terms = []
+    for run in _TOKEN_PATTERN.findall(_normalize(text)):
+        if run.isascii():
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def unique_terms(text):
+    """不重複的索引詞（保留第一次出現的順序）"""
+    return list(dict.fromkeys(tokenize(text)))
+
+
+def query_terms(query):
+    """將查詢字串切分為查詢詞（最多 MAX_QUERY_TERMS 個）"""
+    return unique_terms(query)[:MAX_QUERY_TERMS]
+
+
+def build_snippet(text, query, terms, width=40):
+    """
+    擷取包含查詢內容的片段
+    
+    優先尋找完整的查詢字串，找不到時以第一個出現的查詢詞為中心
+    
+    Returns:
+        片段文字；找不到任何查詢詞時返回開頭的文字
+    """
+    normalized = _normalize(text)
+    position = normalized.find(_normalize(query).strip()) if query else -1
+    if position < 0:
+        positions = [normalized.find(term) for term in terms]
+        positions = [p for p in positions if p >= 0]
+        position = min(positions) if positions else 0
+    start = max(0, position - width // 2)
+    end = min(len(text), start + width * 2)
+    snippet = text[start:end].replace('\n', ' ')
+    return ('…' if start > 0 else '') + snippet + ('…' if end < len(text) else '')
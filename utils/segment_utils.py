@@ -0,0 +1,89 @@
+"""
+廣告分句工具函數
+"""
+import hashlib
+import re
+from utils.text_utils import normalize_ad_text
+
+# 句子結尾符號（連續的結尾符號與換行歸入同一句）
+_SEGMENT_PATTERN = re.compile(r'[^。！？!?；;\n]+[。！？!?；;\n]*|[。！？!?；;\n]+')
+
+
+def split_segments(text):
+    """
+    將廣告拆分為句子／子句
+    
+    Args:
+        text: 廣告內容
+        
+    Returns:
+        句子列表（保留結尾標點與換行，全部串接後等於原文）
+    """
+    if not text:
+        return []
+    return _SEGMENT_PATTERN.findall(text)
+
+
+def is_blank_segment(segment):
+    """判斷句子是否只有標點或空白（不需要分析）"""
+    return not re.sub(r'[\s。！？!?；;，,、]', '', segment)
+
+
+def segment_key(segment, version=''):
+    """
+    計算句子的快取鍵值（正規化後雜湊，空白與全半形差異不影響）
+    
+    Args:
+        segment: 句子
+        version: 提示詞／法規版本，版本不同時快取不共用
+    """
+    normalized = normalize_ad_text(segment)
+    return hashlib.sha1(f'{version}:{normalized}'.encode('utf-8')).hexdigest()
+
+
+def split_paragraphs(text):
+    """
+    將長篇內容拆分為段落（以換行分段）
+    
+    Returns:
+        段落列表（保留結尾換行，全部串接後等於原文）
+    """
+    if not text:
+        return []
+    return re.findall(r'[^\n]*\n+|[^\n]+$', text)
+
+
+def split_chunks(text, max_chars):
+    """
+    依段落邊界將長篇內容切分為區塊，每個區塊不超過 max_chars 字元；
+    單一段落超過上限時才在句子邊界切開
+    
+    Args:
+        text: 長篇內容
+        max_chars: 每個區塊的字元上限
+        
+    Returns:
+        區塊列表，每個區塊為 [(段落編號, 句子), ...]（段落編號從 1 開始，不計空白段落）
+    """
+    chunks = []
+    current = []
+    size = 0
+    paragraph_no = 0
+    
+    for paragraph in split_paragraphs(text):
+        if not is_blank_segment(paragraph):
+            paragraph_no += 1
+        # 加入整個段落會超過上限時，先結束目前區塊
+        if current and size + len(paragraph) > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        for segment in split_segments(paragraph):
+            if current and size + len(segment) > max_chars:
+                chunks.append(current)
+                current, size = [], 0
+            current.append((paragraph_no, segment))
+            size += len(segment)
+    
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,71 @@
+"""
+Single-flight 請求合併工具
+
+相同鍵值的並行呼叫只會實際執行一次，其餘呼叫等待並共用同一個結果。
+"""
+import threading
+
+
+class _Call:
+    """一次進行中的呼叫"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """合併相同鍵值的並行呼叫"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key, fn):
+        """
+        執行 fn，若已有相同鍵值的呼叫進行中則等待其結果
+        
+        Args:
+            key: 可雜湊的鍵值
+            fn: 無參數的函數
+            
+        Returns:
+            (result, shared)：shared 為 True 表示結果來自其他請求的呼叫
+            
+        Raises:
+            fn 拋出的例外（所有等待中的呼叫都會收到同一個例外）
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                leader = True
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        
+        return call.result, False
+    
+    def in_flight(self):
+        """目前進行中的呼叫數量"""
+        with self._lock:
+            return len(self._calls)
@@ -1,7 +1,27 @@
 """
 文字處理工具函數
 """
+import html
 import re
+import unicodedata
+
+_HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def normalize_ad_text(text):
+    """
+    正規化廣告內容（用於判斷兩次送出的內容是否相同）
+    
+    Args:
+        text: 廣告內容
+        
+    Returns:
+        全半形統一（NFKC）並合併空白後的文字
+    """
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip()
 
 
 def clean_markdown(text):
@@ -41,38 +61,113 @@ def clean_markdown(text):
     return text.strip()
 
 
-def format_as_list_html(text):
+# 條列項目類型代碼與對應的 HTML class（記錄以結構化方式儲存，讀取時再轉為 HTML）
+LIST_ITEM_CLASSES = {
+    'n': 'list-item-numbered',
+    'b': 'list-item-bullet',
+    'i': 'list-item-indented',
+    'p': 'list-item',
+}
+_LIST_ITEM_KINDS = {css_class: kind for kind, css_class in LIST_ITEM_CLASSES.items()}
+_LIST_ITEM_HTML_PATTERN = re.compile(r'<div class="(list-item(?:-numbered|-bullet|-indented)?)">(.*?)</div>', re.DOTALL)
+
+
+def parse_list_items(text):
     """
-    將文字轉換為 HTML 條列式格式（用於前端顯示）
+    將文字拆解為條列項目
     
     Args:
         text: 原始文字
         
     Returns:
-        HTML 格式的條列式文字
+        [[類型代碼, 內容], ...]，類型代碼見 LIST_ITEM_CLASSES
     """
     if not text:
-        return text
-    
-    lines = text.strip().split('\n')
-    html_lines = []
+        return []
     
-    for line in lines:
+    items = []
+    for line in text.strip().split('\n'):
         line = line.strip()
         if not line:
             continue
         
         # 如果是編號開頭（1. 2. 等）
         if re.match(r'^[\d一二三四五六七八九十]+[\.、)]', line):
-            html_lines.append(f'<div class="list-item-numbered">{line}</div>')
+            items.append(['n', line])
         # 如果是項目符號開頭（• - 等）
         elif re.match(r'^[•·\-*]\s*', line):
-            html_lines.append(f'<div class="list-item-bullet">{line}</div>')
+            items.append(['b', line])
         # 如果是縮排的項目（  - 等）
         elif re.match(r'^\s+[-•·*]', line):
-            html_lines.append(f'<div class="list-item-indented">{line.strip()}</div>')
+            items.append(['i', line.strip()])
         # 其他行
         else:
-            html_lines.append(f'<div class="list-item">{line}</div>')
+            items.append(['p', line])
+    
+    return items
+
+
+def render_list_items_html(items):
+    """
+    將條列項目轉換為 HTML
+    
+    Args:
+        items: parse_list_items 的結果
+        
+    Returns:
+        HTML 格式的條列式文字
+    """
+    return ''.join(
+        f'<div class="{LIST_ITEM_CLASSES[kind]}">{line}</div>'
+        for kind, line in items
+    )
+
+
+def parse_list_html(html):
+    """
+    將 format_as_list_html 產生的 HTML 還原為條列項目
+    
+    Args:
+        html: HTML 格式的條列式文字
+        
+    Returns:
+        條列項目；若 HTML 無法完整還原則返回 None
+    """
+    if not html:
+        return None
+    
+    items = [[_LIST_ITEM_KINDS[css_class], line]
+             for css_class, line in _LIST_ITEM_HTML_PATTERN.findall(html)]
+    if not items or render_list_items_html(items) != html:
+        return None
+    return items
+
+
+def html_to_text(value):
+    """
+    將 HTML（例如 format_as_list_html 產生的條列）轉為純文字
+    
+    Args:
+        value: HTML 字串
+        
+    Returns:
+        純文字，每個區塊一行
+    """
+    text = _HTML_TAG_PATTERN.sub('\n', value or '')
+    return '\n'.join(line.strip() for line in html.unescape(text).split('\n') if line.strip())
+
+
+def format_as_list_html(text):
+    """
+    將文字轉換為 HTML 條列式格式（用於前端顯示）
+    
+    Args:
+        text: 原始文字
+        
+    Returns:
+        HTML 格式的條列式文字
+    """
+    if not text:
+        return text
     
-    return ''.join(html_lines)
+    return render_list_items_html(parse_list_items(text))
@@ -0,0 +1,147 @@
+"""
+Token 估算與提示詞預算工具
+"""
+import re
+import threading
+
+# 中日韓文字與全形符號：大約每個字元 1 個 token
+_CJK_PATTERN = re.compile(r'[　-〿㐀-䶿一-鿿豈-﫿＀-￯]')
+
+
+class PromptTooLargeError(Exception):
+    """輸入內容超過單次請求的 token 預算"""
+
+
+def estimate_tokens(text):
+    """
+    在本地估算文字的 token 數（不呼叫 API）
+    
+    中文字元約 1 token／字，其他字元約 4 字元／token
+    
+    Args:
+        text: 文字
+        
+    Returns:
+        估算的 token 數
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenEstimator:
+    """
+    以 count_tokens 校正的 token 估算器
+    
+    每個提示詞模板只呼叫一次 count_tokens，記錄實際值與本地估算值的比例，
+    之後同一模板的估算都乘上此比例
+    """
+    
+    def __init__(self):
+        self._ratios = {}
+        self._lock = threading.Lock()
+    
+    def estimate(self, text, template=None):
+        ratio = self._ratios.get(template, 1.0)
+        return int(estimate_tokens(text) * ratio)
+    
+    def is_calibrated(self, template):
+        return template in self._ratios
+    
+    def calibrate(self, template, prompt, model):
+        """
+        以 API 的 count_tokens 校正指定模板的估算比例（每個模板只執行一次）
+        
+        校正失敗時保持本地估算，不影響請求
+        """
+        with self._lock:
+            if template in self._ratios:
+                return
+            # 先佔位，避免並行請求重複校正
+            self._ratios[template] = 1.0
+        
+        try:
+            actual = model.count_tokens(prompt).total_tokens
+            estimated = estimate_tokens(prompt)
+            if actual and estimated:
+                self._ratios[template] = actual / estimated
+                print(f"Token 估算校正 ({template}): 實際 {actual}，估算 {estimated}")
+        except Exception as e:
+            print(f"Token 估算校正失敗 ({template}): {str(e)[:100]}")
+    
+    def ratios(self):
+        return dict(self._ratios)
+
+
+def trim_to_tokens(text, max_tokens, template=None, estimator=None):
+    """
+    依段落截斷文字，使估算 token 數不超過 max_tokens
+    
+    從開頭依序保留段落（法規文件最重要的法條索引位於開頭）
+    
+    Args:
+        text: 原始文字
+        max_tokens: token 上限
+        template: 估算時使用的模板名稱（套用校正比例）
+        estimator: TokenEstimator；未指定時使用未校正的估算
+        
+    Returns:
+        截斷後的文字
+    """
+    def count(value):
+        return estimator.estimate(value, template) if estimator else estimate_tokens(value)
+    
+    if count(text) <= max_tokens:
+        return text
+    
+    kept = []
+    used = 0
+    for paragraph in text.split('\n\n'):
+        cost = count(paragraph) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(paragraph)
+        used += cost
+    return '\n\n'.join(kept)
+
+
+def new_usage():
+    """建立 token 用量累計字典"""
+    return {
+        'prompt_tokens': 0,
+        'response_tokens': 0,
+        'total_tokens': 0,
+        'calls': 0
+    }
+
+
+def add_usage(usage, response):
+    """
+    將 API 回應的 usage_metadata 累加到用量字典
+    
+    Args:
+        usage: new_usage() 建立的字典；None 時不做任何事
+        response: generate_content 的回應
+    """
+    if usage is None:
+        return
+    metadata = getattr(response, 'usage_metadata', None)
+    usage['calls'] += 1
+    if metadata is None:
+        return
+    usage['prompt_tokens'] += getattr(metadata, 'prompt_token_count', 0) or 0
+    usage['response_tokens'] += getattr(metadata, 'candidates_token_count', 0) or 0
+    usage['total_tokens'] += getattr(metadata, 'total_token_count', 0) or 0
+
+
+def merge_usage(usage, other):
+    """將另一個用量字典累加到 usage（並行分析時各工作各自記錄，完成後再合併）"""
+    if usage is None or other is None:
+        return
+    for key in usage:
+        usage[key] += other.get(key, 0)
+
+
+# 建立全域估算器實例
+token_estimator = TokenEstimator()
@@ -0,0 +1,31 @@
+"""
+正式環境 WSGI 進入點
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn 以 preload_app 在 master 行程載入此模組：唯讀的共用狀態（法規條文索引、
+即時檢查規則、已編譯的模板）只建立一次，fork 出的 worker 以 copy-on-write 共用。
+"""
+import gc
+from app import create_app
+from utils.law_index import law_index
+from utils.lint_utils import lint_matcher
+
+
+def warm_shared_state(app):
+    """在 fork 前建立唯讀的共用狀態"""
+    # 法律文件全文、條文索引與版本雜湊
+    law_index.text
+    # 即時檢查規則已於模組載入時編譯；先執行一次讓正規表示式引擎完成初始化
+    lint_matcher.lint('免費')
+    # 預先編譯所有模板
+    for template_name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(template_name)
+    
+    # 將目前的物件移出垃圾回收追蹤，避免 worker 執行 GC 時寫入這些頁面而破壞 copy-on-write
+    gc.collect()
+    gc.freeze()
+
+
+app = create_app()
+warm_shared_state(app)